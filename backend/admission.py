@@ -0,0 +1,214 @@
+# admission.py
+"""Admission control: bounded concurrency per endpoint class and per-user rate limits.
+
+Every request is sorted into a class (auth, vote, read, admin) by a
+``classify(scope)`` callback. Each class has a ``ConcurrencyLimiter``: at
+most ``limit`` requests of the class run at once, up to ``queue_size`` more
+wait in FIFO order, and a waiter that is not admitted within ``max_wait``
+seconds is turned away. Turned-away requests get ``503`` with
+``Retry-After`` immediately instead of adding to a threadpool and database
+backlog that slows every other request down.
+
+Before that, requests that ``identify(scope)`` attributes to a user draw from
+the user's ``TokenBucket``; an empty bucket answers ``429`` with
+``Retry-After`` set to when the next token arrives. Requests that belong to
+no class (health checks, metrics, live streams) bypass both checks.
+
+Limiters are not thread-safe: they are used only from the event loop.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from caching import TTLCache
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; ``retry_after`` is in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _was_admitted(waiter: asyncio.Future) -> bool:
+    return waiter.done() and not waiter.cancelled()
+
+
+class ConcurrencyLimiter:
+    def __init__(self, name: str, limit: int, queue_size: int, max_wait: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            raise Overloaded("queue_full", self.max_wait)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot straight to the waiter, so active is already counted
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            if not _was_admitted(waiter):
+                self.rejected += 1
+                raise Overloaded("wait_timeout", self.max_wait)
+        except asyncio.CancelledError:
+            if _was_admitted(waiter):
+                # Admitted just as the request was cancelled: pass the slot on
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``; starts full."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take one token; returns 0 on success, else the seconds until one is available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class UserRateLimiter:
+    """One TokenBucket per user, kept for ``maxsize`` recently active users.
+
+    A bucket idle long enough to refill completely is equivalent to a new
+    one, so entries expire after that much idle time and expiry never grants
+    extra tokens. Only LRU eviction, with more than ``maxsize`` users active
+    at once, can reset a bucket early.
+    """
+
+    def __init__(self, rate: float, burst: float, maxsize: int = 10000):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.limited = 0
+        self._buckets = TTLCache(maxsize=maxsize, ttl=self.burst / rate)
+
+    def check(self, user: str):
+        now = time.monotonic()
+        bucket = self._buckets.get(user)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst, now)
+        # Re-set on every request so the TTL counts from the user's last request, not the first
+        self._buckets.set(user, bucket)
+        wait = bucket.take(now)
+        if wait:
+            self.limited += 1
+            raise Overloaded("rate_limited", wait)
+
+
+def _retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the per-user rate limit, then the class limiter."""
+
+    def __init__(
+        self,
+        app,
+        limiters: Dict[str, ConcurrencyLimiter],
+        classify: Callable[[dict], Optional[str]],
+        identify: Callable[[dict], Optional[str]],
+        user_limiter: Optional[UserRateLimiter] = None,
+        on_reject: Optional[Callable[[str, str], None]] = None,
+    ):
+        self.app = app
+        self.limiters = limiters
+        self.classify = classify
+        self.identify = identify
+        self.user_limiter = user_limiter
+        self.on_reject = on_reject
+
+    async def __call__(self, scope, receive, send):
+        endpoint_class = self.classify(scope) if scope["type"] == "http" else None
+        limiter = self.limiters.get(endpoint_class)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            if self.user_limiter is not None:
+                user = self.identify(scope)
+                if user is not None:
+                    self.user_limiter.check(user)
+            await limiter.acquire()
+        except Overloaded as exc:
+            if self.on_reject is not None:
+                self.on_reject(endpoint_class, exc.reason)
+            await self._reject(send, exc)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    async def _reject(self, send, exc: Overloaded):
+        if exc.reason == "rate_limited":
+            status, detail = 429, "Too many requests, please retry later"
+        else:
+            status, detail = 503, "Server is busy, please retry"
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", _retry_after(exc.retry_after).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,479 +1,2678 @@
-# app.py
-from fastapi import FastAPI, HTTPException, Depends, status
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
-from datetime import datetime, timedelta
-from passlib.context import CryptContext
-import jwt  # PyJWT
-from jwt import ExpiredSignatureError, InvalidTokenError
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, ForeignKey, DateTime, UniqueConstraint
-from sqlalchemy.orm import sessionmaker, Session, relationship, declarative_base
-from contextlib import contextmanager
-
-# -------------------------
-# Configuration
-# -------------------------
-SECRET_KEY = "your-secret-key-change-in-production"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-# -------------------------
-# Database setup
-# -------------------------
-SQLALCHEMY_DATABASE_URL = "sqlite:///./voting_system.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# -------------------------
-# Models
-# -------------------------
-class User(Base):
-    __tablename__ = "users"
-
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True, index=True, nullable=False)
-    email = Column(String, unique=True, index=True, nullable=False)
-    hashed_password = Column(String, nullable=False)
-    is_admin = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-    votes = relationship("Vote", back_populates="voter")
-
-
-class Election(Base):
-    __tablename__ = "elections"
-
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, nullable=False)
-    description = Column(String, nullable=True)
-    is_active = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-    candidates = relationship("Candidate", back_populates="election", cascade="all, delete-orphan")
-    votes = relationship("Vote", back_populates="election", cascade="all, delete-orphan")
-
-
-class Candidate(Base):
-    __tablename__ = "candidates"
-
-    id = Column(Integer, primary_key=True, index=True)
-    election_id = Column(Integer, ForeignKey("elections.id"), nullable=False)
-    name = Column(String, nullable=False)
-    description = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-    election = relationship("Election", back_populates="candidates")
-    votes = relationship("Vote", back_populates="candidate", cascade="all, delete-orphan")
-
-
-class Vote(Base):
-    __tablename__ = "votes"
-
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    election_id = Column(Integer, ForeignKey("elections.id"), nullable=False)
-    candidate_id = Column(Integer, ForeignKey("candidates.id"), nullable=False)
-    voted_at = Column(DateTime, default=datetime.utcnow)
-
-    voter = relationship("User", back_populates="votes")
-    election = relationship("Election", back_populates="votes")
-    candidate = relationship("Candidate", back_populates="votes")
-
-    __table_args__ = (UniqueConstraint('user_id', 'election_id', name='_user_election_uc'),)
-
-
-# Create tables
-Base.metadata.create_all(bind=engine)
-
-# -------------------------
-# Pydantic schemas
-# -------------------------
-class UserRegister(BaseModel):
-    username: str = Field(..., min_length=3, max_length=50)
-    email: EmailStr
-    password: str = Field(..., min_length=6)
-
-
-class UserLogin(BaseModel):
-    username: Optional[str] = None
-    email: Optional[EmailStr] = None
-    password: str
-
-
-class Token(BaseModel):
-    access_token: str
-    token_type: str
-    is_admin: bool
-
-
-class ElectionCreate(BaseModel):
-    title: str = Field(..., min_length=1, max_length=200)
-    description: Optional[str] = None
-    is_active: Optional[bool] = False
-
-
-class ElectionResponse(BaseModel):
-    id: int
-    title: str
-    description: Optional[str]
-    is_active: bool
-    created_at: datetime
-
-    class Config:
-        orm_mode = True
-
-
-class CandidateCreate(BaseModel):
-    election_id: int
-    name: str = Field(..., min_length=1, max_length=200)
-    description: Optional[str] = None
-
-
-class CandidateResponse(BaseModel):
-    id: int
-    election_id: int
-    name: str
-    description: Optional[str]
-    created_at: datetime
-
-    class Config:
-        orm_mode = True
-
-
-class VoteCreate(BaseModel):
-    election_id: int
-    candidate_id: int
-
-
-class VoteResult(BaseModel):
-    candidate_id: int
-    candidate_name: str
-    vote_count: int
-
-
-class ElectionResults(BaseModel):
-    election_id: int
-    election_title: str
-    total_votes: int
-    results: List[VoteResult]
-
-# -------------------------
-# FastAPI app
-# -------------------------
-app = FastAPI(title="Voting System API", version="1.0.0")
-security = HTTPBearer()
-
-# -------------------------
-# CORS Middleware (fixes 405 on OPTIONS)
-# -------------------------
-origins = [
-    "http://localhost:3000",
-    "http://127.0.0.1:3000",
-    # Add your frontend origin(s) here
-    # "https://your-production-domain.com",
-    "*",  # Use with caution in production; restrict origins in prod
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],   # ensures OPTIONS and all methods allowed
-    allow_headers=["*"],   # allows custom headers like Authorization
-)
-
-# -------------------------
-# Database dependency
-# -------------------------
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-# -------------------------
-# Helper functions
-# -------------------------
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-
-def decode_token(token: str):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except ExpiredSignatureError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
-    except InvalidTokenError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-
-
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    token = credentials.credentials
-    payload = decode_token(token)
-    user_sub = payload.get("sub")
-    if user_sub is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-
-    try:
-        user_id = int(user_sub)
-    except (TypeError, ValueError):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token subject")
-
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
-
-
-def get_admin_user(current_user: User = Depends(get_current_user)):
-    if not current_user.is_admin:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
-    return current_user
-
-
-# -------------------------
-# API Endpoints
-# -------------------------
-@app.post("/api/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserRegister, db: Session = Depends(get_db)):
-    # Check if username exists
-    if db.query(User).filter(User.username == user_data.username).first():
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already registered")
-
-    # Check if email exists
-    if db.query(User).filter(User.email == user_data.email).first():
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
-
-    # Create new user
-    hashed_password = get_password_hash(user_data.password)
-    new_user = User(
-        username=user_data.username,
-        email=user_data.email,
-        hashed_password=hashed_password,
-        is_admin=False
-    )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-
-    # Create access token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(new_user.id)}, expires_delta=access_token_expires
-    )
-
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "is_admin": new_user.is_admin
-    }
-
-
-@app.post("/api/login", response_model=Token)
-def login(login_data: UserLogin, db: Session = Depends(get_db)):
-    # Validate input
-    if not login_data.username and not login_data.email:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username or email required")
-
-    # Find user
-    if login_data.username:
-        user = db.query(User).filter(User.username == login_data.username).first()
-    else:
-        user = db.query(User).filter(User.email == login_data.email).first()
-
-    if not user or not verify_password(login_data.password, user.hashed_password):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-
-    # Create access token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user.id)}, expires_delta=access_token_expires
-    )
-
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "is_admin": user.is_admin
-    }
-
-
-@app.post("/api/admin/election", response_model=ElectionResponse, status_code=status.HTTP_201_CREATED)
-def create_election(election_data: ElectionCreate, db: Session = Depends(get_db), admin: User = Depends(get_admin_user)):
-    new_election = Election(
-        title=election_data.title,
-        description=election_data.description,
-        is_active=bool(election_data.is_active)
-    )
-    db.add(new_election)
-    db.commit()
-    db.refresh(new_election)
-
-    return new_election
-
-
-@app.post("/api/admin/candidate", response_model=CandidateResponse, status_code=status.HTTP_201_CREATED)
-def add_candidate(candidate_data: CandidateCreate, db: Session = Depends(get_db), admin: User = Depends(get_admin_user)):
-    # Check if election exists
-    election = db.query(Election).filter(Election.id == candidate_data.election_id).first()
-    if not election:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Election not found")
-
-    new_candidate = Candidate(
-        election_id=candidate_data.election_id,
-        name=candidate_data.name,
-        description=candidate_data.description
-    )
-    db.add(new_candidate)
-    db.commit()
-    db.refresh(new_candidate)
-
-    return new_candidate
-
-
-@app.post("/api/admin/start/{election_id}", response_model=ElectionResponse)
-def start_election(election_id: int, db: Session = Depends(get_db), admin: User = Depends(get_admin_user)):
-    election = db.query(Election).filter(Election.id == election_id).first()
-    if not election:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Election not found")
-
-    # Check if election has candidates
-    candidates_count = db.query(Candidate).filter(Candidate.election_id == election_id).count()
-    if candidates_count == 0:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot start election without candidates")
-
-    election.is_active = True
-    db.commit()
-    db.refresh(election)
-
-    return election
-
-
-@app.get("/api/admin/results/{election_id}", response_model=ElectionResults)
-def get_election_results(election_id: int, db: Session = Depends(get_db), admin: User = Depends(get_admin_user)):
-    election = db.query(Election).filter(Election.id == election_id).first()
-    if not election:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Election not found")
-
-    # Get all candidates for this election
-    candidates = db.query(Candidate).filter(Candidate.election_id == election_id).all()
-
-    results = []
-    total_votes = 0
-
-    for candidate in candidates:
-        vote_count = db.query(Vote).filter(
-            Vote.election_id == election_id,
-            Vote.candidate_id == candidate.id
-        ).count()
-
-        results.append(VoteResult(
-            candidate_id=candidate.id,
-            candidate_name=candidate.name,
-            vote_count=vote_count
-        ))
-        total_votes += vote_count
-
-    return ElectionResults(
-        election_id=election.id,
-        election_title=election.title,
-        total_votes=total_votes,
-        results=results
-    )
-
-
-@app.post("/api/vote", status_code=status.HTTP_201_CREATED)
-def cast_vote(vote_data: VoteCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if user is admin
-    if current_user.is_admin:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins cannot vote")
-
-    # Check if election exists and is active
-    election = db.query(Election).filter(Election.id == vote_data.election_id).first()
-    if not election:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Election not found")
-    if not election.is_active:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Election is not active")
-
-    # Check if candidate exists and belongs to the election
-    candidate = db.query(Candidate).filter(
-        Candidate.id == vote_data.candidate_id,
-        Candidate.election_id == vote_data.election_id
-    ).first()
-    if not candidate:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Candidate not found in this election")
-
-    # Check if user has already voted in this election
-    existing_vote = db.query(Vote).filter(
-        Vote.user_id == current_user.id,
-        Vote.election_id == vote_data.election_id
-    ).first()
-    if existing_vote:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You have already voted in this election")
-
-    # Create new vote
-    new_vote = Vote(
-        user_id=current_user.id,
-        election_id=vote_data.election_id,
-        candidate_id=vote_data.candidate_id
-    )
-    db.add(new_vote)
-    db.commit()
-    db.refresh(new_vote)
-
-    return {"message": "Vote cast successfully"}
-
-
-@app.get("/api/elections", response_model=List[ElectionResponse])
-def list_active_elections(db: Session = Depends(get_db)):
-    elections = db.query(Election).filter(Election.is_active == True).all()
-    return elections
-
-
-@app.get("/api/elections/{election_id}/candidates", response_model=List[CandidateResponse])
-def list_candidates(election_id: int, db: Session = Depends(get_db)):
-    # Check if election exists
-    election = db.query(Election).filter(Election.id == election_id).first()
-    if not election:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Election not found")
-
-    candidates = db.query(Candidate).filter(Candidate.election_id == election_id).all()
-    return candidates
-
-
-# Root endpoint
-@app.get("/")
-def root():
-    return {
-        "message": "Voting System API",
-        "version": "1.0.0",
-        "docs": "/docs"
-    }
-
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+# app.py
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from pydantic import BaseModel, EmailStr, Field, ValidationError
+from typing import Optional, List, Tuple
+from datetime import datetime, timedelta, timezone
+import jwt  # PyJWT
+from jwt import ExpiredSignatureError, InvalidTokenError
+from sqlalchemy import create_engine, event, Column, Integer, String, Boolean, ForeignKey, DateTime, LargeBinary, UniqueConstraint, and_, delete, false, func, select, insert, type_coerce
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker, Session, relationship, declarative_base, with_parent
+from sqlalchemy.pool import StaticPool
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+import asyncio
+import functools
+import hashlib
+import os
+import threading
+import time
+import uuid
+from urllib.parse import quote
+
+from admission import AdmissionMiddleware, ConcurrencyLimiter, UserRateLimiter
+from audit_export import EXPORT_MEDIA_TYPES, ExportFormatError, check_export_format, encode_export
+from bulk_import import ImportReport, RowError, detect_format, iter_chunks, iter_rows
+from caching import TTLCache, VersionCounters
+from change_feed import ChangeFeed
+from fast_json import json_codec
+from idempotency import IdempotencyMiddleware, IdempotencyStore
+from password_hashing import PasswordHasher
+from results_stream import ResultsBroadcaster, format_event
+from metrics import (
+    QUERY_COUNT_BUCKETS, MetricsMiddleware, Registry, install_query_hooks, next_chunk, time_pool_checkouts
+)
+from migrations import MIGRATIONS, SHARD_MIGRATIONS, apply_migrations, schema_version
+from pagination import InvalidPageRequest, PageRequest, encode_cursor, page_request, paginate
+from storage import create_engines, install_pragmas, open_async_connections, open_connections, storage_profile
+from vote_counters import ShardedVoteCounter
+from vote_pipeline import GroupCommitWriter, QueueFullError
+from vote_shards import ShardArchivedError, ShardRouter
+from voter_index import VoterIndex
+
+# -------------------------
+# Configuration
+# -------------------------
+SECRET_KEY = "your-secret-key-change-in-production"
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 30
+
+# Authenticated-user cache: principals are served from memory for up to USER_CACHE_TTL seconds
+USER_CACHE_SIZE = int(os.getenv("VOTING_USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("VOTING_USER_CACHE_TTL", "60"))
+
+# Verified-token cache: decoded claims keyed by a digest of the token, kept until the token's exp
+TOKEN_CACHE_SIZE = int(os.getenv("VOTING_TOKEN_CACHE_SIZE", "10000"))
+
+# Listing responses (active elections, candidates) are cached pre-serialized and revalidated by ETag
+LISTING_CACHE_SIZE = int(os.getenv("VOTING_LISTING_CACHE_SIZE", "1024"))
+LISTING_CACHE_TTL = float(os.getenv("VOTING_LISTING_CACHE_TTL", "300"))
+LISTING_MAX_AGE = int(os.getenv("VOTING_LISTING_MAX_AGE", "0"))
+
+# Listings, results and vote history are encoded straight from column tuples by this encoder:
+# "auto" (orjson when installed), "orjson" or "stdlib"
+JSON_ENCODER = os.getenv("VOTING_JSON_ENCODER", "auto")
+
+# Listings and vote history are paginated by cursor; ?limit= is clamped to VOTING_PAGE_SIZE_MAX
+PAGE_SIZE_DEFAULT = int(os.getenv("VOTING_PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX = int(os.getenv("VOTING_PAGE_SIZE_MAX", "1000"))
+
+# Bulk imports are validated, hashed and inserted VOTING_BULK_CHUNK_SIZE rows per transaction
+BULK_CHUNK_SIZE = int(os.getenv("VOTING_BULK_CHUNK_SIZE", "500"))
+BULK_MAX_ERRORS = int(os.getenv("VOTING_BULK_MAX_ERRORS", "1000"))
+# A longer line is reported as a failed row rather than buffered
+BULK_MAX_LINE_BYTES = int(os.getenv("VOTING_BULK_MAX_LINE_BYTES", str(64 * 1024)))
+
+# Audit exports stream votes in keyset chunks of VOTING_EXPORT_CHUNK_SIZE rows
+EXPORT_CHUNK_SIZE = int(os.getenv("VOTING_EXPORT_CHUNK_SIZE", "5000"))
+
+# Live results: updates are coalesced and pushed to subscribers once per tick
+RESULTS_STREAM_TICK_MS = float(os.getenv("VOTING_RESULTS_TICK_MS", "500"))
+RESULTS_STREAM_KEEPALIVE = float(os.getenv("VOTING_RESULTS_KEEPALIVE", "15"))
+
+# Password hashing: bcrypt cost and the process pool it runs in (0 workers = threadpool)
+BCRYPT_ROUNDS = int(os.getenv("VOTING_BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("VOTING_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_CONCURRENCY = int(os.getenv("VOTING_HASH_MAX_CONCURRENCY", str(max(1, HASH_WORKERS) * 2)))
+
+# Vote counting: "database" updates candidate_tallies inside each vote's transaction,
+# "memory" counts in process and flushes to candidate_tallies in the background
+VOTE_COUNTER_MODE = os.getenv("VOTING_COUNTER_MODE", "database")
+VOTE_COUNTER_STRIPES = int(os.getenv("VOTING_COUNTER_STRIPES", "16"))
+VOTE_COUNTER_FLUSH_INTERVAL = float(os.getenv("VOTING_COUNTER_FLUSH_INTERVAL", "1.0"))
+VOTE_COUNTER_FLUSH_THRESHOLD = int(os.getenv("VOTING_COUNTER_FLUSH_THRESHOLD", "500"))
+
+# Vote commits: "per_request" commits each vote in its own transaction,
+# "group" queues votes for a single writer that commits them in batches
+VOTE_COMMIT_MODE = os.getenv("VOTING_COMMIT_MODE", "per_request")
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("VOTING_GROUP_COMMIT_MAX_BATCH", "256"))
+GROUP_COMMIT_MAX_WAIT_MS = float(os.getenv("VOTING_GROUP_COMMIT_MAX_WAIT_MS", "5"))
+GROUP_COMMIT_QUEUE_SIZE = int(os.getenv("VOTING_GROUP_COMMIT_QUEUE_SIZE", "10000"))
+
+# Vote sharding: "off" keeps every vote in the main database, "election" stores each election's
+# votes and tallies in its own SQLite file under VOTING_VOTE_SHARD_DIR
+VOTE_SHARDING = os.getenv("VOTING_VOTE_SHARDING", "off")
+VOTE_SHARD_DIR = os.getenv("VOTING_VOTE_SHARD_DIR", "./vote_shards")
+VOTE_SHARD_ARCHIVE_DIR = os.getenv("VOTING_VOTE_SHARD_ARCHIVE_DIR", os.path.join(VOTE_SHARD_DIR, "archive"))
+
+# Database access: "sync" runs endpoints on the threadpool with a blocking Session,
+# "async" runs them as coroutines on an aiosqlite AsyncSession
+DB_MODE = os.getenv("VOTING_DB_MODE", "sync")
+DB_POOL_SIZE = int(os.getenv("VOTING_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("VOTING_DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("VOTING_DB_POOL_TIMEOUT", "30"))
+DB_BUSY_TIMEOUT = float(os.getenv("VOTING_DB_BUSY_TIMEOUT", "5"))
+
+# SQLite storage profile: "wal" applies the pragmas below and splits reads (pool of query_only
+# connections) from writes (one serialized connection); "default" keeps SQLite's stock settings
+STORAGE_PROFILE = storage_profile(
+    os.getenv("VOTING_STORAGE_PROFILE", "wal"),
+    synchronous=os.getenv("VOTING_SQLITE_SYNCHRONOUS", "NORMAL"),
+    cache_size_kib=int(os.getenv("VOTING_SQLITE_CACHE_SIZE_KIB", str(64 * 1024))),
+    mmap_size=int(os.getenv("VOTING_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+)
+
+# Admission control: each endpoint class (auth, vote, read, admin) runs at most "concurrency"
+# requests at once and queues at most "queue" more, e.g. VOTING_ADMISSION_VOTE=8,64. A request
+# not admitted within VOTING_ADMISSION_MAX_WAIT_MS gets 503 with Retry-After. Votes serialize on
+# SQLite's single writer, so admitting more of them at once only lengthens their wait
+ADMISSION_ENABLED = os.getenv("VOTING_ADMISSION", "1") == "1"
+ADMISSION_MAX_WAIT_MS = float(os.getenv("VOTING_ADMISSION_MAX_WAIT_MS", "500"))
+ADMISSION_LIMITS = {
+    name: tuple(int(part) for part in os.getenv(f"VOTING_ADMISSION_{name.upper()}", default).split(","))
+    for name, default in (("auth", "16,64"), ("vote", "8,64"), ("read", "64,256"), ("admin", "8,32"))
+}
+# Per-user token bucket for authenticated requests: VOTING_USER_RATE requests per second with
+# bursts of up to VOTING_USER_BURST; over the limit gets 429 with Retry-After. 0 disables
+USER_RATE = float(os.getenv("VOTING_USER_RATE", "20"))
+USER_BURST = float(os.getenv("VOTING_USER_BURST", "40"))
+
+# Idempotency-Key on POST /api/vote, /api/admin/election and /api/admin/candidate: responses are
+# kept per user and key for VOTING_IDEMPOTENCY_TTL seconds and replayed to retries
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("VOTING_IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_TTL = float(os.getenv("VOTING_IDEMPOTENCY_TTL", "86400"))
+
+# Cross-worker cache coherence: every VOTING_CACHE_SYNC_MS each worker checks whether another
+# process committed to the database and applies the logged listing changes and new votes. 0 disables
+CACHE_SYNC_MS = float(os.getenv("VOTING_CACHE_SYNC_MS", "250"))
+# Logged listing changes are pruned once they are older than VOTING_CACHE_LOG_RETENTION seconds,
+# which must be far longer than any worker can take to read them
+CACHE_LOG_RETENTION = float(os.getenv("VOTING_CACHE_LOG_RETENTION", "3600"))
+
+# Startup: the database is initialized before the server accepts connections; with VOTING_WARM_UP=1
+# pools, listing caches and hashing workers are then warmed in the background, and /health/ready
+# answers 503 until that is done
+WARM_UP = os.getenv("VOTING_WARM_UP", "1") == "1"
+
+# Metrics: Prometheus text on /metrics. A request that runs one statement more than
+# VOTING_QUERY_REPEAT_LIMIT times is counted as an N+1 suspect; VOTING_QUERY_STRICT=1 makes it fail
+METRICS_ENABLED = os.getenv("VOTING_METRICS", "1") == "1"
+QUERY_REPEAT_LIMIT = int(os.getenv("VOTING_QUERY_REPEAT_LIMIT", "3"))
+QUERY_STRICT = os.getenv("VOTING_QUERY_STRICT", "0") == "1"
+
+# -------------------------
+# Metrics
+# -------------------------
+metrics_registry = Registry()
+request_latency = metrics_registry.histogram(
+    "voting_http_request_duration_seconds", "HTTP request latency by route template", ["method", "route", "status"]
+)
+request_queries = metrics_registry.histogram(
+    "voting_db_queries_per_request", "SQL statements executed per request", ["route"], buckets=QUERY_COUNT_BUCKETS
+)
+request_query_seconds = metrics_registry.histogram(
+    "voting_db_query_seconds_per_request", "Time spent executing SQL per request", ["route"]
+)
+repeated_query_requests = metrics_registry.counter(
+    "voting_repeated_query_requests_total",
+    f"Requests that ran one statement more than {QUERY_REPEAT_LIMIT} times (likely N+1)",
+    ["route"]
+)
+pool_checkout_wait = metrics_registry.histogram(
+    "voting_db_pool_checkout_wait_seconds", "Time waiting for a pooled database connection", ["pool"]
+)
+bcrypt_seconds = metrics_registry.histogram(
+    "voting_bcrypt_seconds", "bcrypt hash or verify time in the hashing pool", ["operation"]
+)
+bcrypt_wait_seconds = metrics_registry.histogram(
+    "voting_bcrypt_queue_wait_seconds", "Time waiting for a hashing slot", ["operation"]
+)
+
+
+duplicate_votes_rejected = metrics_registry.counter(
+    "voting_duplicate_votes_rejected_total", "Repeat ballots rejected, by where the earlier vote was found", ["source"]
+)
+
+
+def observe_bcrypt(operation: str, wait_seconds: float, run_seconds: float):
+    bcrypt_wait_seconds.observe(wait_seconds, operation=operation)
+    bcrypt_seconds.observe(run_seconds, operation=operation)
+
+
+if METRICS_ENABLED:
+    install_query_hooks(QUERY_REPEAT_LIMIT, strict=QUERY_STRICT)
+
+# -------------------------
+# Database setup
+# -------------------------
+SQLALCHEMY_DATABASE_URL = os.getenv("VOTING_DATABASE_URL", "sqlite:///./voting_system.db")
+# engine takes every write; read_engine serves GET endpoints (the same engine under the "default" profile)
+engine, read_engine = create_engines(
+    create_engine,
+    SQLALCHEMY_DATABASE_URL,
+    STORAGE_PROFILE,
+    busy_timeout=DB_BUSY_TIMEOUT,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    connect_args={"check_same_thread": False}
+)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+Base = declarative_base()
+
+# The sync engine is always created: background workers and the CLI use it in both modes
+async_engine = None
+async_read_engine = None
+AsyncSessionLocal = None
+AsyncReadSessionLocal = None
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv(
+        "VOTING_ASYNC_DATABASE_URL",
+        SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    )
+    async_engine, async_read_engine = create_engines(
+        create_async_engine,
+        SQLALCHEMY_ASYNC_DATABASE_URL,
+        STORAGE_PROFILE,
+        busy_timeout=DB_BUSY_TIMEOUT,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT
+    )
+    # Objects are serialized after the session's greenlet has returned, so they must not expire
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+# Password hashing; request handlers go through password_hasher so bcrypt runs off the request path
+password_hasher = PasswordHasher(
+    rounds=BCRYPT_ROUNDS,
+    workers=HASH_WORKERS,
+    max_concurrency=HASH_MAX_CONCURRENCY,
+    observe=observe_bcrypt if METRICS_ENABLED else None
+)
+
+if METRICS_ENABLED:
+    time_pool_checkouts(engine, pool_checkout_wait, "write")
+    if read_engine is not engine:
+        time_pool_checkouts(read_engine, pool_checkout_wait, "read")
+    if async_engine is not None:
+        time_pool_checkouts(async_engine, pool_checkout_wait, "async_write")
+        if async_read_engine is not async_engine:
+            time_pool_checkouts(async_read_engine, pool_checkout_wait, "async_read")
+
+# -------------------------
+# Models
+# -------------------------
+class User(Base):
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, unique=True, index=True, nullable=False)
+    email = Column(String, unique=True, index=True, nullable=False)
+    hashed_password = Column(String, nullable=False)
+    is_admin = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    votes = relationship("Vote", back_populates="voter")
+
+
+class Election(Base):
+    __tablename__ = "elections"
+
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    is_active = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    candidates = relationship("Candidate", back_populates="election", cascade="all, delete-orphan")
+    votes = relationship("Vote", back_populates="election", cascade="all, delete-orphan")
+
+
+class Candidate(Base):
+    __tablename__ = "candidates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    election_id = Column(Integer, ForeignKey("elections.id"), nullable=False)
+    name = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    election = relationship("Election", back_populates="candidates")
+    votes = relationship("Vote", back_populates="candidate", cascade="all, delete-orphan")
+
+
+class Vote(Base):
+    __tablename__ = "votes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    election_id = Column(Integer, ForeignKey("elections.id"), nullable=False)
+    candidate_id = Column(Integer, ForeignKey("candidates.id"), nullable=False)
+    voted_at = Column(DateTime, default=datetime.utcnow)
+
+    voter = relationship("User", back_populates="votes")
+    election = relationship("Election", back_populates="votes")
+    candidate = relationship("Candidate", back_populates="votes")
+
+    __table_args__ = (UniqueConstraint('user_id', 'election_id', name='_user_election_uc'),)
+
+
+class CandidateTally(Base):
+    """Running vote count per candidate, maintained by cast_vote in the vote's transaction.
+
+    The votes table stays the source of truth; rebuild_candidate_tallies() recomputes
+    this table from it.
+    """
+    __tablename__ = "candidate_tallies"
+
+    candidate_id = Column(Integer, ForeignKey("candidates.id"), primary_key=True)
+    election_id = Column(Integer, ForeignKey("elections.id"), nullable=False, index=True)
+    vote_count = Column(Integer, nullable=False, default=0)
+
+
+class ElectionResultSnapshot(Base):
+    """Final results of a closed election, serialized once when it was closed.
+
+    body is the ElectionResults JSON exactly as served and checksum its SHA-256.
+    Rows are immutable: migration 2 adds triggers that reject UPDATE and DELETE.
+    """
+    __tablename__ = "election_result_snapshots"
+
+    election_id = Column(Integer, ForeignKey("elections.id"), primary_key=True)
+    total_votes = Column(Integer, nullable=False)
+    body = Column(LargeBinary, nullable=False)
+    checksum = Column(String(64), nullable=False)
+    closed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class CacheInvalidation(Base):
+    """Log of changes that invalidate cached listings, read by every worker's change_feed.
+
+    Rows are added in the transaction that makes the change. kind is "listing",
+    or "closed" when the election was closed.
+    """
+    __tablename__ = "cache_invalidations"
+    # AUTOINCREMENT: ids are never reused, so a worker's cursor cannot skip new rows
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(16), nullable=False)
+    election_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+# -------------------------
+# Vote tallies
+# -------------------------
+def _make_shard_engines(url: str):
+    return create_engines(
+        create_engine,
+        url,
+        STORAGE_PROFILE,
+        busy_timeout=DB_BUSY_TIMEOUT,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        connect_args={"check_same_thread": False}
+    )
+
+
+def _create_shard_schema(shard_engine):
+    Base.metadata.create_all(bind=shard_engine, tables=[Vote.__table__, CandidateTally.__table__])
+    apply_migrations(shard_engine, SHARD_MIGRATIONS)
+
+
+# Shards hold votes and candidate_tallies; users, elections and candidates stay in the main database.
+# Shard sessions are always sync, also in async DB mode.
+vote_shards = None
+if VOTE_SHARDING == "election":
+    vote_shards = ShardRouter(
+        VOTE_SHARD_DIR,
+        VOTE_SHARD_ARCHIVE_DIR,
+        _make_shard_engines,
+        _create_shard_schema
+    )
+
+
+def vote_session(election_id: int, read: bool = False) -> Session:
+    """Session on the database holding an election's votes and tallies."""
+    if vote_shards is not None:
+        return vote_shards.session(election_id, read=read)
+    return ReadSessionLocal() if read else SessionLocal()
+
+
+def increment_candidate_tally(db: Session, election_id: int, candidate_id: int):
+    # Single upsert so concurrent first votes for a candidate cannot race on the insert
+    stmt = sqlite_insert(CandidateTally).values(
+        candidate_id=candidate_id,
+        election_id=election_id,
+        vote_count=1
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CandidateTally.candidate_id],
+        set_={"vote_count": CandidateTally.vote_count + 1}
+    )
+    db.execute(stmt)
+
+
+def rebuild_candidate_tallies(db: Session, election_id: Optional[int] = None) -> int:
+    """Recompute candidate_tallies from votes with one GROUP BY pass. Returns rows written."""
+    stale = db.query(CandidateTally)
+    counts = (
+        select(Candidate.id, Candidate.election_id, func.count(Vote.id))
+        # Matching on election_id too lets the join use ix_votes_election_id_candidate_id
+        .outerjoin(Vote, and_(Vote.election_id == Candidate.election_id, Vote.candidate_id == Candidate.id))
+        .group_by(Candidate.id, Candidate.election_id)
+    )
+    if election_id is not None:
+        stale = stale.filter(CandidateTally.election_id == election_id)
+        counts = counts.where(Candidate.election_id == election_id)
+
+    stale.delete(synchronize_session=False)
+    result = db.execute(
+        insert(CandidateTally).from_select(
+            [CandidateTally.candidate_id, CandidateTally.election_id, CandidateTally.vote_count],
+            counts
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+
+def rebuild_shard_tallies(db: Session, election_id: int) -> int:
+    """Recompute one shard's candidate_tallies from its votes. Candidates without votes get no row."""
+    db.query(CandidateTally).delete(synchronize_session=False)
+    result = db.execute(
+        insert(CandidateTally).from_select(
+            [CandidateTally.candidate_id, CandidateTally.election_id, CandidateTally.vote_count],
+            select(Vote.candidate_id, Vote.election_id, func.count(Vote.id))
+            .where(Vote.election_id == election_id)
+            .group_by(Vote.candidate_id, Vote.election_id)
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+
+def reconcile_tallies(election_id: Optional[int] = None) -> int:
+    """Rebuild tallies in the main database or in each live shard. Returns rows written."""
+    if vote_shards is None:
+        db = SessionLocal()
+        try:
+            return rebuild_candidate_tallies(db, election_id)
+        finally:
+            db.close()
+
+    rebuilt = 0
+    for shard_election_id in ([election_id] if election_id is not None else vote_shards.election_ids()):
+        db = vote_shards.session(shard_election_id)
+        try:
+            rebuilt += rebuild_shard_tallies(db, shard_election_id)
+        finally:
+            db.close()
+    return rebuilt
+
+
+def move_votes_to_shards(batch_size: int = 5000) -> int:
+    """Copy every vote from the main database into its election's shard, then delete it there."""
+    moved = 0
+    db = SessionLocal()
+    try:
+        election_ids = [election_id for (election_id,) in db.query(Vote.election_id).distinct()]
+        for election_id in election_ids:
+            shard_db = vote_shards.session(election_id)
+            try:
+                last_id = 0
+                while True:
+                    rows = db.query(Vote.id, Vote.user_id, Vote.election_id, Vote.candidate_id, Vote.voted_at).filter(
+                        Vote.election_id == election_id, Vote.id > last_id
+                    ).order_by(Vote.id).limit(batch_size).all()
+                    if not rows:
+                        break
+                    shard_db.execute(insert(Vote).prefix_with("OR IGNORE"), [row._asdict() for row in rows])
+                    shard_db.commit()
+                    last_id = rows[-1].id
+                    moved += len(rows)
+                rebuild_shard_tallies(shard_db, election_id)
+            finally:
+                shard_db.close()
+            # Only drop the main copies once the shard has committed all of them
+            db.query(Vote).filter(Vote.election_id == election_id).delete(synchronize_session=False)
+            db.query(CandidateTally).filter(CandidateTally.election_id == election_id).delete(synchronize_session=False)
+            db.commit()
+    finally:
+        db.close()
+    return moved
+
+
+def _backfill_candidate_tallies():
+    # Databases created before candidate_tallies existed have votes but no tallies
+    db = SessionLocal()
+    try:
+        if db.query(CandidateTally).first() is None and db.query(Vote).first() is not None:
+            rebuild_candidate_tallies(db)
+    finally:
+        db.close()
+
+
+_database_lock = threading.Lock()
+_database_ready = threading.Event()
+
+
+def init_database():
+    """Create missing tables, apply migrations and backfill tallies, once per process.
+
+    Called from the lifespan hook, the CLI and the test and benchmark setup rather
+    than at import, so importing this module opens no database connection.
+    """
+    with _database_lock:
+        if _database_ready.is_set():
+            return
+        Base.metadata.create_all(bind=engine)
+        apply_migrations(engine, MIGRATIONS)
+        _backfill_candidate_tallies()
+        _database_ready.set()
+
+
+def add_tally_deltas(db: Session, deltas):
+    """Upsert (election_id, candidate_id, delta) increments into candidate_tallies without committing."""
+    stmt = sqlite_insert(CandidateTally)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CandidateTally.candidate_id],
+        set_={"vote_count": CandidateTally.vote_count + stmt.excluded.vote_count}
+    )
+    db.execute(stmt, [
+        {"candidate_id": candidate_id, "election_id": election_id, "vote_count": delta}
+        for election_id, candidate_id, delta in deltas
+    ])
+
+
+def flush_tally_deltas(deltas):
+    """Apply (election_id, candidate_id, delta) increments from the in-memory counter."""
+    by_election = {None: deltas}
+    if vote_shards is not None:
+        by_election = {}
+        for delta in deltas:
+            by_election.setdefault(delta[0], []).append(delta)
+
+    for election_id, election_deltas in by_election.items():
+        db = SessionLocal() if election_id is None else vote_shards.session(election_id)
+        try:
+            add_tally_deltas(db, election_deltas)
+            db.commit()
+        finally:
+            db.close()
+
+
+def load_vote_counter(counter: ShardedVoteCounter) -> dict:
+    """Rebuild the counts from the votes; returns the last vote id counted in each database.
+
+    Keys are election ids of shards, or None for the main database. Stored tallies can
+    lag other workers' unflushed deltas, so they are not used; the change feed counts
+    the votes after the returned ids, so each vote is counted exactly once.
+    """
+    election_ids = vote_shards.election_ids() if vote_shards is not None else [None]
+    rows = []
+    counted = {}
+    for election_id in election_ids:
+        db = ReadSessionLocal() if election_id is None else vote_shards.session(election_id, read=True)
+        try:
+            last_id = db.query(func.max(Vote.id)).scalar() or 0
+            # A vote holds the write lock from its insert to its commit, so ids grow in commit
+            # order: no vote at or below last_id can be committed after it was read
+            rows.extend(db.query(Vote.election_id, Vote.candidate_id, func.count(Vote.id)).filter(
+                Vote.id <= last_id
+            ).group_by(Vote.election_id, Vote.candidate_id).all())
+            counted[election_id] = last_id
+        finally:
+            db.close()
+    counter.load(rows)
+    return counted
+
+
+vote_counter = None
+if VOTE_COUNTER_MODE == "memory":
+    vote_counter = ShardedVoteCounter(
+        stripes=VOTE_COUNTER_STRIPES,
+        flush_interval=VOTE_COUNTER_FLUSH_INTERVAL,
+        flush_threshold=VOTE_COUNTER_FLUSH_THRESHOLD,
+        flush_fn=flush_tally_deltas
+    )
+
+
+# -------------------------
+# Voter index
+# -------------------------
+# Who has voted where, for rejecting duplicate ballots and computing has_voted without a query
+voter_index = VoterIndex()
+
+# Votes this worker has inserted, as (election_id, user_id), until its change feed reads them back:
+# the feed counts and publishes only other workers' votes. A key is held from the insert, while the
+# transaction holds the write lock, until the commit; before a rollback it is released, so no other
+# worker's vote for the same key can be committed while it is held
+own_votes = set()
+own_votes_lock = threading.Lock()
+
+
+def hold_own_votes(keys):
+    if change_feed is None:
+        return
+    with own_votes_lock:
+        own_votes.update(keys)
+
+
+def release_own_votes(keys):
+    with own_votes_lock:
+        own_votes.difference_update(keys)
+
+
+def warm_voter_index(batch_size: int = 10000) -> int:
+    """Load the voters of every active election into voter_index; returns the number of votes loaded."""
+    db = ReadSessionLocal()
+    try:
+        election_ids = [election_id for election_id, in db.query(Election.id).filter(Election.is_active == True)]
+    finally:
+        db.close()
+    if vote_shards is not None:
+        # Opening a missing shard would create it; an election without a shard has no votes
+        live = set(vote_shards.election_ids())
+        election_ids = [election_id for election_id in election_ids if election_id in live]
+
+    loaded = 0
+    for election_id in election_ids:
+        db = vote_session(election_id, read=True)
+        try:
+            result = db.execute(
+                select(Vote.election_id, Vote.user_id).where(Vote.election_id == election_id),
+                execution_options={"yield_per": batch_size}
+            )
+            for rows in result.partitions():
+                voter_index.add_many(rows)
+                loaded += len(rows)
+        finally:
+            db.close()
+    return loaded
+
+
+# -------------------------
+# Listing cache and ETags
+# -------------------------
+# Versions are per process, so ETags carry a per-process epoch to stay unique across restarts
+ETAG_EPOCH = uuid.uuid4().hex[:12]
+ACTIVE_ELECTIONS_KEY = "active_elections"
+# Active elections with their candidates: changes with any election or candidate
+DASHBOARD_KEY = "dashboard"
+
+listing_versions = VersionCounters()
+listing_cache = TTLCache(maxsize=LISTING_CACHE_SIZE, ttl=LISTING_CACHE_TTL)
+response_json = json_codec(JSON_ENCODER)
+
+
+def record_invalidation(db: Session, election_ids, kind: str = "listing"):
+    """Log, in db's transaction, that these elections' listings change, for the other workers' caches.
+
+    Entries this worker has applied and every other worker has had CACHE_LOG_RETENTION
+    to read are deleted in the same transaction, so the log stays small.
+    """
+    db.add_all([CacheInvalidation(kind=kind, election_id=election_id) for election_id in set(election_ids)])
+    prune = delete(CacheInvalidation).where(
+        CacheInvalidation.created_at < datetime.utcnow() - timedelta(seconds=CACHE_LOG_RETENTION)
+    )
+    if change_feed is not None:
+        prune = prune.where(CacheInvalidation.id <= change_cursors["invalidations"])
+    db.execute(prune)
+
+
+def bump_listing_versions(election_id: int):
+    # Called after commit by every admin mutation that changes an election or its candidates;
+    # the mutation also logs it with record_invalidation for the other workers
+    listing_versions.bump(ACTIVE_ELECTIONS_KEY, DASHBOARD_KEY, ("election", election_id))
+
+
+def render_rows(rows) -> bytes:
+    """Serialize rows of selected columns as a list of objects, named after the columns.
+
+    No ORM objects or schema models are built: the rows must already hold
+    exactly the response schema's fields.
+    """
+    if not rows:
+        return b"[]"
+    names = rows[0]._fields
+    return _dump_json([dict(zip(names, row)) for row in rows])
+
+
+def _dump_json(content) -> bytes:
+    return response_json.dumps(content)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def schema_fields(schema) -> Tuple[str, ...]:
+    return tuple(schema.model_fields if hasattr(schema, "model_fields") else schema.__fields__)
+
+
+def parse_page(cursor: Optional[str], limit: Optional[int], fields: Optional[str], schema) -> PageRequest:
+    try:
+        return page_request(cursor, limit, fields, schema_fields(schema), PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX)
+    except InvalidPageRequest as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+def page_headers(request: Request, next_cursor: Optional[str]) -> dict:
+    if next_cursor is None:
+        return {}
+    next_url = request.url.include_query_params(cursor=next_cursor)
+    return {"X-Next-Cursor": next_cursor, "Link": f'<{next_url}>; rel="next"'}
+
+
+def _render_listing(db: Session, version_key, version: int, page: PageRequest, render, *args) -> Tuple[bytes, Optional[str]]:
+    # Store under the version read before querying: a concurrent bump makes this entry stale, never wrong
+    body, next_cursor = render(db, *args, page)
+    listing_cache.set((version_key, page.cache_key()), (version, body, next_cursor))
+    return body, next_cursor
+
+
+async def cached_listing(request: Request, db, version_key, page: PageRequest, render, *args, personalize=None) -> Response:
+    """Serve render(db, *args, page) from the listing cache, answering If-None-Match with 304.
+
+    render returns ``(body, next_cursor)``. Each page and projection is cached
+    separately, and all of them are invalidated by one bump of version_key.
+    ``personalize(body)`` returns ``(body, variant)``: a copy of the shared
+    body for one caller, served privately under an ETag that includes variant.
+    """
+    version = listing_versions.get(version_key)
+    tag = version_key if isinstance(version_key, str) else "-".join(str(part) for part in version_key)
+    page_variant = hashlib.sha1(repr(page.cache_key()).encode("utf-8")).hexdigest()[:8]
+    etag = f'"{ETAG_EPOCH}-{tag}-{version}-{page_variant}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={LISTING_MAX_AGE}, must-revalidate"}
+
+    if personalize is None and _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    cache_key = (version_key, page.cache_key())
+    cached = listing_cache.get(cache_key)
+    if cached is not None and cached[0] == version:
+        body, next_cursor = cached[1], cached[2]
+    else:
+        body, next_cursor = await run_db(db, _render_listing, version_key, version, page, render, *args)
+
+    if personalize is not None:
+        body, variant = personalize(body)
+        headers = {
+            "ETag": f'"{ETAG_EPOCH}-{tag}-{version}-{page_variant}-{variant}"',
+            "Cache-Control": f"private, max-age={LISTING_MAX_AGE}, must-revalidate"
+        }
+        if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    headers.update(page_headers(request, next_cursor))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# -------------------------
+# Live results
+# -------------------------
+def fetch_candidate_counts(election_id: int, candidate_ids) -> dict:
+    if vote_counter is not None:
+        counts = vote_counter.snapshot(election_id)
+        return {candidate_id: counts.get(candidate_id, 0) for candidate_id in candidate_ids}
+    db = vote_session(election_id, read=True)
+    try:
+        return dict(db.query(CandidateTally.candidate_id, CandidateTally.vote_count).filter(
+            CandidateTally.candidate_id.in_(candidate_ids)
+        ).all())
+    finally:
+        db.close()
+
+
+results_broadcaster = ResultsBroadcaster(fetch_candidate_counts, tick_interval=RESULTS_STREAM_TICK_MS / 1000)
+
+
+# -------------------------
+# Cross-worker cache coherence
+# -------------------------
+# Positions in cache_invalidations and votes up to which this worker has applied changes
+change_cursors = {"invalidations": 0, "votes": 0}
+# The same for votes in each live shard, by election id
+shard_vote_cursors = {}
+
+
+def _apply_changes(connection):
+    """Apply what was committed since the last poll, by any worker: listing changes, closes and new votes."""
+    rows = connection.execute(
+        select(CacheInvalidation.id, CacheInvalidation.kind, CacheInvalidation.election_id).where(
+            CacheInvalidation.id > change_cursors["invalidations"]
+        ).order_by(CacheInvalidation.id)
+    ).all()
+    for row in rows:
+        bump_listing_versions(row.election_id)
+        if row.kind == "closed":
+            voter_index.discard(row.election_id)
+            body = connection.execute(
+                select(ElectionResultSnapshot.body).where(ElectionResultSnapshot.election_id == row.election_id)
+            ).scalar()
+            if body is not None:
+                results_broadcaster.end_threadsafe(row.election_id, format_event("closed", response_json.loads(body)))
+    if rows:
+        change_cursors["invalidations"] = rows[-1].id
+
+    if vote_shards is None:
+        _apply_new_votes(connection, change_cursors, "votes")
+
+
+def _apply_new_votes(connection, cursors: dict, key):
+    """Apply the votes past cursors[key]: to voter_index, and other workers' ones to the counts and live results."""
+    votes = connection.execute(
+        select(Vote.id, Vote.election_id, Vote.user_id, Vote.candidate_id).where(Vote.id > cursors[key]).order_by(Vote.id)
+    ).all()
+    if not votes:
+        return
+    # So has_voted and the duplicate check see votes cast through other workers
+    voter_index.add_many((vote.election_id, vote.user_id) for vote in votes)
+    deltas = {}
+    with own_votes_lock:
+        for vote in votes:
+            if (vote.election_id, vote.user_id) in own_votes:
+                own_votes.discard((vote.election_id, vote.user_id))
+            else:
+                deltas[(vote.election_id, vote.candidate_id)] = deltas.get((vote.election_id, vote.candidate_id), 0) + 1
+    for (election_id, candidate_id), delta in deltas.items():
+        if vote_counter is not None:
+            vote_counter.observe(election_id, candidate_id, delta)
+        results_broadcaster.publish(election_id, candidate_id, delta)
+    cursors[key] = votes[-1].id
+
+
+def _make_feed_engine(url: str):
+    # One dedicated connection: PRAGMA data_version only reports commits made by other connections
+    feed_engine = create_engine(
+        url,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False, "timeout": DB_BUSY_TIMEOUT}
+    )
+    install_pragmas(feed_engine, STORAGE_PROFILE.pragmas(DB_BUSY_TIMEOUT, read_only=True))
+    return feed_engine
+
+
+def _watch_shard(feed: ChangeFeed, election_id: int, cursor: Optional[int] = 0):
+    """Poll an election's shard for the votes past cursor; None is the votes committed from now on."""
+    # mode=rw: a shard detached since it was listed must not be created again by opening it
+    path = quote(os.path.abspath(vote_shards.path_for(election_id)))
+    shard_engine = _make_feed_engine(f"sqlite:///file:{path}?mode=rw&uri=true")
+    if cursor is None:
+        with shard_engine.connect() as connection:
+            cursor = connection.execute(select(func.max(Vote.id))).scalar() or 0
+    shard_vote_cursors[election_id] = cursor
+    feed.watch(election_id, shard_engine, lambda connection: _apply_new_votes(connection, shard_vote_cursors, election_id))
+
+
+def _watch_vote_shards(feed: ChangeFeed):
+    """Poll the shards created since the last poll, from their first vote, and stop polling detached ones."""
+    live = set(vote_shards.election_ids())
+    for election_id in live - shard_vote_cursors.keys():
+        _watch_shard(feed, election_id)
+    for election_id in shard_vote_cursors.keys() - live:
+        feed.unwatch(election_id)
+        del shard_vote_cursors[election_id]
+
+
+def start_change_feed(counted_votes: Optional[dict] = None):
+    """Start applying other workers' changes from now on; call before warming the caches it keeps coherent.
+
+    counted_votes is what load_vote_counter returned: votes after those ids are applied
+    from the start, so none committed since the counts were read is missed.
+    """
+    counted_votes = counted_votes or {}
+    with change_feed.engine.connect() as connection:
+        change_cursors["invalidations"] = connection.execute(select(func.max(CacheInvalidation.id))).scalar() or 0
+        if vote_shards is None:
+            change_cursors["votes"] = counted_votes.get(None)
+            if change_cursors["votes"] is None:
+                change_cursors["votes"] = connection.execute(select(func.max(Vote.id))).scalar() or 0
+    if vote_shards is not None:
+        for election_id in vote_shards.election_ids():
+            _watch_shard(change_feed, election_id, counted_votes.get(election_id))
+    change_feed.poll()
+    change_feed.start()
+
+
+change_feed = None
+if CACHE_SYNC_MS > 0:
+    change_feed = ChangeFeed(
+        _make_feed_engine(SQLALCHEMY_DATABASE_URL),
+        _apply_changes,
+        interval=CACHE_SYNC_MS / 1000,
+        discover=_watch_vote_shards if vote_shards is not None else None
+    )
+
+# -------------------------
+# Group-commit vote writer
+# -------------------------
+class DuplicateVoteError(Exception):
+    """The user already has a vote in the election; raised when _user_election_uc rejects the insert."""
+
+
+class ElectionClosedError(Exception):
+    """The election stopped accepting votes between the ballot's validation and its write."""
+
+
+def _elections_accepting_votes(vote_db: Session, election_ids) -> set:
+    """The elections among election_ids that are still active.
+
+    Called after a vote's INSERT and before its COMMIT, while the vote database's
+    write lock is held; see _count_final_votes for why that makes closing exact.
+    """
+    db = vote_db if vote_shards is None else ReadSessionLocal()
+    try:
+        return {election_id for election_id, in db.query(Election.id).filter(
+            Election.id.in_(set(election_ids)), Election.is_active == True
+        )}
+    finally:
+        if db is not vote_db:
+            db.close()
+
+
+def _insert_votes(db: Session, votes):
+    db.execute(insert(Vote), [
+        {"user_id": user_id, "election_id": election_id, "candidate_id": candidate_id, "voted_at": datetime.utcnow()}
+        for user_id, election_id, candidate_id in votes
+    ])
+    if vote_counter is None:
+        deltas = {}
+        for _, election_id, candidate_id in votes:
+            deltas[(election_id, candidate_id)] = deltas.get((election_id, candidate_id), 0) + 1
+        add_tally_deltas(db, [
+            (election_id, candidate_id, delta) for (election_id, candidate_id), delta in deltas.items()
+        ])
+
+
+def write_vote_batch(votes):
+    """Insert (user_id, election_id, candidate_id) votes, one transaction per database.
+
+    If the batch trips _user_election_uc, the offending votes are identified with a
+    lookup and the remaining votes are inserted in a new transaction.
+    """
+    if vote_shards is None:
+        outcomes = _commit_vote_group(SessionLocal(), votes)
+    else:
+        outcomes = [None] * len(votes)
+        indexes_by_election = {}
+        for index, (_, election_id, _) in enumerate(votes):
+            indexes_by_election.setdefault(election_id, []).append(index)
+        for election_id, indexes in indexes_by_election.items():
+            try:
+                group_outcomes = _commit_vote_group(vote_shards.session(election_id), [votes[index] for index in indexes])
+            except Exception as exc:
+                # One shard failing must not fail the votes routed to other shards
+                group_outcomes = [exc] * len(indexes)
+            for index, outcome in zip(indexes, group_outcomes):
+                outcomes[index] = outcome
+
+    for (_, election_id, candidate_id), outcome in zip(votes, outcomes):
+        if outcome is None:
+            if vote_counter is not None:
+                vote_counter.increment(election_id, candidate_id)
+            results_broadcaster.publish(election_id, candidate_id)
+    return outcomes
+
+
+def _insert_new_votes(db: Session, votes, pending, outcomes):
+    """Insert the votes at the pending indexes, leaving out duplicates; returns the indexes inserted.
+
+    A duplicate is caught by _user_election_uc, marked DuplicateVoteError and the rest
+    retried. The retry repeats because another connection can commit a vote for one
+    of the remaining users between the lookup and the insert.
+    """
+    while pending:
+        try:
+            _insert_votes(db, [votes[index] for index in pending])
+            return pending
+        except IntegrityError:
+            db.rollback()
+            already_voted = set(db.query(Vote.user_id, Vote.election_id).filter(
+                Vote.user_id.in_({votes[index][0] for index in pending})
+            ).all())
+            remaining = []
+            for index in pending:
+                user_id, election_id, _ = votes[index]
+                if (user_id, election_id) in already_voted:
+                    outcomes[index] = DuplicateVoteError()
+                else:
+                    # A second vote for the same election within the batch is also a duplicate
+                    already_voted.add((user_id, election_id))
+                    remaining.append(index)
+            if len(remaining) == len(pending):
+                # Not a duplicate vote: let the batch fail
+                raise
+            pending = remaining
+    return pending
+
+
+def _commit_vote_group(db: Session, votes):
+    """Insert votes that share one database through ``db``, then close it."""
+    outcomes = [None] * len(votes)
+    held = []
+    try:
+        pending = _insert_new_votes(db, votes, list(range(len(votes))), outcomes)
+        while pending:
+            held = [(votes[index][1], votes[index][0]) for index in pending]
+            hold_own_votes(held)
+            accepting = _elections_accepting_votes(db, {votes[index][1] for index in pending})
+            if all(votes[index][1] in accepting for index in pending):
+                db.commit()
+                held = []
+                break
+            # Rare: an election in the batch was closed after its ballots were validated
+            release_own_votes(held)
+            held = []
+            db.rollback()
+            for index in pending:
+                if votes[index][1] not in accepting:
+                    outcomes[index] = ElectionClosedError()
+            pending = _insert_new_votes(db, votes, [index for index in pending if votes[index][1] in accepting], outcomes)
+    finally:
+        # Held only if the commit failed; released before close() rolls back
+        release_own_votes(held)
+        db.close()
+    return outcomes
+
+
+vote_writer = None
+if VOTE_COMMIT_MODE == "group":
+    vote_writer = GroupCommitWriter(
+        write_vote_batch,
+        max_batch_size=GROUP_COMMIT_MAX_BATCH,
+        max_wait=GROUP_COMMIT_MAX_WAIT_MS / 1000,
+        queue_size=GROUP_COMMIT_QUEUE_SIZE
+    )
+
+# -------------------------
+# Pydantic schemas
+# -------------------------
+class UserRegister(BaseModel):
+    username: str = Field(..., min_length=3, max_length=50)
+    email: EmailStr
+    password: str = Field(..., min_length=6)
+
+
+class UserLogin(BaseModel):
+    username: Optional[str] = None
+    email: Optional[EmailStr] = None
+    password: str
+
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+    is_admin: bool
+
+
+class ElectionCreate(BaseModel):
+    title: str = Field(..., min_length=1, max_length=200)
+    description: Optional[str] = None
+    is_active: Optional[bool] = False
+
+
+class ElectionResponse(BaseModel):
+    id: int
+    title: str
+    description: Optional[str]
+    is_active: bool
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class ElectionListing(ElectionResponse):
+    # Only for requests with a valid bearer token
+    has_voted: Optional[bool] = None
+
+
+class CandidateCreate(BaseModel):
+    election_id: int
+    name: str = Field(..., min_length=1, max_length=200)
+    description: Optional[str] = None
+
+
+class CandidateResponse(BaseModel):
+    id: int
+    election_id: int
+    name: str
+    description: Optional[str]
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class DashboardElection(ElectionListing):
+    candidates: List[CandidateResponse]
+
+
+class VoteCreate(BaseModel):
+    election_id: int
+    candidate_id: int
+
+
+class VoteResult(BaseModel):
+    candidate_id: int
+    candidate_name: str
+    vote_count: int
+
+
+class ElectionResults(BaseModel):
+    election_id: int
+    election_title: str
+    total_votes: int
+    results: List[VoteResult]
+
+
+class VoteHistoryEntry(BaseModel):
+    election_id: int
+    election_title: str
+    candidate_id: int
+    candidate_name: str
+    voted_at: datetime
+
+# -------------------------
+# API router
+# -------------------------
+# Every endpoint is registered here; create_app() mounts it on a new FastAPI instance
+router = APIRouter()
+security = HTTPBearer()
+
+# -------------------------
+# Admission control
+# -------------------------
+admission_limiters = {
+    name: ConcurrencyLimiter(name, concurrency, queue_size, ADMISSION_MAX_WAIT_MS / 1000)
+    for name, (concurrency, queue_size) in ADMISSION_LIMITS.items()
+}
+user_rate_limiter = UserRateLimiter(USER_RATE, USER_BURST, maxsize=USER_CACHE_SIZE) if USER_RATE > 0 else None
+admission_rejected = metrics_registry.counter(
+    "voting_admission_rejected_total", "Requests turned away by admission control", ["endpoint_class", "reason"]
+)
+
+
+def classify_request(scope) -> Optional[str]:
+    path = scope["path"]
+    # Live streams hold their connection open for as long as the client listens
+    if scope["method"] == "OPTIONS" or not path.startswith("/api/") or path.endswith("/stream"):
+        return None
+    if path in ("/api/login", "/api/register"):
+        return "auth"
+    if path == "/api/vote":
+        return "vote"
+    if path.startswith("/api/admin/"):
+        return "admin"
+    return "read"
+
+
+def identify_request(scope) -> Optional[str]:
+    """The user id from a valid bearer token; anonymous requests are not rate limited per user."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None
+            try:
+                return decode_token(token).get("sub")
+            except HTTPException:
+                # Left for get_current_user to reject with 401
+                return None
+    return None
+
+
+def record_admission_rejection(endpoint_class: str, reason: str):
+    admission_rejected.inc(endpoint_class=endpoint_class, reason=reason)
+
+
+# -------------------------
+# Idempotent retries
+# -------------------------
+idempotency_store = IdempotencyStore(maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL)
+IDEMPOTENT_ROUTES = frozenset({("POST", "/api/vote"), ("POST", "/api/admin/election"), ("POST", "/api/admin/candidate")})
+
+# -------------------------
+# CORS Middleware (fixes 405 on OPTIONS)
+# -------------------------
+origins = [
+    "http://localhost:3000",
+    "http://127.0.0.1:3000",
+    # Add your frontend origin(s) here
+    # "https://your-production-domain.com",
+    "*",  # Use with caution in production; restrict origins in prod
+]
+
+# -------------------------
+# Metrics gauges
+# -------------------------
+if METRICS_ENABLED:
+    metrics_registry.gauge(
+        "voting_vote_queue_depth", "Votes waiting for the group-commit writer",
+        lambda: vote_writer.queue_depth if vote_writer is not None else 0
+    )
+    metrics_registry.gauge(
+        "voting_results_stream_subscribers", "Open live results streams",
+        lambda: results_broadcaster.subscriber_count
+    )
+    metrics_registry.gauge(
+        "voting_bcrypt_queued", "Password hashes waiting for a hashing slot",
+        lambda: password_hasher.stats()["queued"]
+    )
+    if ADMISSION_ENABLED:
+        metrics_registry.gauge(
+            "voting_admission_active", "Requests running per endpoint class",
+            lambda: {(name,): limiter.active for name, limiter in admission_limiters.items()},
+            label_names=["endpoint_class"]
+        )
+        metrics_registry.gauge(
+            "voting_admission_queued", "Requests waiting for admission per endpoint class",
+            lambda: {(name,): limiter.queued for name, limiter in admission_limiters.items()},
+            label_names=["endpoint_class"]
+        )
+
+
+# -------------------------
+# Startup, warm-up and shutdown
+# -------------------------
+def start_background_workers():
+    """Set up the state requests rely on for correct answers, then start the vote workers."""
+    init_database()
+    counted_votes = load_vote_counter(vote_counter) if vote_counter is not None else None
+    if change_feed is not None:
+        start_change_feed(counted_votes)
+    warm_voter_index()
+    if vote_counter is not None:
+        vote_counter.start()
+    if vote_writer is not None:
+        vote_writer.start()
+
+
+def stop_background_workers():
+    # Drain queued votes before the counter's final flush
+    if vote_writer is not None:
+        vote_writer.stop()
+    if vote_counter is not None:
+        vote_counter.stop()
+    if change_feed is not None:
+        change_feed.stop()
+    password_hasher.shutdown()
+    results_broadcaster.stop()
+
+
+def warm_caches() -> dict:
+    """Do the work the first requests after a start would otherwise pay for; returns what was loaded.
+
+    Opens the sync connection pools, renders the first page of active elections and
+    of the dashboard and the candidate listing of each active election into
+    listing_cache, and starts the password hashing workers. Tallies are already in
+    memory when VOTING_COUNTER_MODE=memory.
+    """
+    connections = open_connections(engine)
+    if read_engine is not engine:
+        connections += open_connections(read_engine)
+
+    listings = 0
+    db = ReadSessionLocal()
+    try:
+        page = parse_page(None, None, None, ElectionResponse)
+        _render_listing(db, ACTIVE_ELECTIONS_KEY, listing_versions.get(ACTIVE_ELECTIONS_KEY), page, _render_active_elections)
+        _render_listing(db, DASHBOARD_KEY, listing_versions.get(DASHBOARD_KEY), page, _render_dashboard)
+        listings += 2
+        # Two entries are already taken by the elections page and the dashboard; the rest would only evict each other
+        election_ids = db.scalars(
+            select(Election.id).where(Election.is_active == True).order_by(Election.id).limit(LISTING_CACHE_SIZE - 2)
+        ).all()
+        page = parse_page(None, None, None, CandidateResponse)
+        for election_id in election_ids:
+            version_key = ("election", election_id)
+            _render_listing(db, version_key, listing_versions.get(version_key), page, _render_candidates, election_id)
+            listings += 1
+    finally:
+        db.close()
+
+    return {"connections": connections, "listings": listings, "hash_workers": password_hasher.start()}
+
+
+async def _warm_up(app: FastAPI):
+    started = time.perf_counter()
+    try:
+        if async_engine is not None:
+            await open_async_connections(async_engine)
+            if async_read_engine is not async_engine:
+                await open_async_connections(async_read_engine)
+        app.state.warm_up_report = await run_in_threadpool(warm_caches)
+    except Exception as exc:
+        # A cold cache is slower, not wrong: serve anyway
+        app.state.warm_up_report = {"error": repr(exc)}
+    app.state.warm_up_report["seconds"] = round(time.perf_counter() - started, 3)
+    app.state.ready = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start up before the first request is served, and warm up while /health/ready says so.
+
+    The database and the in-memory state that answers depend on are set up before
+    the server accepts connections. Warm-up runs after that, in the background: the
+    process is live meanwhile, and becomes ready (for the load balancer) once it is done.
+    """
+    await run_in_threadpool(start_background_workers)
+    warm_up = None
+    if app.state.warm_up:
+        warm_up = asyncio.create_task(_warm_up(app))
+    else:
+        app.state.ready = True
+    try:
+        yield
+    finally:
+        # Report not ready first so the load balancer stops routing here during the drain
+        app.state.ready = False
+        if warm_up is not None:
+            warm_up.cancel()
+        await run_in_threadpool(stop_background_workers)
+
+# -------------------------
+# Database dependency
+# -------------------------
+# get_db is for endpoints that write; get_read_db hands out a query_only session for reads
+if DB_MODE == "async":
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    async def get_read_db():
+        async with AsyncReadSessionLocal() as db:
+            yield db
+else:
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def get_read_db():
+        db = ReadSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+def db_endpoint(func):
+    """Adapt a Session-based endpoint or dependency to the configured DB mode.
+
+    In sync mode the function is returned unchanged and FastAPI runs it on the threadpool.
+    In async mode it becomes a coroutine that runs the same body against the AsyncSession
+    with run_sync, so no threadpool thread is held while the query waits on I/O.
+    """
+    if DB_MODE != "async":
+        return func
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        db = kwargs.pop("db")
+        return await db.run_sync(lambda session: func(*args, db=session, **kwargs))
+
+    return wrapper
+
+
+async def run_db(db, fn, *args):
+    """Await fn(session, *args) from an async endpoint without blocking the event loop."""
+    if DB_MODE == "async":
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
+
+
+async def release_db(db):
+    # Ends the session's transaction and returns its connection to the pool
+    if DB_MODE == "async":
+        await db.close()
+    else:
+        await run_in_threadpool(db.close)
+
+
+# -------------------------
+# Helper functions
+# -------------------------
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    to_encode = data.copy()
+    if expires_delta:
+        expire = datetime.utcnow() + expires_delta
+    else:
+        expire = datetime.utcnow() + timedelta(minutes=15)
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE)
+
+
+def decode_token(token: str):
+    cache_key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(cache_key)
+    # The cache TTL tracks exp on the monotonic clock; re-check the wall clock so a
+    # cached entry is never honored past the token's own expiry
+    if payload is not None and payload["exp"] > time.time():
+        return payload
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except ExpiredSignatureError:
+        token_cache.invalidate(cache_key)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
+    except InvalidTokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    # Tokens without exp are not cached: there is nothing to bound the entry by
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)) and exp > time.time():
+        token_cache.set(cache_key, payload, ttl=exp - time.time())
+    return payload
+
+
+# -------------------------
+# Authenticated-user cache
+# -------------------------
+@dataclass(frozen=True)
+class UserPrincipal:
+    """The parts of a User that authorization needs, safe to share between requests."""
+    id: int
+    username: str
+    is_admin: bool
+
+
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_user_changed(mapper, connection, target):
+    # Invalidate after commit so a concurrent request cannot re-cache the old row
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop("changed_user_ids", ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _invalidate_bulk_changed_users(context):
+    # Bulk statements do not say which rows changed
+    if context.mapper.class_ is User:
+        user_cache.clear()
+
+
+def _load_principal(db: Session, user_id: int) -> Optional[UserPrincipal]:
+    user = db.query(User.id, User.username, User.is_admin).filter(User.id == user_id).first()
+    if user is None:
+        return None
+    return UserPrincipal(id=user.id, username=user.username, is_admin=bool(user.is_admin))
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_read_db)):
+    token = credentials.credentials
+    payload = decode_token(token)
+    user_sub = payload.get("sub")
+    if user_sub is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
+
+    try:
+        user_id = int(user_sub)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token subject")
+
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await run_db(db, _load_principal, user_id)
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        user_cache.set(user_id, user)
+    return user
+
+
+async def get_admin_user(current_user: UserPrincipal = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
+
+# -------------------------
+# API Endpoints
+# -------------------------
+def _ensure_registration_available(db: Session, user_data: UserRegister):
+    # Check if username exists
+    if db.query(User).filter(User.username == user_data.username).first():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already registered")
+
+    # Check if email exists
+    if db.query(User).filter(User.email == user_data.email).first():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+
+
+def _create_user(db: Session, user_data: UserRegister, hashed_password: str) -> User:
+    new_user = User(
+        username=user_data.username,
+        email=user_data.email,
+        hashed_password=hashed_password,
+        is_admin=False
+    )
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+    return new_user
+
+
+def _find_login_user(db: Session, login_data: UserLogin) -> Optional[User]:
+    if login_data.username:
+        return db.query(User).filter(User.username == login_data.username).first()
+    return db.query(User).filter(User.email == login_data.email).first()
+
+
+def _update_password_hash(db: Session, user_id: int, hashed_password: str):
+    db.get(User, user_id).hashed_password = hashed_password
+    db.commit()
+
+
+@router.post("/api/register", response_model=Token, status_code=status.HTTP_201_CREATED)
+async def register(user_data: UserRegister, db: Session = Depends(get_db), read_db: Session = Depends(get_read_db)):
+    await run_db(read_db, _ensure_registration_available, user_data)
+
+    # Create new user; bcrypt runs in the hashing pool
+    hashed_password = await password_hasher.hash(user_data.password)
+    new_user = await run_db(db, _create_user, user_data, hashed_password)
+
+    # Create access token
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": str(new_user.id)}, expires_delta=access_token_expires
+    )
+
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "is_admin": new_user.is_admin
+    }
+
+
+@router.post("/api/login", response_model=Token)
+async def login(login_data: UserLogin, db: Session = Depends(get_db), read_db: Session = Depends(get_read_db)):
+    # Validate input
+    if not login_data.username and not login_data.email:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username or email required")
+
+    # Find user
+    user = await run_db(read_db, _find_login_user, login_data)
+
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+
+    valid, new_hash = await password_hasher.verify_and_update(login_data.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash was made with a different bcrypt cost than VOTING_BCRYPT_ROUNDS
+        await run_db(db, _update_password_hash, user.id, new_hash)
+
+    # Create access token
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": str(user.id)}, expires_delta=access_token_expires
+    )
+
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "is_admin": user.is_admin
+    }
+
+
+@router.post("/api/admin/election", response_model=ElectionResponse, status_code=status.HTTP_201_CREATED)
+@db_endpoint
+def create_election(election_data: ElectionCreate, db: Session = Depends(get_db), admin: UserPrincipal = Depends(get_admin_user)):
+    new_election = Election(
+        title=election_data.title,
+        description=election_data.description,
+        is_active=bool(election_data.is_active)
+    )
+    db.add(new_election)
+    db.flush()
+    record_invalidation(db, [new_election.id])
+    db.commit()
+    db.refresh(new_election)
+    bump_listing_versions(new_election.id)
+
+    return new_election
+
+
+@router.post("/api/admin/candidate", response_model=CandidateResponse, status_code=status.HTTP_201_CREATED)
+@db_endpoint
+def add_candidate(candidate_data: CandidateCreate, db: Session = Depends(get_db), admin: UserPrincipal = Depends(get_admin_user)):
+    # Check if election exists
+    election = db.query(Election).filter(Election.id == candidate_data.election_id).first()
+    if not election:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Election not found")
+
+    new_candidate = Candidate(
+        election_id=candidate_data.election_id,
+        name=candidate_data.name,
+        description=candidate_data.description
+    )
+    db.add(new_candidate)
+    db.flush()
+    if vote_shards is None:
+        db.add(CandidateTally(candidate_id=new_candidate.id, election_id=new_candidate.election_id, vote_count=0))
+    record_invalidation(db, [new_candidate.election_id])
+    db.commit()
+    db.refresh(new_candidate)
+    bump_listing_versions(new_candidate.election_id)
+
+    return new_candidate
+
+
+@router.post("/api/admin/start/{election_id}", response_model=ElectionResponse)
+@db_endpoint
+def start_election(election_id: int, db: Session = Depends(get_db), admin: UserPrincipal = Depends(get_admin_user)):
+    election = db.query(Election).filter(Election.id == election_id).first()
+    if not election:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Election not found")
+
+    # Check if election has candidates
+    candidates_count = db.query(Candidate).filter(Candidate.election_id == election_id).count()
+    if candidates_count == 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot start election without candidates")
+    if vote_shards is not None and vote_shards.is_archived(election_id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Election votes have been archived")
+    if db.get(ElectionResultSnapshot, election_id) is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Election is closed")
+
+    election.is_active = True
+    record_invalidation(db, [election.id])
+    db.commit()
+    db.refresh(election)
+    bump_listing_versions(election.id)
+
+    return election
+
+
+def _stop_voting(db: Session, election_id: int):
+    election = _get_election(db, election_id)
+    if db.get(ElectionResultSnapshot, election_id) is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Election is already closed")
+    if vote_shards is not None and vote_shards.is_archived(election_id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Election votes have been archived")
+    election.is_active = False
+    record_invalidation(db, [election_id])
+    db.commit()
+
+
+def _count_final_votes(election_id: int) -> dict:
+    vote_db = vote_session(election_id)
+    try:
+        # An empty DELETE takes the vote database's write lock before counting. A ballot
+        # inserted while the election was still active holds that lock until it commits,
+        # so it is counted; one inserted later finds the election inactive and rolls back
+        # (_elections_accepting_votes). The snapshot therefore holds every accepted vote.
+        vote_db.execute(delete(Vote).where(false()))
+        return dict(vote_db.query(Vote.candidate_id, func.count()).filter(
+            Vote.election_id == election_id
+        ).group_by(Vote.candidate_id).all())
+    finally:
+        vote_db.close()
+
+
+def _freeze_results(election_id: int) -> Tuple[bytes, str]:
+    """Count the final votes of a deactivated election and store its results snapshot.
+
+    Returns the snapshot's (body, checksum).
+    """
+    counts = _count_final_votes(election_id)
+    db = SessionLocal()
+    try:
+        election = _get_election(db, election_id)
+        candidates = db.query(Candidate.id, Candidate.name).filter(
+            Candidate.election_id == election_id
+        ).order_by(Candidate.id).all()
+        results = _results_content(election.id, election.title, [
+            (candidate_id, name, counts.get(candidate_id, 0)) for candidate_id, name in candidates
+        ])
+        body = _dump_json(results)
+        checksum = hashlib.sha256(body).hexdigest()
+        db.add(ElectionResultSnapshot(
+            election_id=election_id,
+            total_votes=results["total_votes"],
+            body=body,
+            checksum=checksum
+        ))
+        record_invalidation(db, [election_id], kind="closed")
+        try:
+            db.commit()
+        except IntegrityError:
+            # Closed concurrently by another request
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Election is already closed")
+        return body, checksum
+    finally:
+        db.close()
+
+
+@router.post("/api/admin/close/{election_id}", response_model=ElectionResults)
+async def close_election(election_id: int, db: Session = Depends(get_db), admin: UserPrincipal = Depends(get_admin_user)):
+    """Stop voting in an election and freeze its final results.
+
+    Retrying after a failure between the two steps completes the close.
+    """
+    await run_db(db, _stop_voting, election_id)
+    await release_db(db)
+    bump_listing_versions(election_id)
+    body, checksum = await run_in_threadpool(_freeze_results, election_id)
+    results_snapshots.set(election_id, (body, checksum))
+    # Nobody can vote in it any more, and has_voted is only shown for active elections
+    voter_index.discard(election_id)
+    results_broadcaster.end(election_id, format_event("closed", response_json.loads(body)))
+    return snapshot_response(body, checksum)
+
+
+# Snapshots never change, so a verified body is kept until evicted
+results_snapshots = TTLCache(maxsize=LISTING_CACHE_SIZE, ttl=float("inf"))
+
+
+def _load_results_snapshot(db: Session, election_id: int) -> Optional[Tuple[bytes, str]]:
+    """The verified (body, checksum) of a closed election's results, or None if it is not closed."""
+    cached = results_snapshots.get(election_id)
+    if cached is not None:
+        return cached
+    row = db.query(ElectionResultSnapshot.body, ElectionResultSnapshot.checksum).filter(
+        ElectionResultSnapshot.election_id == election_id
+    ).first()
+    if row is None:
+        return None
+    body, checksum = bytes(row.body), row.checksum
+    if hashlib.sha256(body).hexdigest() != checksum:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Results snapshot failed its checksum"
+        )
+    results_snapshots.set(election_id, (body, checksum))
+    return body, checksum
+
+
+def snapshot_response(body: bytes, checksum: str) -> Response:
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": f'"{checksum}"', "X-Results-Checksum": f"sha256={checksum}"}
+    )
+
+
+def _results_content(election_id: int, title: str, rows) -> dict:
+    """An ElectionResults body as plain data, from (candidate_id, name, vote_count) rows."""
+    results = [
+        {"candidate_id": candidate_id, "candidate_name": name, "vote_count": vote_count}
+        for candidate_id, name, vote_count in rows
+    ]
+    return {
+        "election_id": election_id,
+        "election_title": title,
+        "total_votes": sum(result["vote_count"] for result in results),
+        "results": results,
+    }
+
+
+def _load_election_results(db: Session, election_id: int) -> dict:
+    election = db.query(Election.id, Election.title).filter(Election.id == election_id).first()
+    if not election:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Election not found")
+    if vote_shards is not None and vote_shards.is_archived(election_id):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Election votes have been archived")
+
+    if vote_counter is not None or vote_shards is not None:
+        # Counts come from memory or the election's shard; candidate names come from the main database
+        candidates = db.query(Candidate.id, Candidate.name).filter(
+            Candidate.election_id == election_id
+        ).order_by(Candidate.id).all()
+        counts = fetch_candidate_counts(election_id, [candidate_id for candidate_id, _ in candidates])
+        rows = [(candidate_id, name, counts.get(candidate_id, 0)) for candidate_id, name in candidates]
+    else:
+        # Candidates and their maintained tallies in a single joined query
+        rows = db.query(
+            Candidate.id,
+            Candidate.name,
+            func.coalesce(CandidateTally.vote_count, 0)
+        ).outerjoin(
+            CandidateTally, CandidateTally.candidate_id == Candidate.id
+        ).filter(
+            Candidate.election_id == election_id
+        ).order_by(Candidate.id).all()
+
+    return _results_content(election.id, election.title, rows)
+
+
+@router.get("/api/admin/results/{election_id}", response_model=ElectionResults)
+@db_endpoint
+def get_election_results(election_id: int, request: Request, db: Session = Depends(get_read_db), admin: UserPrincipal = Depends(get_admin_user)):
+    # Closed elections are served from their frozen snapshot, without counting votes
+    snapshot = _load_results_snapshot(db, election_id)
+    if snapshot is not None:
+        body, checksum = snapshot
+        if _etag_matches(request.headers.get("if-none-match"), f'"{checksum}"'):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": f'"{checksum}"'})
+        return snapshot_response(body, checksum)
+    # Live counts change with every vote: the ETag is derived from the body, so clients still
+    # get 304 for unchanged results, and "live-" keeps it apart from the snapshot's once closed
+    body = _dump_json(_load_election_results(db, election_id))
+    headers = {"ETag": f'"live-{hashlib.sha256(body).hexdigest()[:32]}"', "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/api/admin/results/{election_id}/stream")
+async def stream_election_results(election_id: int, db: Session = Depends(get_read_db), admin: UserPrincipal = Depends(get_admin_user)):
+    """Server-Sent Events: one "snapshot" event, then "update" events with changed candidates' counts.
+
+    A closed election's stream is its frozen results as the snapshot event, then nothing.
+    """
+    # Subscribe before reading anything: a vote committed meanwhile then arrives as an update,
+    # and a close after the frozen check below still ends this stream with its "closed" event
+    queue = results_broadcaster.add_subscriber(election_id)
+    try:
+        frozen = await run_db(db, _load_results_snapshot, election_id)
+        snapshot = None if frozen is not None else await run_db(db, _load_election_results, election_id)
+    except BaseException:
+        results_broadcaster.remove_subscriber(election_id, queue)
+        raise
+    # The stream can stay open for hours; do not hold a pooled connection for it
+    await release_db(db)
+    if frozen is not None:
+        results_broadcaster.remove_subscriber(election_id, queue)
+        message = format_event("snapshot", response_json.loads(frozen[0]))
+        return StreamingResponse(iter([message]), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    async def events():
+        try:
+            yield format_event("snapshot", snapshot)
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=RESULTS_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            results_broadcaster.remove_subscriber(election_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _validate_ballot(db: Session, vote_data: VoteCreate):
+    # Check if election exists and is active
+    election = db.query(Election).filter(Election.id == vote_data.election_id).first()
+    if not election:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Election not found")
+    if not election.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Election is not active")
+
+    # Check if candidate exists and belongs to the election
+    candidate = db.query(Candidate).filter(
+        Candidate.id == vote_data.candidate_id,
+        Candidate.election_id == vote_data.election_id
+    ).first()
+    if not candidate:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Candidate not found in this election")
+
+
+def _get_election(db: Session, election_id: int) -> Election:
+    election = db.query(Election).filter(Election.id == election_id).first()
+    if not election:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Election not found")
+    return election
+
+
+def _record_vote(db: Session, user_id: int, vote_data: VoteCreate):
+    # Duplicates are left to _user_election_uc: cast_vote has already ruled out the ones voter_index knows
+    new_vote = Vote(
+        user_id=user_id,
+        election_id=vote_data.election_id,
+        candidate_id=vote_data.candidate_id
+    )
+    db.add(new_vote)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise DuplicateVoteError()
+    key = [(vote_data.election_id, user_id)]
+    hold_own_votes(key)
+    try:
+        if not _elections_accepting_votes(db, [vote_data.election_id]):
+            raise ElectionClosedError()
+        if vote_counter is None:
+            increment_candidate_tally(db, vote_data.election_id, vote_data.candidate_id)
+        db.commit()
+    except BaseException:
+        release_own_votes(key)
+        db.rollback()
+        raise
+    if vote_counter is not None:
+        vote_counter.increment(vote_data.election_id, vote_data.candidate_id)
+    results_broadcaster.publish(vote_data.election_id, vote_data.candidate_id)
+
+
+def _record_sharded_vote(user_id: int, vote_data: VoteCreate):
+    db = vote_shards.session(vote_data.election_id)
+    try:
+        _record_vote(db, user_id, vote_data)
+    finally:
+        db.close()
+
+
+@router.post("/api/vote", status_code=status.HTTP_201_CREATED)
+async def cast_vote(
+    vote_data: VoteCreate,
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    # Check if user is admin
+    if current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins cannot vote")
+    if voter_index.has_voted(vote_data.election_id, current_user.id):
+        duplicate_votes_rejected.inc(source="memory")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You have already voted in this election")
+
+    await run_db(read_db, _validate_ballot, vote_data)
+
+    try:
+        if vote_writer is not None:
+            pending_vote = (current_user.id, vote_data.election_id, vote_data.candidate_id)
+            # Return the pooled connection while this request waits on the writer
+            await release_db(read_db)
+            try:
+                future = vote_writer.submit(pending_vote)
+            except QueueFullError:
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many votes in flight, please retry")
+            await asyncio.wrap_future(future)
+        elif vote_shards is not None:
+            await run_in_threadpool(_record_sharded_vote, current_user.id, vote_data)
+        else:
+            await run_db(db, _record_vote, current_user.id, vote_data)
+    except DuplicateVoteError:
+        # Cast through another process, or before this one started
+        voter_index.add(vote_data.election_id, current_user.id)
+        duplicate_votes_rejected.inc(source="database")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You have already voted in this election")
+    except ElectionClosedError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Election is not active")
+
+    voter_index.add(vote_data.election_id, current_user.id)
+    return {"message": "Vote cast successfully"}
+
+
+@router.post("/api/admin/detach/{election_id}")
+async def detach_election(election_id: int, db: Session = Depends(get_read_db), admin: UserPrincipal = Depends(get_admin_user)):
+    """Move a finished election's vote shard to the archive directory."""
+    if vote_shards is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Vote sharding is not enabled")
+
+    election = await run_db(db, _get_election, election_id)
+    if election.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot detach an active election")
+    if vote_counter is not None:
+        # Counts still held in memory must reach the shard before it is closed
+        await run_in_threadpool(vote_counter.flush)
+
+    try:
+        archive_path = await run_in_threadpool(vote_shards.detach, election_id)
+    except ShardArchivedError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Election votes have already been archived")
+    voter_index.discard(election_id)
+    return {"message": "Election votes archived", "election_id": election_id, "archive_path": archive_path}
+
+
+def _render_page(db: Session, model, criteria, page: PageRequest, schema) -> Tuple[bytes, Optional[str]]:
+    # Select only the schema's (or the requested) columns and encode the tuples as they come back
+    columns = [getattr(model, name) for name in page.fields or schema_fields(schema)]
+    rows, next_cursor = paginate(db.query(*columns).filter(*criteria), model.id, page)
+    return render_rows(rows), next_cursor
+
+
+def _render_active_elections(db: Session, page: PageRequest) -> Tuple[bytes, Optional[str]]:
+    return _render_page(db, Election, [Election.is_active == True], page, ElectionResponse)
+
+
+def _render_candidates(db: Session, election_id: int, page: PageRequest) -> Tuple[bytes, Optional[str]]:
+    # Check if election exists
+    election = db.query(Election.id).filter(Election.id == election_id).first()
+    if not election:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Election not found")
+
+    return _render_page(db, Candidate, [Candidate.election_id == election_id], page, CandidateResponse)
+
+
+def _with_has_voted(user_id: int):
+    """Add the caller's has_voted flag, read from voter_index, to each election in a listing body."""
+    def personalize(body: bytes):
+        elections = response_json.loads(body)
+        flags = []
+        for election in elections:
+            election["has_voted"] = voter_index.has_voted(election["id"], user_id)
+            flags.append("1" if election["has_voted"] else "0")
+        variant = hashlib.sha1(f"{user_id}:{''.join(flags)}".encode("utf-8")).hexdigest()[:8]
+        return _dump_json(elections), variant
+
+    return personalize
+
+
+@router.get("/api/elections", response_model=List[ElectionListing])
+async def list_active_elections(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    # has_voted is not a column: it is added per caller on top of the shared cached page
+    want_has_voted = True
+    if fields:
+        names = [name.strip() for name in fields.split(",")]
+        want_has_voted = "has_voted" in names
+        fields = ",".join(name for name in names if name != "has_voted") or "id"
+    page = parse_page(cursor, limit, fields, ElectionResponse)
+
+    user_id = identify_request(request.scope) if want_has_voted else None
+    personalize = _with_has_voted(int(user_id)) if user_id is not None else None
+    return await cached_listing(
+        request, db, ACTIVE_ELECTIONS_KEY, page, _render_active_elections, personalize=personalize
+    )
+
+
+@router.get("/api/elections/{election_id}/candidates", response_model=List[CandidateResponse])
+async def list_candidates(
+    election_id: int,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    page = parse_page(cursor, limit, fields, CandidateResponse)
+    return await cached_listing(request, db, ("election", election_id), page, _render_candidates, election_id)
+
+
+def _render_dashboard(db: Session, page: PageRequest) -> Tuple[bytes, Optional[str]]:
+    # Two queries whatever the page holds: the elections, then all of their candidates at once
+    columns = [getattr(Election, name) for name in schema_fields(ElectionResponse)]
+    rows, next_cursor = paginate(db.query(*columns).filter(Election.is_active == True), Election.id, page)
+    elections = {row.id: dict(zip(row._fields, row), candidates=[]) for row in rows}
+    if elections:
+        candidate_columns = [getattr(Candidate, name) for name in schema_fields(CandidateResponse)]
+        candidates = db.query(*candidate_columns).filter(
+            Candidate.election_id.in_(list(elections))
+        ).order_by(Candidate.election_id, Candidate.id)
+        for row in candidates:
+            elections[row.election_id]["candidates"].append(dict(zip(row._fields, row)))
+    return _dump_json(list(elections.values())), next_cursor
+
+
+@router.get("/api/dashboard", response_model=List[DashboardElection])
+async def voter_dashboard(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """Active elections with their candidates and the caller's has_voted flag, in one response.
+
+    Paginated by election like /api/elections; each election carries all of its candidates.
+    """
+    page = parse_page(cursor, limit, None, ElectionResponse)
+    return await cached_listing(
+        request, db, DASHBOARD_KEY, page, _render_dashboard, personalize=_with_has_voted(current_user.id)
+    )
+
+
+# -------------------------
+# Voter history
+# -------------------------
+def _load_vote_page(db: Session, user_id: int, page: PageRequest):
+    # A user casts at most one vote per election, so election_id is a unique key within their votes
+    query = db.query(Vote.election_id, Vote.candidate_id, Vote.voted_at).filter(with_parent(User(id=user_id), User.votes))
+    return paginate(query, Vote.election_id, page)
+
+
+def _load_sharded_vote_page(user_id: int, page: PageRequest):
+    """Collect a page of the user's votes from the live shards, one shard per election.
+
+    At most PAGE_SIZE_MAX shards are opened per request; if the page is not
+    full by then it comes back short, with a cursor that resumes the scan.
+    """
+    election_ids = [election_id for election_id in sorted(vote_shards.election_ids())
+                    if page.after is None or election_id > page.after]
+    rows = []
+    for scanned, election_id in enumerate(election_ids[:PAGE_SIZE_MAX], start=1):
+        try:
+            db = vote_shards.session(election_id, read=True)
+        except ShardArchivedError:
+            # Detached since election_ids() was read
+            row = None
+        else:
+            # One lookup per shard database, not per row
+            next_chunk()
+            try:
+                row = db.query(Vote.election_id, Vote.candidate_id, Vote.voted_at).filter(
+                    with_parent(User(id=user_id), User.votes), Vote.election_id == election_id
+                ).first()
+            finally:
+                db.close()
+        if row is not None:
+            rows.append(row)
+        if len(rows) == page.limit or scanned == PAGE_SIZE_MAX:
+            more = scanned < len(election_ids)
+            return rows, encode_cursor(election_id) if more else None
+    return rows, None
+
+
+def _render_vote_history(db: Session, votes) -> bytes:
+    if not votes:
+        return render_rows([])
+    titles = dict(db.query(Election.id, Election.title).filter(Election.id.in_({vote.election_id for vote in votes})))
+    names = dict(db.query(Candidate.id, Candidate.name).filter(Candidate.id.in_({vote.candidate_id for vote in votes})))
+    return _dump_json([
+        {
+            "election_id": vote.election_id,
+            "election_title": titles.get(vote.election_id, ""),
+            "candidate_id": vote.candidate_id,
+            "candidate_name": names.get(vote.candidate_id, ""),
+            "voted_at": vote.voted_at,
+        }
+        for vote in votes
+    ])
+
+
+@router.get("/api/me/votes", response_model=List[VoteHistoryEntry])
+async def list_my_votes(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """The current user's votes in election order, one page at a time."""
+    page = parse_page(cursor, limit, None, VoteHistoryEntry)
+    if vote_shards is None:
+        votes, next_cursor = await run_db(db, _load_vote_page, current_user.id, page)
+    else:
+        # Shard sessions are synchronous in every DB mode
+        votes, next_cursor = await run_in_threadpool(_load_sharded_vote_page, current_user.id, page)
+    body = await run_db(db, _render_vote_history, votes)
+    return Response(content=body, media_type="application/json", headers=page_headers(request, next_cursor))
+
+
+# -------------------------
+# Bulk ingestion
+# -------------------------
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors())
+
+
+def _bulk_format(request: Request, upload_format: Optional[str]) -> str:
+    fmt = detect_format(request.headers.get("content-type"), upload_format)
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Upload text/csv or application/x-ndjson, or pass ?format=csv|ndjson"
+        )
+    return fmt
+
+
+def _validate_rows(chunk, schema, report: ImportReport):
+    valid = []
+    for row_number, fields in chunk:
+        if isinstance(fields, RowError):
+            report.error(row_number, str(fields))
+            continue
+        try:
+            valid.append((row_number, schema(**fields)))
+        except ValidationError as exc:
+            report.error(row_number, _validation_message(exc))
+    return valid
+
+
+def _taken_identities(db: Session, usernames, emails):
+    taken_usernames = {name for (name,) in db.query(User.username).filter(User.username.in_(usernames))}
+    taken_emails = {email for (email,) in db.query(User.email).filter(User.email.in_(emails))}
+    return taken_usernames, taken_emails
+
+
+def _insert_voters(db: Session, rows) -> List[int]:
+    """Insert voter rows in one transaction; on a conflict, retry them one by one.
+
+    Returns the indexes of rows that could not be inserted.
+    """
+    try:
+        db.execute(insert(User), rows)
+        db.commit()
+        return []
+    except IntegrityError:
+        # A concurrent registration claimed a username or email after the pre-check
+        db.rollback()
+
+    failed = []
+    for index, row in enumerate(rows):
+        try:
+            db.execute(insert(User), [row])
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            failed.append(index)
+    return failed
+
+
+def _existing_election_ids(db: Session, election_ids) -> set:
+    return {election_id for (election_id,) in db.query(Election.id).filter(Election.id.in_(election_ids))}
+
+
+def _taken_candidate_names(db: Session, election_ids, names) -> set:
+    return set(db.query(Candidate.election_id, Candidate.name).filter(
+        Candidate.election_id.in_(election_ids), Candidate.name.in_(names)
+    ))
+
+
+def _insert_candidates(db: Session, candidates):
+    new_candidates = [
+        Candidate(election_id=candidate.election_id, name=candidate.name, description=candidate.description)
+        for candidate in candidates
+    ]
+    db.add_all(new_candidates)
+    db.flush()
+    if vote_shards is None:
+        db.add_all([
+            CandidateTally(candidate_id=candidate.id, election_id=candidate.election_id, vote_count=0)
+            for candidate in new_candidates
+        ])
+    record_invalidation(db, [candidate.election_id for candidate in new_candidates])
+    db.commit()
+
+
+@router.post("/api/admin/bulk/voters")
+async def bulk_import_voters(
+    request: Request,
+    upload_format: Optional[str] = Query(None, alias="format"),
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
+    admin: UserPrincipal = Depends(get_admin_user)
+):
+    """Create voter accounts from a streamed CSV (username,email,password) or NDJSON upload."""
+    fmt = _bulk_format(request, upload_format)
+    report = ImportReport(fmt, max_errors=BULK_MAX_ERRORS)
+
+    async for chunk in iter_chunks(iter_rows(request.stream(), fmt, BULK_MAX_LINE_BYTES), BULK_CHUNK_SIZE):
+        next_chunk()
+        report.rows += len(chunk)
+        voters = _validate_rows(chunk, UserRegister, report)
+        if not voters:
+            continue
+
+        taken_usernames, taken_emails = await run_db(
+            read_db, _taken_identities, [voter.username for _, voter in voters], [voter.email for _, voter in voters]
+        )
+        fresh = []
+        for row_number, voter in voters:
+            if voter.username in taken_usernames:
+                report.error(row_number, "Username already registered")
+            elif voter.email in taken_emails:
+                report.error(row_number, "Email already registered")
+            else:
+                # Also catches duplicates within the upload
+                taken_usernames.add(voter.username)
+                taken_emails.add(voter.email)
+                fresh.append((row_number, voter))
+        if not fresh:
+            continue
+
+        hashes = await asyncio.gather(*(password_hasher.hash(voter.password) for _, voter in fresh))
+        rows = [
+            {"username": voter.username, "email": voter.email, "hashed_password": hashed_password, "is_admin": False}
+            for (_, voter), hashed_password in zip(fresh, hashes)
+        ]
+        failed = await run_db(db, _insert_voters, rows)
+        for index in failed:
+            report.error(fresh[index][0], "Username or email already registered")
+        report.created += len(rows) - len(failed)
+
+    return report.as_dict()
+
+
+@router.post("/api/admin/bulk/candidates")
+async def bulk_import_candidates(
+    request: Request,
+    upload_format: Optional[str] = Query(None, alias="format"),
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
+    admin: UserPrincipal = Depends(get_admin_user)
+):
+    """Add candidates from a streamed CSV (election_id,name,description) or NDJSON upload."""
+    fmt = _bulk_format(request, upload_format)
+    report = ImportReport(fmt, max_errors=BULK_MAX_ERRORS)
+    changed_elections = set()
+
+    async for chunk in iter_chunks(iter_rows(request.stream(), fmt, BULK_MAX_LINE_BYTES), BULK_CHUNK_SIZE):
+        next_chunk()
+        report.rows += len(chunk)
+        candidates = _validate_rows(chunk, CandidateCreate, report)
+        if not candidates:
+            continue
+
+        election_ids = {candidate.election_id for _, candidate in candidates}
+        known_elections = await run_db(read_db, _existing_election_ids, election_ids)
+        taken_names = await run_db(read_db, _taken_candidate_names, election_ids, {candidate.name for _, candidate in candidates})
+        accepted = []
+        for row_number, candidate in candidates:
+            if candidate.election_id not in known_elections:
+                report.error(row_number, "Election not found")
+            elif (candidate.election_id, candidate.name) in taken_names:
+                report.error(row_number, "Candidate already in this election")
+            else:
+                # Also catches duplicates within the upload
+                taken_names.add((candidate.election_id, candidate.name))
+                accepted.append(candidate)
+        if not accepted:
+            continue
+
+        await run_db(db, _insert_candidates, accepted)
+        report.created += len(accepted)
+        changed_elections.update(candidate.election_id for candidate in accepted)
+
+    for election_id in changed_elections:
+        bump_listing_versions(election_id)
+    return report.as_dict()
+
+
+# -------------------------
+# Audit export
+# -------------------------
+VOTE_EXPORT_COLUMNS = [
+    ("id", "int"), ("election_id", "int"), ("candidate_id", "int"), ("user_id", "int"), ("voted_at", "str")
+]
+
+
+def vote_export_columns(with_users: bool = False):
+    return VOTE_EXPORT_COLUMNS + ([("username", "str")] if with_users else [])
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # voted_at is stored as naive UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def iter_vote_export(
+    election_id: int,
+    voted_from: Optional[datetime] = None,
+    voted_to: Optional[datetime] = None,
+    with_users: bool = False,
+    chunk_size: int = EXPORT_CHUNK_SIZE
+):
+    """Yield an election's votes in id order, chunk_size rows at a time.
+
+    Each chunk is one keyset query on the (election_id, id) index, resuming after
+    the last id sent, so memory stays flat whatever the election's size; rows are
+    read as Core rows, skipping the ORM's per-row loading. Votes are only ever
+    appended, so stopping at the highest id seen at the start exports the
+    election as it was then. voted_from and voted_to bound voted_at (from
+    inclusive, to exclusive). with_users appends each voter's username: joined in
+    the same query, or looked up once per chunk when votes live in a shard apart
+    from users.
+    """
+    vote_db = vote_session(election_id, read=True)
+    users_db = ReadSessionLocal() if with_users and vote_shards is not None else None
+    try:
+        last_id = vote_db.execute(select(func.max(Vote.id)).where(Vote.election_id == election_id)).scalar()
+        if last_id is None:
+            return
+        # voted_at is sent as stored (ISO 8601, "T" separator) rather than parsed into datetimes
+        query = select(
+            Vote.id, Vote.election_id, Vote.candidate_id, Vote.user_id,
+            func.replace(type_coerce(Vote.voted_at, String), " ", "T")
+        ).where(Vote.election_id == election_id, Vote.id <= last_id).order_by(Vote.id).limit(chunk_size)
+        if with_users and users_db is None:
+            query = query.add_columns(User.username).outerjoin(User, User.id == Vote.user_id)
+        if voted_from is not None:
+            query = query.where(Vote.voted_at >= _naive_utc(voted_from))
+        if voted_to is not None:
+            query = query.where(Vote.voted_at < _naive_utc(voted_to))
+        after = 0
+        while True:
+            next_chunk()
+            rows = vote_db.execute(query.where(Vote.id > after)).all()
+            if not rows:
+                return
+            after = rows[-1].id
+            if users_db is None:
+                yield rows
+            else:
+                usernames = dict(users_db.execute(
+                    select(User.id, User.username).where(User.id.in_({row.user_id for row in rows}))
+                ).all())
+                yield [(*row, usernames.get(row.user_id)) for row in rows]
+            if len(rows) < chunk_size:
+                return
+    finally:
+        vote_db.close()
+        if users_db is not None:
+            users_db.close()
+
+
+def _check_exportable(db: Session, election_id: int):
+    _get_election(db, election_id)
+    if vote_shards is not None and vote_shards.is_archived(election_id):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Election votes have been archived")
+
+
+@router.get("/api/admin/export/votes")
+async def export_votes(
+    election_id: int,
+    export_format: str = Query("csv", alias="format"),
+    voted_from: Optional[datetime] = None,
+    voted_to: Optional[datetime] = None,
+    with_users: bool = False,
+    db: Session = Depends(get_read_db),
+    admin: UserPrincipal = Depends(get_admin_user)
+):
+    """Stream an election's votes for audit as CSV, NDJSON or Arrow, optionally with usernames."""
+    try:
+        check_export_format(export_format)
+    except ExportFormatError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    await run_db(db, _check_exportable, election_id)
+    await release_db(db)
+
+    chunks = iter_vote_export(election_id, voted_from, voted_to, with_users)
+    body = encode_export(vote_export_columns(with_users), chunks, export_format, dumps=response_json.dumps)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="election-{election_id}-votes.{export_format}"'}
+    )
+
+
+if METRICS_ENABLED:
+    @router.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return Response(content=metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/api/admin/cache/stats")
+def get_cache_stats(admin: UserPrincipal = Depends(get_admin_user)):
+    return {
+        "user_cache": user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "listing_cache": listing_cache.stats(),
+        "results_snapshots": results_snapshots.stats(),
+        "idempotency": idempotency_store.stats(),
+        "voter_index": voter_index.stats(),
+        "change_feed": change_feed.stats() if change_feed is not None else None
+    }
+
+
+@router.get("/api/admin/hashing/stats")
+def get_hashing_stats(admin: UserPrincipal = Depends(get_admin_user)):
+    return password_hasher.stats()
+
+
+@router.get("/api/admin/admission/stats")
+def get_admission_stats(admin: UserPrincipal = Depends(get_admin_user)):
+    return {
+        "enabled": ADMISSION_ENABLED,
+        "classes": {name: limiter.stats() for name, limiter in admission_limiters.items()},
+        "rate_limited": user_rate_limiter.limited if user_rate_limiter is not None else 0
+    }
+
+
+# Health checks, outside /api so admission control never turns them away
+@router.get("/health/live")
+def health_live():
+    return {"status": "live"}
+
+
+def _ping_database():
+    with read_engine.connect() as connection:
+        connection.execute(select(1))
+
+
+@router.get("/health/ready")
+async def health_ready(request: Request):
+    """200 once startup and warm-up are done and the database answers; 503 while starting or draining."""
+    state = request.app.state
+    if not state.ready:
+        return JSONResponse(
+            {"status": "starting" if _database_ready.is_set() else "initializing"},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "1"}
+        )
+    try:
+        await run_in_threadpool(_ping_database)
+    except Exception:
+        return JSONResponse(
+            {"status": "database unavailable"},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "1"}
+        )
+    return {"status": "ready", "warm_up": getattr(state, "warm_up_report", None)}
+
+
+# Root endpoint
+@router.get("/")
+def root():
+    return {
+        "message": "Voting System API",
+        "version": "1.0.0",
+        "docs": "/docs"
+    }
+
+
+# -------------------------
+# Application factory
+# -------------------------
+def create_app(warm_up: bool = WARM_UP) -> FastAPI:
+    """Build the ASGI application; the lifespan hook does the startup work, not this call.
+
+    Serve several workers with ``uvicorn --factory app:create_app --workers N``.
+    """
+    application = FastAPI(title="Voting System API", version="1.0.0", lifespan=lifespan)
+    application.state.warm_up = warm_up
+    application.state.ready = False
+    application.include_router(router)
+
+    if ADMISSION_ENABLED:
+        # Added before CORS so that CORS wraps it and 503/429 responses still carry CORS headers
+        application.add_middleware(
+            AdmissionMiddleware,
+            limiters=admission_limiters,
+            classify=classify_request,
+            identify=identify_request,
+            user_limiter=user_rate_limiter,
+            on_reject=record_admission_rejection
+        )
+    # Added after admission control so that replays are answered without taking an admission slot
+    application.add_middleware(
+        IdempotencyMiddleware,
+        store=idempotency_store,
+        routes=IDEMPOTENT_ROUTES,
+        identify=identify_request
+    )
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],   # ensures OPTIONS and all methods allowed
+        allow_headers=["*"],   # allows custom headers like Authorization
+        expose_headers=["ETag", "Link", "X-Next-Cursor", "Idempotent-Replayed"],  # readable by browser scripts
+    )
+    if METRICS_ENABLED:
+        # Added last so it wraps CORS and times the whole request
+        application.add_middleware(
+            MetricsMiddleware,
+            request_latency=request_latency,
+            request_queries=request_queries,
+            request_query_seconds=request_query_seconds,
+            repeated_query_requests=repeated_query_requests,
+            repeat_limit=QUERY_REPEAT_LIMIT
+        )
+    return application
+
+
+app = create_app()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Voting System API")
+    subparsers = parser.add_subparsers(dest="command")
+    serve_parser = subparsers.add_parser("serve", help="Run the API server (default)")
+    serve_parser.add_argument("--workers", type=int, default=1, help="Worker processes, each built by create_app()")
+    reconcile_parser = subparsers.add_parser("reconcile-tallies", help="Rebuild candidate_tallies from the votes table")
+    reconcile_parser.add_argument("--election-id", type=int, default=None, help="Only rebuild this election")
+    subparsers.add_parser("migrate", help="Apply pending schema migrations and report the schema version")
+    export_parser = subparsers.add_parser("export-votes", help="Stream an election's votes for audit")
+    export_parser.add_argument("--election-id", type=int, required=True)
+    export_parser.add_argument("--format", choices=sorted(EXPORT_MEDIA_TYPES), default="csv")
+    export_parser.add_argument("--from", dest="voted_from", type=datetime.fromisoformat, help="Only votes cast at or after this time")
+    export_parser.add_argument("--to", dest="voted_to", type=datetime.fromisoformat, help="Only votes cast before this time")
+    export_parser.add_argument("--with-users", action="store_true", help="Add each voter's username")
+    export_parser.add_argument("--output", default="-", help="File to write (default: standard output)")
+    subparsers.add_parser(
+        "shard-votes",
+        help="Move votes from the main database into per-election shards (requires VOTING_VOTE_SHARDING=election)"
+    )
+    args = parser.parse_args()
+
+    if args.command not in (None, "serve"):
+        init_database()
+    if args.command == "reconcile-tallies":
+        print(f"Rebuilt {reconcile_tallies(args.election_id)} candidate tallies")
+    elif args.command == "migrate":
+        # init_database() above migrated the main database; shards migrate when first opened
+        for shard_election_id in (vote_shards.election_ids() if vote_shards is not None else []):
+            vote_shards.session(shard_election_id).close()
+        with engine.connect() as connection:
+            print(f"Schema version {schema_version(connection)}")
+    elif args.command == "export-votes":
+        import sys
+
+        try:
+            check_export_format(args.format)
+        except ExportFormatError as exc:
+            parser.error(str(exc))
+        db = ReadSessionLocal()
+        try:
+            _check_exportable(db, args.election_id)
+        except HTTPException as exc:
+            parser.error(exc.detail)
+        finally:
+            db.close()
+        chunks = iter_vote_export(args.election_id, args.voted_from, args.voted_to, args.with_users)
+        output = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        try:
+            for piece in encode_export(vote_export_columns(args.with_users), chunks, args.format, dumps=response_json.dumps):
+                output.write(piece)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+    elif args.command == "shard-votes":
+        if vote_shards is None:
+            parser.error("shard-votes requires VOTING_VOTE_SHARDING=election")
+        print(f"Moved {move_votes_to_shards()} votes into shards")
+    else:
+        import uvicorn
+        uvicorn.run("app:create_app", factory=True, host="0.0.0.0", port=8000, workers=getattr(args, "workers", 1))
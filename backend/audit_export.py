@@ -0,0 +1,114 @@
+# audit_export.py
+"""Streaming encoders for large exports: CSV, NDJSON or Arrow.
+
+``encode_export()`` turns an iterator of row chunks (lists of row sequences, as a
+server-side cursor yields them) into an iterator of encoded bytes, one piece
+per chunk, so memory depends on the chunk size and not on the row count.
+
+"arrow" is the Arrow IPC stream format, a columnar format read by
+``pyarrow.ipc.open_stream``, pandas and polars. It needs pyarrow. Parquet is not
+offered: its footer can only be written once the whole file is known, so it
+cannot be streamed.
+"""
+import csv
+import io
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# (name, type): type is "int" or "str"
+ExportColumn = Tuple[str, str]
+
+
+class ExportFormatError(ValueError):
+    pass
+
+
+def check_export_format(fmt: str) -> str:
+    """Return fmt if it can be produced here; raises ExportFormatError otherwise."""
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise ExportFormatError(f"Unknown export format: {fmt!r} (expected 'csv', 'ndjson' or 'arrow')")
+    if fmt == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ExportFormatError("The arrow export format requires pyarrow")
+    return fmt
+
+
+def encode_export(
+    columns: Sequence[ExportColumn],
+    chunks: Iterable[List[tuple]],
+    fmt: str,
+    dumps: Optional[Callable[[dict], bytes]] = None,
+) -> Iterator[bytes]:
+    """Encode each chunk of rows as it arrives. ``dumps`` encodes one NDJSON record."""
+    names = [name for name, _ in columns]
+    if fmt == "csv":
+        return _encode_csv(names, chunks)
+    if fmt == "ndjson":
+        return _encode_ndjson(names, chunks, dumps)
+    if fmt == "arrow":
+        return _encode_arrow(columns, chunks)
+    raise ExportFormatError(f"Unknown export format: {fmt!r}")
+
+
+def _encode_csv(names, chunks) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(names)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _encode_ndjson(names, chunks, dumps) -> Iterator[bytes]:
+    for rows in chunks:
+        yield b"".join(dumps(dict(zip(names, row))) + b"\n" for row in rows)
+
+
+class _ChunkSink(io.RawIOBase):
+    """A write-only file that keeps what was written until drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _encode_arrow(columns, chunks) -> Iterator[bytes]:
+    import pyarrow as pa
+
+    types = {"int": pa.int64(), "str": pa.string()}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for rows in chunks:
+            writer.write_batch(pa.record_batch([list(values) for values in zip(*rows)], schema=schema))
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,120 @@
+# bench_admission.py
+"""Latency under a vote flood, with and without admission control.
+
+Usage:
+    python benchmarks/bench_admission.py [--voters 1000] [--vote-concurrency 64] [--readers 8]
+
+Each setting of VOTING_ADMISSION runs in a fresh subprocess against its own
+temporary database. Voter tasks cast every seeded voter's ballot with
+--vote-concurrency requests in flight, far more than SQLite absorbs, while
+reader tasks poll the candidate listing (listing cache disabled). With
+admission control on, votes beyond the vote class's concurrency and queue are
+answered 503 at once; the report shows what that does to the latency of the
+votes that were accepted and of the reads running alongside them.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from harness import asgi_client, bearer, load_app, seed, summarize
+
+SETTINGS = {"off": "0", "on": "1"}
+
+
+async def drive(app_module, election_id, candidate_ids, user_ids, vote_concurrency, readers):
+    async with asgi_client(app_module) as client:
+        read_latencies, read_statuses, stop = [], {}, asyncio.Event()
+
+        async def read_loop():
+            while not stop.is_set():
+                started = time.perf_counter()
+                response = await client.get(f"/api/elections/{election_id}/candidates")
+                read_latencies.append(time.perf_counter() - started)
+                read_statuses[response.status_code] = read_statuses.get(response.status_code, 0) + 1
+
+        semaphore = asyncio.Semaphore(vote_concurrency)
+        vote_latencies, vote_statuses = [], {}
+
+        async def voter(index, user_id):
+            headers = bearer(app_module, user_id)
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/vote", headers=headers,
+                    json={"election_id": election_id, "candidate_id": candidate_ids[index % len(candidate_ids)]}
+                )
+                if response.status_code == 201:
+                    vote_latencies.append(time.perf_counter() - started)
+                vote_statuses[response.status_code] = vote_statuses.get(response.status_code, 0) + 1
+
+        reader_tasks = [asyncio.create_task(read_loop()) for _ in range(readers)]
+        started = time.perf_counter()
+        await asyncio.gather(*(voter(i, user_id) for i, user_id in enumerate(user_ids)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*reader_tasks)
+
+    return {
+        "reads": dict(summarize(read_latencies), requests=len(read_latencies)),
+        "read_status_codes": {str(code): count for code, count in sorted(read_statuses.items())},
+        "accepted_votes": dict(summarize(vote_latencies), requests=len(vote_latencies)),
+        "vote_status_codes": {str(code): count for code, count in sorted(vote_statuses.items())},
+        "seconds": round(elapsed, 2),
+    }
+
+
+def run_child(admission, voters, vote_concurrency, readers):
+    app_module = load_app("bench_admission_", {
+        "VOTING_ADMISSION": SETTINGS[admission], "VOTING_LISTING_CACHE_SIZE": "0"
+    })
+    data = seed(app_module, voters, candidates=8)
+    election_id = data.election_ids[0]
+    app_module.start_background_workers()
+    try:
+        result = asyncio.run(drive(
+            app_module, election_id, data.candidate_ids[election_id], data.user_ids, vote_concurrency, readers
+        ))
+    finally:
+        app_module.stop_background_workers()
+
+    print(json.dumps(dict(result, admission=admission)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--voters", type=int, default=1000)
+    parser.add_argument("--vote-concurrency", type=int, default=64)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=40)
+    parser.add_argument("--admission", choices=sorted(SETTINGS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.admission:
+        run_child(args.admission, args.voters, args.vote_concurrency, args.readers)
+        return
+
+    results = []
+    for admission in SETTINGS:
+        env = dict(os.environ, VOTING_DB_POOL_SIZE=str(args.pool_size))
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--admission", admission,
+             "--voters", str(args.voters), "--vote-concurrency", str(args.vote_concurrency),
+             "--readers", str(args.readers)],
+            check=True, capture_output=True, text=True, env=env
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'admission':<9} {'requests':<14} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  status codes")
+    for result in results:
+        for label, key, codes in (("reads", "reads", "read_status_codes"), ("accepted votes", "accepted_votes", "vote_status_codes")):
+            stats = result[key]
+            print(f"{result['admission']:<9} {label:<14} {stats['requests']:>6} {stats.get('p50_ms', '-'):>8} "
+                  f"{stats.get('p95_ms', '-'):>8} {stats.get('p99_ms', '-'):>8} {stats.get('max_ms', '-'):>8}  {result[codes]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# bench_cold_start.py
+"""Import time, time to ready and first-request latency after a restart, with and without warm-up.
+
+Usage:
+    python benchmarks/bench_cold_start.py [--elections 50] [--candidates 8] [--logins 16] [--readers 64]
+
+The database is seeded once. Each run then starts a fresh subprocess, as a
+restarted worker would: it imports the app, runs the lifespan startup, waits
+for /health/ready and immediately sends one burst of logins, active election
+listings and candidate listings across the active elections. With
+VOTING_WARM_UP=0 that burst pays for connecting the pools, rendering the
+listings and spawning the password hashing workers; with warm-up those costs
+are paid before the worker reports ready.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from harness import BACKEND_DIR, load_app, seed, summarize
+
+
+async def first_burst(application, election_ids, usernames, password, readers):
+    import httpx
+
+    latencies = {"login": [], "elections": [], "candidates": []}
+    transport = httpx.ASGITransport(app=application)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def timed(kind, method, url, **kwargs):
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies[kind].append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+
+        requests = [
+            timed("login", "POST", "/api/login", json={"username": username, "password": password})
+            for username in usernames
+        ]
+        for i in range(readers):
+            requests.append(timed("elections", "GET", "/api/elections"))
+            election_id = election_ids[i % len(election_ids)]
+            requests.append(timed("candidates", "GET", f"/api/elections/{election_id}/candidates"))
+        await asyncio.gather(*requests)
+    return latencies
+
+
+async def restart(warm_up: bool, election_ids, usernames, password, readers) -> dict:
+    started = time.perf_counter()
+    sys.path.insert(0, BACKEND_DIR)
+    import app as app_module
+    imported = time.perf_counter()
+
+    application = app_module.create_app(warm_up=warm_up)
+    async with application.router.lifespan_context(application):
+        while not application.state.ready:
+            await asyncio.sleep(0.005)
+        ready = time.perf_counter()
+        latencies = await first_burst(application, election_ids, usernames, password, readers)
+
+    result = {
+        "warm_up": warm_up,
+        "import_ms": round((imported - started) * 1000, 1),
+        "ready_ms": round((ready - started) * 1000, 1),
+    }
+    for kind, values in latencies.items():
+        summary = summarize(values)
+        result[f"{kind}_p50_ms"] = summary["p50_ms"]
+        result[f"{kind}_max_ms"] = summary["max_ms"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--elections", type=int, default=50)
+    parser.add_argument("--candidates", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=64)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        spec = json.loads(args.child)
+        result = asyncio.run(restart(spec["warm_up"], spec["election_ids"], spec["usernames"], spec["password"], args.readers))
+        print(json.dumps(result))
+        return
+
+    os.environ.setdefault("VOTING_BCRYPT_ROUNDS", "10")
+    app_module = load_app("bench_cold_start_")
+    data = seed(app_module, voters=args.logins, elections=args.elections, candidates=args.candidates)
+    app_module.engine.dispose()
+
+    results = []
+    for warm_up in (False, True):
+        spec = {"warm_up": warm_up, "election_ids": data.election_ids, "usernames": data.usernames, "password": data.password}
+        # Other VOTING_* settings (database, shard directory, modes) are inherited through the environment
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--readers", str(args.readers), "--child", json.dumps(spec)],
+            check=True, capture_output=True, text=True, env=dict(os.environ, VOTING_USER_RATE="0")
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    kinds = ["login", "elections", "candidates"]
+    print(f"{'warm-up':<8} {'import ms':>10} {'ready ms':>9}" + "".join(f"{kind + ' p50/max ms':>26}" for kind in kinds))
+    for result in results:
+        print(f"{'on' if result['warm_up'] else 'off':<8} {result['import_ms']:>10} {result['ready_ms']:>9}" + "".join(
+            f"{str(result[kind + '_p50_ms']) + ' / ' + str(result[kind + '_max_ms']):>26}" for kind in kinds
+        ))
+
+
+if __name__ == "__main__":
+    main()
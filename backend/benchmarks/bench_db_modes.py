@@ -0,0 +1,102 @@
+# bench_db_modes.py
+"""Request throughput and latency with the sync vs async database mode.
+
+Usage:
+    python benchmarks/bench_db_modes.py [--voters 1000] [--concurrency 64] [--pool-size 40]
+
+Each VOTING_DB_MODE runs in a fresh subprocess against its own temporary
+database. Every simulated voter lists active elections, lists the ballot and
+casts a vote, all in-process through the ASGI app. The default pool size
+matches the threadpool size: a smaller pool lets sync-mode requests hold every
+connection while waiting for a thread.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from harness import asgi_client, load_app, seed, summarize
+
+MODES = ["sync", "async"]
+
+
+
+async def drive(app_module, election_id, candidate_ids, user_ids, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    async with asgi_client(app_module) as client:
+        async def timed(method, url, **kwargs):
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            return response.status_code
+
+        async def voter(index, user_id):
+            headers = {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(user_id)})}"}
+            async with semaphore:
+                await timed("GET", "/api/elections")
+                await timed("GET", f"/api/elections/{election_id}/candidates")
+                return await timed(
+                    "POST", "/api/vote", headers=headers,
+                    json={"election_id": election_id, "candidate_id": candidate_ids[index % len(candidate_ids)]}
+                )
+
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(voter(i, user_id) for i, user_id in enumerate(user_ids)))
+        elapsed = time.perf_counter() - started
+    return elapsed, statuses, latencies
+
+
+def run_child(mode, voters, concurrency):
+    app_module = load_app("bench_db_modes_", {"VOTING_DB_MODE": mode})
+    data = seed(app_module, voters, candidates=8)
+    election_id = data.election_ids[0]
+    candidate_ids, user_ids = data.candidate_ids[election_id], data.user_ids
+    app_module.start_background_workers()
+    try:
+        elapsed, statuses, latencies = asyncio.run(drive(app_module, election_id, candidate_ids, user_ids, concurrency))
+    finally:
+        app_module.stop_background_workers()
+
+    print(json.dumps(dict({
+        "mode": mode,
+        "requests": len(latencies),
+        "votes_accepted": statuses.count(201),
+        "server_errors": sum(1 for code in statuses if code >= 500),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+    }, **summarize(latencies))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--voters", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--pool-size", type=int, default=40)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_child(args.mode, args.voters, args.concurrency)
+        return
+
+    results = []
+    for mode in MODES:
+        env = dict(os.environ, VOTING_DB_POOL_SIZE=str(args.pool_size))
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode,
+             "--voters", str(args.voters), "--concurrency", str(args.concurrency)],
+            check=True, capture_output=True, text=True, env=env
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'mode':<6} {'requests':>9} {'votes':>6} {'5xx':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for result in results:
+        print(f"{result['mode']:<6} {result['requests']:>9} {result['votes_accepted']:>6} {result['server_errors']:>5} "
+              f"{result['requests_per_second']:>9} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
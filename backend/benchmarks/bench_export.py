@@ -0,0 +1,137 @@
+# bench_export.py
+"""Audit export throughput and memory, per format.
+
+Usage:
+    python benchmarks/bench_export.py [--votes 1000000] [--chunk-size 5000] [--with-users]
+
+Seeds one election with ``--votes`` votes (and as many users), then exports it
+once per format in a fresh subprocess, writing to /dev/null the way
+``python app.py export-votes`` does. Reports rows per second and the
+process's peak RSS growth during the export. Python's own memory stays flat;
+what RSS gains is SQLite's page cache and mmap filling with the pages read, up
+to the storage profile's cache_size and mmap_size (VOTING_SQLITE_MMAP_SIZE=0
+isolates the page cache), whatever ``--votes`` is.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from harness import BACKEND_DIR, load_app
+
+
+def seed_votes(app_module, votes: int) -> int:
+    """Insert one election with ``votes`` votes through raw executemany; returns its id."""
+    db = app_module.SessionLocal()
+    try:
+        election = app_module.Election(title="Export benchmark", is_active=False)
+        db.add(election)
+        db.flush()
+        candidates = [app_module.Candidate(election_id=election.id, name=f"Candidate {i}") for i in range(8)]
+        db.add_all(candidates)
+        db.commit()
+        election_id, candidate_ids = election.id, [candidate.id for candidate in candidates]
+    finally:
+        db.close()
+
+    started = datetime(2024, 5, 1)
+    connection = app_module.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        batch = 100000
+        for first in range(0, votes, batch):
+            ids = range(first + 1, min(first + batch, votes) + 1)
+            cursor.executemany(
+                "INSERT INTO users (id, username, email, hashed_password, is_admin) VALUES (?, ?, ?, 'x', 0)",
+                ((i, f"voter{i}", f"voter{i}@bench.local") for i in ids)
+            )
+            cursor.executemany(
+                "INSERT INTO votes (user_id, election_id, candidate_id, voted_at) VALUES (?, ?, ?, ?)",
+                ((i, election_id, candidate_ids[i % len(candidate_ids)],
+                  (started + timedelta(milliseconds=i)).strftime("%Y-%m-%d %H:%M:%S.%f")) for i in ids)
+            )
+            connection.commit()
+    finally:
+        connection.close()
+    return election_id
+
+
+def run_child(election_id: int, fmt: str, chunk_size: int, with_users: bool):
+    sys.path.insert(0, BACKEND_DIR)
+    import app as app_module
+    from audit_export import encode_export
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    rows = 0
+    written = 0
+    with open(os.devnull, "wb") as output:
+        chunks = app_module.iter_vote_export(election_id, with_users=with_users, chunk_size=chunk_size)
+
+        def counted():
+            nonlocal rows
+            for chunk in chunks:
+                rows += len(chunk)
+                yield chunk
+
+        columns = app_module.vote_export_columns(with_users)
+        for piece in encode_export(columns, counted(), fmt, dumps=app_module.response_json.dumps):
+            written += len(piece)
+            output.write(piece)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "format": fmt,
+        "rows": rows,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": int(rows / elapsed),
+        "megabytes": round(written / 1e6, 1),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--votes", type=int, default=1000000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--with-users", action="store_true")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        spec = json.loads(args.child)
+        run_child(spec["election_id"], spec["format"], args.chunk_size, args.with_users)
+        return
+
+    app_module = load_app("bench_export_", {"VOTING_CACHE_SYNC_MS": "0"})
+    election_id = seed_votes(app_module, args.votes)
+    app_module.engine.dispose()
+
+    from audit_export import ExportFormatError, check_export_format
+
+    results = []
+    for fmt in ("csv", "ndjson", "arrow"):
+        try:
+            check_export_format(fmt)
+        except ExportFormatError as exc:
+            print(f"skipping {fmt}: {exc}")
+            continue
+        command = [sys.executable, os.path.abspath(__file__), "--chunk-size", str(args.chunk_size),
+                   "--child", json.dumps({"election_id": election_id, "format": fmt})]
+        if args.with_users:
+            command.append("--with-users")
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'format':<8} {'rows':>10} {'seconds':>8} {'rows/s':>10} {'MB':>8} {'peak RSS +MB':>13}")
+    for result in results:
+        print(f"{result['format']:<8} {result['rows']:>10} {result['seconds']:>8} {result['rows_per_second']:>10} "
+              f"{result['megabytes']:>8} {result['peak_rss_growth_mb']:>13}")
+
+
+if __name__ == "__main__":
+    main()
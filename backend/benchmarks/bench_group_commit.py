@@ -0,0 +1,90 @@
+# bench_group_commit.py
+"""Vote throughput with per-request commits vs the group-commit writer.
+
+Usage:
+    python benchmarks/bench_group_commit.py [--votes 2000] [--concurrency 12]
+
+Each commit mode runs in a fresh subprocess against its own temporary database,
+drives POST /api/vote in-process through the ASGI app and reports votes/second.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from harness import asgi_client, load_app, seed
+
+MODES = ["per_request", "group"]
+
+
+
+async def drive(app_module, election_id, candidate_ids, user_ids, concurrency):
+    tokens = [app_module.create_access_token({"sub": str(user_id)}) for user_id in user_ids]
+    semaphore = asyncio.Semaphore(concurrency)
+    async with asgi_client(app_module) as client:
+        async def vote(index, token):
+            async with semaphore:
+                response = await client.post(
+                    "/api/vote",
+                    json={"election_id": election_id, "candidate_id": candidate_ids[index % len(candidate_ids)]},
+                    headers={"Authorization": f"Bearer {token}"}
+                )
+                return response.status_code
+
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(vote(i, token) for i, token in enumerate(tokens)))
+        elapsed = time.perf_counter() - started
+    return elapsed, statuses
+
+
+def run_child(mode, votes, concurrency):
+    app_module = load_app("bench_group_commit_", {"VOTING_COMMIT_MODE": mode})
+    data = seed(app_module, votes, candidates=8)
+    election_id = data.election_ids[0]
+    candidate_ids, user_ids = data.candidate_ids[election_id], data.user_ids
+    app_module.start_background_workers()
+    try:
+        elapsed, statuses = asyncio.run(drive(app_module, election_id, candidate_ids, user_ids, concurrency))
+    finally:
+        app_module.stop_background_workers()
+
+    print(json.dumps({
+        "mode": mode,
+        "votes": votes,
+        "concurrency": concurrency,
+        "accepted": statuses.count(201),
+        "seconds": round(elapsed, 3),
+        "votes_per_second": round(votes / elapsed, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--votes", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=12)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_child(args.mode, args.votes, args.concurrency)
+        return
+
+    results = []
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode,
+             "--votes", str(args.votes), "--concurrency", str(args.concurrency)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'mode':<12} {'accepted':>9} {'seconds':>9} {'votes/s':>10}")
+    for result in results:
+        print(f"{result['mode']:<12} {result['accepted']:>9} {result['seconds']:>9} {result['votes_per_second']:>10}")
+
+
+if __name__ == "__main__":
+    main()
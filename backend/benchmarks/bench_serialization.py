@@ -0,0 +1,134 @@
+# bench_serialization.py
+"""Time to build the active elections, candidate listing and results bodies, per serialization path.
+
+Usage:
+    python benchmarks/bench_serialization.py [--elections 1000] [--candidates 2000] [--iterations 50]
+
+Each iteration runs what the endpoint does on a listing cache miss: the
+query and the encoding of one full page (VOTING_PAGE_SIZE_MAX rows) or of the
+whole results body. Paths:
+
+    schema          ORM objects validated through the response schema, then
+                    jsonable_encoder and json.dumps (how these bodies were built
+                    before they were encoded from column tuples)
+    tuples+stdlib   column tuples encoded by the standard library
+    tuples+orjson   column tuples encoded by orjson (skipped if not installed)
+"""
+import argparse
+import json
+import time
+
+from sqlalchemy import insert
+
+from harness import load_app, seed
+
+
+def _schema_dumps(content) -> bytes:
+    from fastapi.encoders import jsonable_encoder
+
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def schema_paths(app_module, election_id):
+    """The listing and results bodies built through ORM objects and pydantic models."""
+    def validate(schema, objects):
+        return [schema.model_validate(obj, from_attributes=True) for obj in objects]
+
+    def elections(db):
+        rows = db.query(app_module.Election).filter(app_module.Election.is_active == True).order_by(
+            app_module.Election.id
+        ).limit(app_module.PAGE_SIZE_MAX).all()
+        return _schema_dumps(validate(app_module.ElectionResponse, rows))
+
+    def candidates(db):
+        rows = db.query(app_module.Candidate).filter(app_module.Candidate.election_id == election_id).order_by(
+            app_module.Candidate.id
+        ).limit(app_module.PAGE_SIZE_MAX).all()
+        return _schema_dumps(validate(app_module.CandidateResponse, rows))
+
+    def results(db):
+        content = app_module._load_election_results(db, election_id)
+        model = app_module.ElectionResults(
+            election_id=content["election_id"],
+            election_title=content["election_title"],
+            total_votes=content["total_votes"],
+            results=[app_module.VoteResult(**result) for result in content["results"]],
+        )
+        # FastAPI validated the returned model against response_model before encoding it
+        return _schema_dumps(app_module.ElectionResults.model_validate(model, from_attributes=True))
+
+    return {"elections": elections, "candidates": candidates, "results": results}
+
+
+def tuple_paths(app_module, election_id):
+    page = app_module.parse_page(None, app_module.PAGE_SIZE_MAX, None, app_module.ElectionResponse)
+    return {
+        "elections": lambda db: app_module._render_active_elections(db, page)[0],
+        "candidates": lambda db: app_module._render_candidates(db, election_id, page)[0],
+        "results": lambda db: app_module._dump_json(app_module._load_election_results(db, election_id)),
+    }
+
+
+def measure(app_module, render, iterations):
+    db = app_module.ReadSessionLocal()
+    try:
+        render(db)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            render(db)
+            db.rollback()
+        return (time.perf_counter() - started) / iterations
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--elections", type=int, default=1000)
+    parser.add_argument("--candidates", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    app_module = load_app("bench_serialization_")
+    from fast_json import json_codec
+
+    data = seed(app_module, voters=0, elections=args.elections, candidates=1)
+    election_id = data.election_ids[0]
+    db = app_module.SessionLocal()
+    try:
+        db.execute(insert(app_module.Candidate), [
+            {"election_id": election_id, "name": f"Candidate {i}", "description": f"Platform of candidate {i}"}
+            for i in range(args.candidates)
+        ])
+        db.commit()
+        app_module.rebuild_candidate_tallies(db, election_id)
+    finally:
+        db.close()
+
+    paths = [("schema", None, schema_paths(app_module, election_id))]
+    for encoder in ("stdlib", "orjson"):
+        try:
+            codec = json_codec(encoder)
+        except ImportError:
+            continue
+        paths.append((f"tuples+{encoder}", codec, tuple_paths(app_module, election_id)))
+
+    timings = {}
+    for name, codec, renders in paths:
+        if codec is not None:
+            app_module.response_json = codec
+        timings[name] = {body: measure(app_module, render, args.iterations) for body, render in renders.items()}
+
+    bodies = ["elections", "candidates", "results"]
+    print(f"{'path':<15}" + "".join(f"{body + ' ms':>16}" for body in bodies))
+    for name, timing in timings.items():
+        print(f"{name:<15}" + "".join(f"{timing[body] * 1000:>16.2f}" for body in bodies))
+    baseline = timings["schema"]
+    for name, timing in timings.items():
+        if name != "schema":
+            speedups = ", ".join(f"{body} {baseline[body] / timing[body]:.1f}x" for body in bodies)
+            print(f"{name} speedup over schema: {speedups}")
+
+
+if __name__ == "__main__":
+    main()
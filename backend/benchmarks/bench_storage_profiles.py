@@ -0,0 +1,134 @@
+# bench_storage_profiles.py
+"""Read latency under a sustained vote load, per SQLite storage profile.
+
+Usage:
+    python benchmarks/bench_storage_profiles.py [--voters 2000] [--vote-concurrency 16] [--readers 8]
+
+Each VOTING_STORAGE_PROFILE runs in a fresh subprocess against its own
+temporary database. Reader tasks poll the candidate listing and the admin
+results endpoint first on an idle database and then while voter tasks cast
+every seeded voter's ballot. The listing cache is disabled so every read
+reaches SQLite.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from harness import asgi_client, bearer, load_app, seed, summarize
+
+PROFILES = ["default", "wal"]
+
+
+
+async def drive(app_module, election_id, candidate_ids, user_ids, admin_id, vote_concurrency, readers, idle_seconds):
+    admin_headers = bearer(app_module, admin_id)
+    read_urls = [f"/api/elections/{election_id}/candidates", f"/api/admin/results/{election_id}"]
+    async with asgi_client(app_module) as client:
+        async def read_loop(latencies, errors, stop):
+            index = 0
+            while not stop.is_set():
+                started = time.perf_counter()
+                response = await client.get(read_urls[index % len(read_urls)], headers=admin_headers)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 500:
+                    errors.append(response.status_code)
+                index += 1
+
+        async def read_phase(run):
+            latencies, errors, stop = [], [], asyncio.Event()
+            tasks = [asyncio.create_task(read_loop(latencies, errors, stop)) for _ in range(readers)]
+            result = await run()
+            stop.set()
+            await asyncio.gather(*tasks)
+            return result, latencies, errors
+
+        _, idle_latencies, idle_errors = await read_phase(lambda: asyncio.sleep(idle_seconds))
+
+        semaphore = asyncio.Semaphore(vote_concurrency)
+
+        async def voter(index, user_id):
+            headers = bearer(app_module, user_id)
+            async with semaphore:
+                response = await client.post(
+                    "/api/vote", headers=headers,
+                    json={"election_id": election_id, "candidate_id": candidate_ids[index % len(candidate_ids)]}
+                )
+                return response.status_code
+
+        async def vote_load():
+            started = time.perf_counter()
+            statuses = await asyncio.gather(*(voter(i, user_id) for i, user_id in enumerate(user_ids)))
+            return time.perf_counter() - started, statuses
+
+        (elapsed, statuses), loaded_latencies, loaded_errors = await read_phase(vote_load)
+
+    return {
+        "idle_reads": dict(summarize(idle_latencies), reads=len(idle_latencies)),
+        "loaded_reads": dict(summarize(loaded_latencies), reads=len(loaded_latencies)),
+        "read_server_errors": len(idle_errors) + len(loaded_errors),
+        "votes_accepted": statuses.count(201),
+        "vote_server_errors": sum(1 for code in statuses if code >= 500),
+        "votes_per_second": round(len(statuses) / elapsed, 1),
+    }
+
+
+def run_child(profile, voters, vote_concurrency, readers, idle_seconds):
+    app_module = load_app("bench_storage_profiles_", {"VOTING_STORAGE_PROFILE": profile, "VOTING_LISTING_CACHE_SIZE": "0"})
+    data = seed(app_module, voters, candidates=8, admin=True)
+    election_id = data.election_ids[0]
+    candidate_ids, user_ids, admin_id = data.candidate_ids[election_id], data.user_ids, data.admin_id
+    app_module.start_background_workers()
+    try:
+        result = asyncio.run(drive(
+            app_module, election_id, candidate_ids, user_ids, admin_id, vote_concurrency, readers, idle_seconds
+        ))
+    finally:
+        app_module.stop_background_workers()
+
+    print(json.dumps(dict(result, profile=profile)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--voters", type=int, default=2000)
+    parser.add_argument("--vote-concurrency", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--idle-seconds", type=float, default=2.0)
+    parser.add_argument("--pool-size", type=int, default=40)
+    parser.add_argument("--profile", choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        run_child(args.profile, args.voters, args.vote_concurrency, args.readers, args.idle_seconds)
+        return
+
+    results = []
+    for profile in PROFILES:
+        env = dict(os.environ, VOTING_DB_POOL_SIZE=str(args.pool_size))
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--profile", profile,
+             "--voters", str(args.voters), "--vote-concurrency", str(args.vote_concurrency),
+             "--readers", str(args.readers), "--idle-seconds", str(args.idle_seconds)],
+            check=True, capture_output=True, text=True, env=env
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'profile':<8} {'phase':<7} {'reads':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for result in results:
+        for phase in ("idle", "loaded"):
+            reads = result[f"{phase}_reads"]
+            print(f"{result['profile']:<8} {phase:<7} {reads['reads']:>7} {reads.get('p50_ms', '-'):>8} "
+                  f"{reads.get('p95_ms', '-'):>8} {reads.get('p99_ms', '-'):>8} {reads.get('max_ms', '-'):>8}")
+    print()
+    print(f"{'profile':<8} {'votes':>6} {'votes/s':>8} {'vote 5xx':>9} {'read 5xx':>9}")
+    for result in results:
+        print(f"{result['profile']:<8} {result['votes_accepted']:>6} {result['votes_per_second']:>8} "
+              f"{result['vote_server_errors']:>9} {result['read_server_errors']:>9}")
+
+
+if __name__ == "__main__":
+    main()
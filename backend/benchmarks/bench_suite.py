@@ -0,0 +1,206 @@
+# bench_suite.py
+"""End-to-end load and latency suite for the voting API.
+
+Usage:
+    python benchmarks/bench_suite.py [--users 1000] [--elections 4] [--concurrency 32]
+                                     [--set VOTING_DB_MODE=async ...] [--output results.json]
+                                     [--compare previous.json]
+
+The ASGI app runs in-process against a fresh temporary database seeded with
+--users voters, --elections active elections and --candidates candidates
+each. The workloads then run one after another, each with --concurrency
+requests in flight:
+
+    register   new accounts (POST /api/register)
+    login      seeded voters log in (POST /api/login)
+    elections  active elections listing (GET /api/elections)
+    vote       every seeded voter votes once (POST /api/vote)
+    results    an admin reads results (GET /api/admin/results/{id})
+
+For each workload the suite reports throughput, p50/p95/p99 latency, status
+codes and SQL statements per request, and writes everything (with the git
+commit and VOTING_* settings) to a JSON file. --compare prints the change
+against an earlier results file. bcrypt runs at --bcrypt-rounds (default 4)
+so that register and login measure the request path rather than bcrypt's cost.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from harness import BACKEND_DIR, QueryCounter, asgi_client, bearer, current_label, load_app, seed, summarize
+
+WORKLOADS = ["register", "login", "elections", "vote", "results"]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_workload(client, counter, name, requests, concurrency):
+    """Send ``requests`` (method, url, kwargs) with ``concurrency`` in flight and summarize them."""
+    latencies = []
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(method, url, kwargs):
+        async with semaphore:
+            current_label.set(name)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    queries_before = counter.counts.get(name, 0)
+    started = time.perf_counter()
+    await asyncio.gather(*(send(method, url, kwargs) for method, url, kwargs in requests))
+    elapsed = time.perf_counter() - started
+    queries = counter.counts.get(name, 0) - queries_before
+
+    return dict(
+        {
+            "requests": len(requests),
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(len(requests) / elapsed, 1) if elapsed else None,
+            "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+            "client_errors": sum(count for code, count in statuses.items() if 400 <= code < 500),
+            "server_errors": sum(count for code, count in statuses.items() if code >= 500),
+            "queries_per_request": round(queries / len(requests), 2) if requests else None,
+        },
+        **summarize(latencies)
+    )
+
+
+def build_requests(app_module, data, args):
+    voters = list(zip(data.user_ids, data.usernames))
+    admin_headers = bearer(app_module, data.admin_id)
+    requests = {
+        "register": [
+            ("POST", "/api/register", {"json": {
+                "username": f"newuser{i}", "email": f"newuser{i}@example.com", "password": "benchmark"
+            }})
+            for i in range(args.registrations)
+        ],
+        "login": [
+            ("POST", "/api/login", {"json": {"username": voters[i % len(voters)][1], "password": data.password}})
+            for i in range(args.logins)
+        ],
+        "elections": [("GET", "/api/elections", {}) for _ in range(args.reads)],
+        "vote": [],
+        "results": [
+            ("GET", f"/api/admin/results/{data.election_ids[i % len(data.election_ids)]}", {"headers": admin_headers})
+            for i in range(args.reads)
+        ],
+    }
+    for index, (user_id, _) in enumerate(voters):
+        election_id = data.election_ids[index % len(data.election_ids)]
+        candidate_ids = data.candidate_ids[election_id]
+        requests["vote"].append(("POST", "/api/vote", {
+            "headers": bearer(app_module, user_id),
+            "json": {"election_id": election_id, "candidate_id": candidate_ids[index % len(candidate_ids)]},
+        }))
+    return requests
+
+
+async def drive(app_module, data, args):
+    requests = build_requests(app_module, data, args)
+    results = {}
+    with QueryCounter() as counter:
+        async with asgi_client(app_module) as client:
+            for name in WORKLOADS:
+                results[name] = await run_workload(client, counter, name, requests[name], args.concurrency)
+    return results
+
+
+def print_report(report, baseline=None):
+    print(f"commit {report['git_commit']}  settings {report['settings'] or '{}'}")
+    header = f"{'workload':<10} {'requests':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/req':>6} {'4xx':>5} {'5xx':>5}"
+    if baseline:
+        header += f" {'req/s vs base':>14} {'p95 vs base':>12}"
+    print(header)
+    for name, result in report["workloads"].items():
+        line = (f"{name:<10} {result['requests']:>8} {result['requests_per_second']:>9} {result.get('p50_ms', '-'):>8} "
+                f"{result.get('p95_ms', '-'):>8} {result.get('p99_ms', '-'):>8} {result['queries_per_request']:>6} "
+                f"{result['client_errors']:>5} {result['server_errors']:>5}")
+        previous = (baseline or {}).get("workloads", {}).get(name)
+        if previous:
+            line += f" {percent_change(previous.get('requests_per_second'), result['requests_per_second']):>14}"
+            line += f" {percent_change(previous.get('p95_ms'), result.get('p95_ms')):>12}"
+        print(line)
+
+
+def percent_change(before, after):
+    if not before or after is None:
+        return "-"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="Seeded voters; each votes once")
+    parser.add_argument("--elections", type=int, default=4)
+    parser.add_argument("--candidates", type=int, default=8)
+    parser.add_argument("--registrations", type=int, default=200)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--reads", type=int, default=1000, help="Requests for each read workload")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--set", dest="settings", action="append", default=[], metavar="VOTING_NAME=VALUE",
+                        help="App setting for this run; may be repeated")
+    parser.add_argument("--output", default=None, help="Results file (default: benchmarks/results/suite-<commit>-<time>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    settings = dict(setting.split("=", 1) for setting in args.settings)
+    settings.setdefault("VOTING_BCRYPT_ROUNDS", str(args.bcrypt_rounds))
+    settings.setdefault("VOTING_DB_POOL_SIZE", str(args.concurrency))
+    app_module = load_app("bench_suite_", settings)
+
+    data = seed(app_module, args.users, elections=args.elections, candidates=args.candidates, admin=True)
+    app_module.start_background_workers()
+    try:
+        workloads = asyncio.run(drive(app_module, data, args))
+    finally:
+        app_module.stop_background_workers()
+
+    report = {
+        "suite": "bench_suite",
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": settings,
+        "parameters": {
+            name: getattr(args, name)
+            for name in ("users", "elections", "candidates", "registrations", "logins", "reads", "concurrency")
+        },
+        "workloads": workloads,
+    }
+
+    output = args.output
+    if output is None:
+        results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+        os.makedirs(results_dir, exist_ok=True)
+        output = os.path.join(results_dir, f"suite-{report['git_commit'] or 'nogit'}-{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\nwrote {output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
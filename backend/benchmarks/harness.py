@@ -0,0 +1,153 @@
+# harness.py
+"""Shared setup for the in-process benchmarks.
+
+``load_app()`` points the app at a fresh temporary database (and shard
+directory) before importing it, ``seed()`` fills that database directly
+through the ORM, and ``asgi_client()`` drives the app in-process without a
+server. ``QueryCounter`` counts the SQL statements executed per label; the
+label is a context variable, so statements run on the threadpool or in an
+AsyncSession's greenlet are attributed to the request that caused them.
+Work done on background threads (the group-commit writer, the counter
+flusher) is not attributed to any request.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(prefix: str, settings: Optional[Dict[str, str]] = None):
+    """Import the app against a new temporary database; ``settings`` are VOTING_* environment overrides."""
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    os.environ["VOTING_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["VOTING_VOTE_SHARD_DIR"] = os.path.join(workdir, "vote_shards")
+    # Benchmarks send thousands of requests with a handful of tokens, so per-user rate limits are off
+    os.environ.setdefault("VOTING_USER_RATE", "0")
+    os.environ.update(settings or {})
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    import app as app_module
+    # Importing does no I/O; seed() needs the schema before the app has started
+    app_module.init_database()
+    return app_module
+
+
+@dataclass
+class SeedData:
+    election_ids: List[int]
+    # election_id -> candidate ids
+    candidate_ids: Dict[int, List[int]]
+    user_ids: List[int]
+    admin_id: Optional[int] = None
+    password: str = "benchmark"
+    usernames: List[str] = field(default_factory=list)
+
+
+def seed(app_module, voters: int, elections: int = 1, candidates: int = 8, admin: bool = False) -> SeedData:
+    """Create active elections, their candidates and ``voters`` users who share one password."""
+    db = app_module.SessionLocal()
+    try:
+        data = SeedData(election_ids=[], candidate_ids={}, user_ids=[])
+        hashed = asyncio.run(app_module.password_hasher.hash(data.password))
+        # Leave the hash workers for the app to start, as it does in production
+        app_module.password_hasher.shutdown()
+        users = [
+            app_module.User(username=f"voter{i}", email=f"voter{i}@bench.local", hashed_password=hashed)
+            for i in range(voters)
+        ]
+        db.add_all(users)
+        admin_user = None
+        if admin:
+            admin_user = app_module.User(username="admin", email="admin@bench.local", hashed_password=hashed, is_admin=True)
+            db.add(admin_user)
+
+        election_rows = [app_module.Election(title=f"Benchmark election {i}", is_active=True) for i in range(elections)]
+        db.add_all(election_rows)
+        db.flush()
+        candidate_rows = [
+            app_module.Candidate(election_id=election.id, name=f"Candidate {i}")
+            for election in election_rows
+            for i in range(candidates)
+        ]
+        db.add_all(candidate_rows)
+        db.flush()
+        if app_module.vote_shards is None:
+            db.add_all([
+                app_module.CandidateTally(candidate_id=candidate.id, election_id=candidate.election_id, vote_count=0)
+                for candidate in candidate_rows
+            ])
+        db.commit()
+
+        data.election_ids = [election.id for election in election_rows]
+        for candidate in candidate_rows:
+            data.candidate_ids.setdefault(candidate.election_id, []).append(candidate.id)
+        data.user_ids = [user.id for user in users]
+        data.usernames = [user.username for user in users]
+        data.admin_id = admin_user.id if admin_user is not None else None
+        return data
+    finally:
+        db.close()
+
+
+def bearer(app_module, user_id: int) -> dict:
+    return {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(user_id)})}"}
+
+
+def asgi_client(app_module):
+    import httpx
+
+    # Server errors (e.g. SQLite lock timeouts) are returned as 500s and counted rather than raised
+    transport = httpx.ASGITransport(app=app_module.app, raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench")
+
+
+def summarize(latencies: List[float]) -> dict:
+    """Latency percentiles in milliseconds."""
+    if not latencies:
+        return {}
+    if len(latencies) == 1:
+        only = round(latencies[0] * 1000, 2)
+        return {"p50_ms": only, "p95_ms": only, "p99_ms": only, "max_ms": only}
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p95_ms": round(quantiles[94] * 1000, 2),
+        "p99_ms": round(quantiles[98] * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+
+current_label: ContextVar[Optional[str]] = ContextVar("bench_query_label", default=None)
+
+
+class QueryCounter:
+    """Counts SQL statements on every engine, keyed by ``current_label``."""
+
+    def __init__(self):
+        self.counts: Dict[Optional[str], int] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        label = current_label.get()
+        with self._lock:
+            self.counts[label] = self.counts.get(label, 0) + 1
+
+    def __enter__(self):
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        event.listen(Engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        event.remove(Engine, "before_cursor_execute", self._record)
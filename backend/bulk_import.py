@@ -0,0 +1,140 @@
+# bulk_import.py
+"""Streaming parsers for bulk CSV / NDJSON uploads.
+
+Rows are decoded as the request body arrives and handed out in fixed-size
+chunks, so memory use depends on the chunk size, not on the upload size.
+CSV uploads start with a header row; each record must fit on one line, of at
+most ``max_line_bytes``. Rows are numbered by their line in the upload.
+"""
+import csv
+import json
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+CSV_MEDIA_TYPES = {"text/csv", "application/csv"}
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"}
+
+
+class RowError(Exception):
+    pass
+
+
+# (line_number, fields) for a parsed row or (line_number, RowError) for one that could not be parsed
+ParsedRow = Tuple[int, Union[dict, RowError]]
+
+
+def detect_format(content_type: Optional[str], requested: Optional[str] = None) -> Optional[str]:
+    if requested in ("csv", "ndjson"):
+        return requested
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in CSV_MEDIA_TYPES:
+        return "csv"
+    if media_type in NDJSON_MEDIA_TYPES:
+        return "ndjson"
+    return None
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = 64 * 1024) -> AsyncIterator[Optional[str]]:
+    """Yield each line of the upload, or None for a line longer than max_line_bytes.
+
+    Each chunk is scanned once, and at most max_line_bytes of a line are held
+    while waiting for its end: an oversize line is dropped as it arrives.
+    """
+    parts: List[bytes] = []
+    length = 0
+    oversize = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end == -1 else chunk[start:end]
+            if not oversize:
+                length += len(piece)
+                if length > max_line_bytes:
+                    oversize = True
+                    parts = []
+                else:
+                    parts.append(piece)
+            if end == -1:
+                break
+            yield None if oversize else b"".join(parts).rstrip(b"\r").decode("utf-8", errors="replace")
+            parts, length, oversize = [], 0, False
+            start = end + 1
+    if oversize:
+        yield None
+    elif length:
+        yield b"".join(parts).rstrip(b"\r").decode("utf-8", errors="replace")
+
+
+async def iter_rows(chunks: AsyncIterator[bytes], fmt: str, max_line_bytes: int = 64 * 1024) -> AsyncIterator[ParsedRow]:
+    header: Optional[List[str]] = None
+    line_number = 0
+    async for line in iter_lines(chunks, max_line_bytes):
+        line_number += 1
+        if line is None:
+            yield line_number, RowError(f"Line is longer than {max_line_bytes} bytes")
+            if fmt == "csv" and header is None:
+                # Nothing after an unreadable header can be parsed
+                return
+            continue
+        if line_number == 1:
+            line = line.lstrip("\ufeff")
+        if not line.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = [name.strip() for name in next(csv.reader([line]))]
+            continue
+
+        if fmt == "csv":
+            values = next(csv.reader([line]))
+            if len(values) != len(header):
+                yield line_number, RowError(f"Expected {len(header)} columns, got {len(values)}")
+                continue
+            yield line_number, {name: (value if value != "" else None) for name, value in zip(header, values)}
+        else:
+            try:
+                fields = json.loads(line)
+            except ValueError as exc:
+                yield line_number, RowError(f"Invalid JSON: {exc}")
+                continue
+            if not isinstance(fields, dict):
+                yield line_number, RowError("Each line must be a JSON object")
+                continue
+            yield line_number, fields
+
+
+async def iter_chunks(rows: AsyncIterator[ParsedRow], size: int) -> AsyncIterator[List[ParsedRow]]:
+    chunk: List[ParsedRow] = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ImportReport:
+    """Per-row outcome of a bulk import; keeps at most ``max_errors`` error details."""
+
+    def __init__(self, fmt: str, max_errors: int = 1000):
+        self.format = fmt
+        self.max_errors = max_errors
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def error(self, row_number: int, message: str):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row_number, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "format": self.format,
+            "rows": self.rows,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
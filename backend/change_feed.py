@@ -0,0 +1,121 @@
+# change_feed.py
+"""Cache coherence between worker processes that share one SQLite database.
+
+Each worker keeps its own in-process caches, so a change committed through
+one worker has to reach the caches of the others. ``ChangeFeed`` does that
+with the database alone, without a broker or socket: a background thread
+holds one connection and every ``interval`` seconds runs ``PRAGMA
+data_version``, which SQLite answers without reading a page and which changes
+exactly when another connection has committed. Only then is
+``on_change(connection)`` called to read what was logged since the last call
+(rows past a cursor) and drop or refresh the affected entries. A committed
+change is therefore applied in every worker within one interval plus the
+time to read it.
+
+Further databases, such as per-election vote shards, are watched the same
+way, each on its own connection; a ``discover`` callback run before every
+poll adds the ones created since and drops the ones gone.
+"""
+import logging
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Watched:
+    __slots__ = ("engine", "on_change", "version")
+
+    def __init__(self, engine, on_change: Callable):
+        self.engine = engine
+        self.on_change = on_change
+        self.version: Optional[int] = None
+
+
+class ChangeFeed:
+    def __init__(self, engine, on_change: Callable, interval: float = 0.25, discover: Optional[Callable] = None):
+        """``engine`` must always hand out the same connection (a StaticPool): data_version is per connection.
+
+        ``discover(feed)``, if given, is called before each poll to watch() or unwatch() further databases.
+        """
+        self.engine = engine
+        self.interval = interval
+        self._discover = discover
+        # None is the main database
+        self._watched: Dict[Hashable, _Watched] = {None: _Watched(engine, on_change)}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.polls = 0
+        self.changes = 0
+
+    def poll(self) -> bool:
+        """Check every watched database once, calling its on_change if it changed; returns whether any did."""
+        if self._discover is not None:
+            self._discover(self)
+        changed = False
+        with self._lock:
+            self.polls += 1
+            for key, watched in self._watched.items():
+                try:
+                    changed = self._check(watched) or changed
+                except Exception:
+                    if key is None:
+                        raise
+                    # One unreadable shard must not hold back the others
+                    logger.exception("Change feed poll of %s failed", key)
+            if changed:
+                self.changes += 1
+        return changed
+
+    def _check(self, watched: _Watched) -> bool:
+        with watched.engine.connect() as connection:
+            version = connection.exec_driver_sql("PRAGMA data_version").scalar()
+            if version == watched.version:
+                return False
+            # Read after taking the version: a commit in between is read now and polled again next time.
+            # If on_change fails, the version is not kept and the next poll calls it again
+            watched.on_change(connection)
+            watched.version = version
+            return True
+
+    def watch(self, key: Hashable, engine, on_change: Callable):
+        """Also poll the database behind ``engine``, a StaticPool engine of its own; on_change runs on the first poll."""
+        with self._lock:
+            self._watched[key] = _Watched(engine, on_change)
+
+    def unwatch(self, key: Hashable):
+        """Stop polling a database added with watch() and close its connection."""
+        with self._lock:
+            watched = self._watched.pop(key, None)
+        if watched is not None:
+            watched.engine.dispose()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Change feed poll failed")
+
+    def stats(self) -> dict:
+        return {
+            "interval_ms": self.interval * 1000,
+            "databases": len(self._watched),
+            "polls": self.polls,
+            "changes": self.changes,
+        }
@@ -0,0 +1,33 @@
+# conftest.py
+"""Test settings, applied before any test module imports the app.
+
+Every test run uses a throwaway database and strict query checking, so a
+request that repeats one statement per row (an N+1 loop) fails the test.
+"""
+import os
+import tempfile
+
+import pytest
+
+_workdir = tempfile.mkdtemp(prefix="voting_tests_")
+os.environ["VOTING_DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ["VOTING_VOTE_SHARD_DIR"] = os.path.join(_workdir, "vote_shards")
+os.environ["VOTING_HASH_WORKERS"] = "0"
+os.environ["VOTING_BCRYPT_ROUNDS"] = "4"
+os.environ["VOTING_COUNTER_MODE"] = "database"
+# test_db_modes reruns modules with sharding on
+os.environ.setdefault("VOTING_VOTE_SHARDING", "off")
+os.environ["VOTING_METRICS"] = "1"
+os.environ["VOTING_QUERY_STRICT"] = "1"
+# Tests that need a warmed app build one with create_app(warm_up=True)
+os.environ["VOTING_WARM_UP"] = "0"
+# No background polling in process: statement counts stay per request. test_change_feed runs workers with it on
+os.environ["VOTING_CACHE_SYNC_MS"] = "0"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Create the schema for tests that use sessions without starting the app."""
+    import app as app_module
+
+    app_module.init_database()
@@ -0,0 +1,47 @@
+# fast_json.py
+"""JSON encoding for the response bodies the app serializes itself.
+
+``json_codec()`` picks an encoder by name. "orjson" encodes in C and is
+several times faster than the standard library; "stdlib" needs no extra
+package; "auto" uses orjson when it is installed. Both produce the same
+compact UTF-8 bytes for the values these bodies contain: str keys, str, int,
+bool, None, lists, and naive datetimes in ISO 8601, as FastAPI's own
+encoder writes them.
+"""
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Callable
+
+
+@dataclass(frozen=True)
+class JsonCodec:
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+def _encode_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(content) -> bytes:
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_encode_default
+    ).encode("utf-8")
+
+
+def json_codec(name: str = "auto") -> JsonCodec:
+    if name in ("auto", "orjson"):
+        try:
+            import orjson
+        except ImportError:
+            if name == "orjson":
+                raise
+        else:
+            return JsonCodec("orjson", orjson.dumps, orjson.loads)
+    if name in ("auto", "stdlib"):
+        return JsonCodec("stdlib", _stdlib_dumps, json.loads)
+    raise ValueError(f"Unknown JSON encoder: {name!r} (expected 'auto', 'orjson' or 'stdlib')")
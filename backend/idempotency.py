@@ -0,0 +1,193 @@
+# idempotency.py
+"""Replay of mutation responses for retried requests that carry an ``Idempotency-Key``.
+
+``IdempotencyMiddleware`` handles a configured set of (method, path) routes.
+When a request on one of them carries the header and ``identify(scope)``
+names its user, the response is stored under (user, method, path, key)
+together with a digest of the request body. A retry with the same key and
+body gets the stored response back, with ``Idempotent-Replayed: true``,
+before authentication, admission control or the handler run. So does a retry
+whose first attempt succeeded but whose response never reached the client.
+
+The same key with a different body is answered ``422``. A retry that arrives
+while the first attempt is still running is answered ``409`` with
+``Retry-After``. Only outcomes that a retry would reproduce are stored: 2xx
+and 4xx responses other than 401, 403, 408 and 429. Server errors and
+rejections that depend on the moment are left for the retry to run again.
+
+Responses are kept in a bounded in-process ``TTLCache``, so a retry that
+reaches a different worker process runs the handler again.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from caching import TTLCache
+
+MAX_KEY_LENGTH = 255
+_NOT_REPLAYABLE = frozenset({401, 403, 408, 429})
+
+
+class IdempotencyConflict(Exception):
+    """Raised for a key that is in flight (``status`` 409) or reused with another body (422)."""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    status: int
+    headers: Tuple[Tuple[bytes, bytes], ...]
+    body: bytes
+
+
+class IdempotencyStore:
+    """Stored responses keyed by request scope, plus the keys whose first attempt is running.
+
+    Used only from the event loop.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 86400.0):
+        self._responses = TTLCache(maxsize=maxsize, ttl=ttl)
+        # key -> body digest of the attempt in progress
+        self._in_flight: Dict[tuple, bytes] = {}
+        self.replayed = 0
+
+    def begin(self, key: tuple, fingerprint: bytes) -> Optional[StoredResponse]:
+        """Return the stored response for a retry, or claim ``key`` for a first attempt."""
+        stored = self._responses.get(key)
+        if stored is not None:
+            stored_fingerprint, response = stored
+            if stored_fingerprint != fingerprint:
+                raise IdempotencyConflict(422, "Idempotency-Key was already used with a different request")
+            self.replayed += 1
+            return response
+        if key in self._in_flight:
+            if self._in_flight[key] != fingerprint:
+                raise IdempotencyConflict(422, "Idempotency-Key was already used with a different request")
+            raise IdempotencyConflict(409, "A request with this Idempotency-Key is still in progress")
+        self._in_flight[key] = fingerprint
+        return None
+
+    def finish(self, key: tuple, response: Optional[StoredResponse]):
+        """Release ``key``, storing ``response`` if a retry should see it again."""
+        fingerprint = self._in_flight.pop(key, None)
+        if response is not None and fingerprint is not None and _replayable(response.status):
+            self._responses.set(key, (fingerprint, response))
+
+    def stats(self) -> dict:
+        return dict(self._responses.stats(), in_flight=len(self._in_flight), replayed=self.replayed)
+
+
+def _replayable(status: int) -> bool:
+    return 200 <= status < 500 and status not in _NOT_REPLAYABLE
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for header_name, value in scope["headers"]:
+        if header_name == name:
+            return value
+    return None
+
+
+async def _send_json(send, status: int, detail: str, extra_headers: List[Tuple[bytes, bytes]] = ()):
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            *extra_headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    def __init__(
+        self,
+        app,
+        store: IdempotencyStore,
+        routes: FrozenSet[Tuple[str, str]],
+        identify: Callable[[dict], Optional[str]],
+    ):
+        self.app = app
+        self.store = store
+        self.routes = routes
+        self.identify = identify
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        raw_key = _header(scope, b"idempotency-key")
+        user = self.identify(scope) if raw_key is not None else None
+        if user is None:
+            # No key, or no valid token: the handler runs (and rejects the request) as usual
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = raw_key.decode("latin-1").strip()
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+            return
+
+        # The body is read here to fingerprint it, then handed to the app unchanged
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        key = (user, scope["method"], scope["path"], idempotency_key)
+
+        try:
+            stored = self.store.begin(key, hashlib.sha256(body).digest())
+        except IdempotencyConflict as exc:
+            await _send_json(send, exc.status, exc.detail, [(b"retry-after", b"1")] if exc.status == 409 else [])
+            return
+        if stored is not None:
+            await send({
+                "type": "http.response.start",
+                "status": stored.status,
+                "headers": [*stored.headers, (b"idempotent-replayed", b"true")],
+            })
+            await send({"type": "http.response.body", "body": stored.body})
+            return
+
+        body_sent = False
+
+        async def receive_body():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        start = None
+        response_chunks = []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        response = None
+        try:
+            await self.app(scope, receive_body, capture)
+            if start is not None:
+                response = StoredResponse(
+                    status=start["status"], headers=tuple(start.get("headers", ())), body=b"".join(response_chunks)
+                )
+        finally:
+            self.store.finish(key, response)
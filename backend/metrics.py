@@ -0,0 +1,270 @@
+# metrics.py
+"""Request, database and hashing instrumentation in the Prometheus text format.
+
+``MetricsMiddleware`` times every HTTP request and labels it with the matched
+route template, so ``/api/elections/{election_id}/candidates`` is one series
+whatever the id. While a request runs, a ``RequestStats`` object sits in a
+context variable; the SQLAlchemy hooks from ``install_query_hooks()`` add each
+statement's count and duration to it, including statements run on the
+threadpool or inside an AsyncSession's greenlet. Statements issued by
+background threads belong to no request and are not counted.
+
+A request that executes the same SQL more than ``repeat_limit`` times is the
+signature of an N+1 loop: one query per row instead of one query per request.
+Such requests are counted in ``voting_repeated_query_requests_total``; in
+strict mode the offending statement raises ``RepeatedQueryError`` instead.
+A request that works through its rows in chunks calls ``next_chunk()`` before
+each one: a statement run once per chunk is a batch, not a per-row query, so
+repeats are counted within each chunk.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> ([count per bucket, +Inf last], sum)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(counts), total) for key, (counts, total) in sorted(self._series.items())]
+        for key, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """A value read from ``fn()`` at scrape time.
+
+    With ``label_names``, ``fn()`` returns a dict of label values -> value instead.
+    """
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], float], label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._fn = fn
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        if not self.label_names:
+            lines.append(f"{self.name} {_format_value(self._fn())}")
+            return lines
+        for key, value in sorted(self._fn().items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class RepeatedQueryError(Exception):
+    """Raised in strict mode when one request runs the same statement more than the repeat limit."""
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds", "statements", "max_repeats")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.statements: Dict[str, int] = {}
+        self.max_repeats = 0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+def next_chunk():
+    """Count statement repeats afresh for the current request's next chunk of rows."""
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements.clear()
+
+
+def install_query_hooks(repeat_limit: int, strict: bool = False):
+    """Attribute every statement on every Engine to the current request's RequestStats."""
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_request.get()
+        if stats is None:
+            return
+        repeats = stats.statements.get(statement, 0) + 1
+        stats.statements[statement] = repeats
+        stats.max_repeats = max(stats.max_repeats, repeats)
+        if strict and repeats > repeat_limit:
+            raise RepeatedQueryError(
+                f"Statement executed {repeats} times in one request (limit {repeat_limit}): {statement}"
+            )
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_request.get()
+        started = conn.info.get("metrics_query_start")
+        if stats is None or not started:
+            return
+        stats.queries += 1
+        stats.query_seconds += time.perf_counter() - started.pop()
+
+    @event.listens_for(Engine, "handle_error")
+    def _handle_error(exception_context):
+        started = exception_context.connection.info.get("metrics_query_start") if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+def time_pool_checkouts(engine, histogram: Histogram, pool_name: str):
+    """Observe how long each connection checkout from ``engine``'s pool waits."""
+    pool = getattr(engine, "sync_engine", engine).pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            histogram.observe(time.perf_counter() - started, pool=pool_name)
+
+    pool.connect = timed_connect
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and per-request query counts."""
+
+    def __init__(
+        self,
+        app,
+        request_latency: Histogram,
+        request_queries: Histogram,
+        request_query_seconds: Histogram,
+        repeated_query_requests: Counter,
+        repeat_limit: int,
+    ):
+        self.app = app
+        self.request_latency = request_latency
+        self.request_queries = request_queries
+        self.request_query_seconds = request_query_seconds
+        self.repeated_query_requests = repeated_query_requests
+        self.repeat_limit = repeat_limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.request_latency.observe(
+                time.perf_counter() - started, method=scope["method"], route=route, status=status_code
+            )
+            self.request_queries.observe(stats.queries, route=route)
+            self.request_query_seconds.observe(stats.query_seconds, route=route)
+            if stats.max_repeats > self.repeat_limit:
+                self.repeated_query_requests.inc(route=route)
@@ -0,0 +1,89 @@
+# migrations.py
+"""Versioned schema migrations on top of ``Base.metadata.create_all``.
+
+``create_all`` still creates missing tables (schema version 0). Everything
+after that is a numbered ``Migration`` recorded in ``schema_migrations`` once
+applied. Statements must be idempotent (``IF NOT EXISTS``): several processes
+may start against the same database at once, and on a fresh database a
+migration may find its objects already in place.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Sequence, Tuple
+
+from sqlalchemy import text
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+
+
+# Main database: users, elections, candidates (and votes when sharding is off)
+MIGRATIONS: List[Migration] = [
+    Migration(1, "indexes_for_hot_queries", (
+        # get_election_results / list_candidates: WHERE election_id = ? ORDER BY id, covering the name
+        "CREATE INDEX IF NOT EXISTS ix_candidates_election_id_id_name ON candidates (election_id, id, name)",
+        # Results counting and tally rebuilds: GROUP BY candidate within an election
+        "CREATE INDEX IF NOT EXISTS ix_votes_election_id_candidate_id ON votes (election_id, candidate_id)",
+        # list_active_elections: WHERE is_active = 1
+        "CREATE INDEX IF NOT EXISTS ix_elections_is_active ON elections (is_active)",
+    )),
+    Migration(2, "immutable_result_snapshots", (
+        # A closed election's frozen results are written once and never changed
+        "CREATE TRIGGER IF NOT EXISTS election_result_snapshots_no_update "
+        "BEFORE UPDATE ON election_result_snapshots "
+        "BEGIN SELECT RAISE(ABORT, 'election result snapshots are immutable'); END",
+        "CREATE TRIGGER IF NOT EXISTS election_result_snapshots_no_delete "
+        "BEFORE DELETE ON election_result_snapshots "
+        "BEGIN SELECT RAISE(ABORT, 'election result snapshots are immutable'); END",
+    )),
+    Migration(3, "votes_export_keyset", (
+        # iter_vote_export: WHERE election_id = ? AND id > ? ORDER BY id LIMIT ?
+        "CREATE INDEX IF NOT EXISTS ix_votes_election_id_id ON votes (election_id, id)",
+    )),
+]
+
+# Per-election vote shards: votes and candidate_tallies only
+SHARD_MIGRATIONS: List[Migration] = [
+    Migration(1, "indexes_for_hot_queries", (
+        "CREATE INDEX IF NOT EXISTS ix_votes_election_id_candidate_id ON votes (election_id, candidate_id)",
+    )),
+    Migration(2, "votes_export_keyset", (
+        "CREATE INDEX IF NOT EXISTS ix_votes_election_id_id ON votes (election_id, id)",
+    )),
+]
+
+
+def schema_version(connection) -> int:
+    return connection.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+
+
+def apply_migrations(engine, migrations: Sequence[Migration] = MIGRATIONS) -> List[int]:
+    """Apply every migration newer than the database's version, each in its own transaction.
+
+    Returns the versions applied by this call.
+    """
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at DATETIME NOT NULL)"
+        ))
+        current = schema_version(connection)
+
+    applied = []
+    for migration in sorted(migrations, key=lambda migration: migration.version):
+        if migration.version <= current:
+            continue
+        with engine.begin() as connection:
+            for statement in migration.statements:
+                connection.execute(text(statement))
+            result = connection.execute(
+                text("INSERT OR IGNORE INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                {"version": migration.version, "name": migration.name, "applied_at": datetime.utcnow()}
+            )
+        if result.rowcount:
+            applied.append(migration.version)
+    return applied
@@ -0,0 +1,88 @@
+# pagination.py
+"""Keyset (cursor) pagination for the listing endpoints.
+
+A page is the rows whose key is greater than the cursor, in key order, so
+every page costs one index range scan of ``limit`` rows; an OFFSET would walk
+all the rows before it. The cursor handed to clients is the last key of the
+page, base64-encoded so that clients treat it as opaque.
+
+A ``PageRequest`` can also name the response fields to return. The key field
+is always included, since the next cursor is taken from it.
+"""
+import base64
+import binascii
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+
+class InvalidPageRequest(ValueError):
+    """Raised for a malformed cursor or an unknown field name."""
+
+
+def encode_cursor(key: int) -> str:
+    return base64.urlsafe_b64encode(str(key).encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        key = int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidPageRequest("Invalid cursor")
+    if key < 0:
+        raise InvalidPageRequest("Invalid cursor")
+    return key
+
+
+@dataclass(frozen=True)
+class PageRequest:
+    # Rows with a key greater than ``after``; None starts from the beginning
+    after: Optional[int]
+    limit: int
+    # Projected fields in schema order, or None for every field
+    fields: Optional[Tuple[str, ...]] = None
+
+    def cache_key(self) -> tuple:
+        return (self.after, self.limit, self.fields)
+
+
+def page_request(
+    cursor: Optional[str],
+    limit: Optional[int],
+    fields: Optional[str],
+    allowed_fields: Sequence[str],
+    default_limit: int,
+    max_limit: int,
+    key_field: str = "id",
+) -> PageRequest:
+    """Build a PageRequest from query parameters.
+
+    ``fields`` is a comma-separated list of names from ``allowed_fields``; a
+    ``limit`` above ``max_limit`` is clamped to it.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    limit = min(limit or default_limit, max_limit)
+
+    projected = None
+    if fields:
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested.difference(allowed_fields)
+        if unknown:
+            raise InvalidPageRequest(f"Unknown fields: {', '.join(sorted(unknown))}")
+        requested.add(key_field)
+        projected = tuple(name for name in allowed_fields if name in requested)
+    return PageRequest(after=after, limit=limit, fields=projected)
+
+
+def paginate(query, key_column, page: PageRequest) -> Tuple[list, Optional[str]]:
+    """Fetch one page of ``query`` ordered by ``key_column``; returns ``(rows, next_cursor)``.
+
+    One extra row is fetched to tell whether another page follows, so the
+    last page comes back with no cursor rather than an empty page after it.
+    """
+    if page.after is not None:
+        query = query.filter(key_column > page.after)
+    rows = query.order_by(key_column).limit(page.limit + 1).all()
+    if len(rows) <= page.limit:
+        return rows, None
+    rows = rows[:page.limit]
+    return rows, encode_cursor(getattr(rows[-1], key_column.key))
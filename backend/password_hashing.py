@@ -0,0 +1,145 @@
+# password_hashing.py
+"""bcrypt hashing off the request path.
+
+Hashing and verification run in a dedicated process pool so a login burst
+cannot occupy the threads or event loop that serve cheap endpoints. A
+semaphore caps how many hashes are in flight; callers beyond that wait in
+line and are reported by ``stats()["queued"]``.
+
+The configured cost is enforced as both the minimum and maximum bcrypt
+rounds, so a stored hash with any other cost is flagged for a rehash on the
+next successful login.
+"""
+import asyncio
+import functools
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from passlib.context import CryptContext
+
+
+@functools.lru_cache(maxsize=None)
+def crypt_context(rounds: int) -> CryptContext:
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+# Module-level so they can be pickled into pool workers
+def hash_password(password: str, rounds: int) -> str:
+    return crypt_context(rounds).hash(password)
+
+
+def verify_and_update(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return crypt_context(rounds).verify_and_update(password, hashed_password)
+
+
+def load_backend() -> bool:
+    # A minimum-cost hash makes passlib load its bcrypt backend without spending a full hash
+    crypt_context(4).hash("")
+    return True
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        rounds: int = 12,
+        workers: int = 2,
+        max_concurrency: int = 4,
+        start_method: str = "spawn",
+        observe: Optional[Callable[[str, float, float], None]] = None,
+    ):
+        """``workers=0`` runs bcrypt on the default threadpool instead of a process pool.
+
+        ``observe(operation, wait_seconds, run_seconds)`` is called after every hash or verification.
+        """
+        self.rounds = rounds
+        self.workers = workers
+        self.max_concurrency = max(1, max_concurrency)
+        self._start_method = start_method
+        self._observe = observe
+        self._executor: Optional[Executor] = None
+        # Created on first use, on the loop that serves requests; see _get_semaphore
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queued = 0
+        self._in_flight = 0
+        self._completed = 0
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self._start_method)
+            )
+        return self._executor
+
+    def _get_semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        # The hasher is built at import, before any loop runs; a new loop (a restart, each
+        # test client) gets a new semaphore rather than one bound to a closed loop
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore(loop)
+        queued_at = time.perf_counter()
+        self._queued += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._queued -= 1
+        started = time.perf_counter()
+        self._in_flight += 1
+        try:
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+            semaphore.release()
+            if self._observe is not None:
+                self._observe(fn.__name__, started - queued_at, time.perf_counter() - started)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Return (valid, new_hash); new_hash is set when the stored cost differs from the configured one."""
+        return await self._run(verify_and_update, password, hashed_password, self.rounds)
+
+    def start(self) -> int:
+        """Start the worker processes and load bcrypt in each now, instead of on the first logins.
+
+        Returns the number of workers started.
+        """
+        executor = self._get_executor()
+        if executor is None:
+            load_backend()
+            return 0
+        # One task per worker, so the pool spawns all of them
+        for future in [executor.submit(load_backend) for _ in range(self.workers)]:
+            future.result()
+        return self.workers
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "queued": self._queued,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+        }
@@ -0,0 +1,132 @@
+# results_stream.py
+"""In-process fan-out of live election results.
+
+Vote writers call ``publish()`` from any thread after a vote commits. Once per
+tick the broadcaster coalesces everything published for an election, reads the
+changed candidates' current counts with a single ``fetch_counts`` call and
+sends the same pre-serialized event to every subscriber of that election, so
+the cost of an update does not grow with the number of subscribers.
+"""
+import asyncio
+import json
+import logging
+import threading
+from typing import Callable, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class ResultsBroadcaster:
+    def __init__(
+        self,
+        fetch_counts: Callable[[int, Iterable[int]], Dict[int, int]],
+        tick_interval: float = 0.5,
+        subscriber_queue_size: int = 64,
+    ):
+        self._fetch_counts = fetch_counts
+        self._tick_interval = tick_interval
+        self._subscriber_queue_size = subscriber_queue_size
+        self._lock = threading.Lock()
+        # election_id -> {candidate_id: votes since the last tick}
+        self._pending: Dict[int, Dict[int, int]] = {}
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def publish(self, election_id: int, candidate_id: int, delta: int = 1):
+        if election_id not in self._subscribers:
+            return
+        with self._lock:
+            election_pending = self._pending.setdefault(election_id, {})
+            election_pending[candidate_id] = election_pending.get(candidate_id, 0) + delta
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def add_subscriber(self, election_id: int) -> asyncio.Queue:
+        """Register a queue of encoded events for one election; None in it means the stream must end.
+
+        Call from the event loop, and pair with remove_subscriber(). Counts in updates are
+        absolute, so a subscriber can register first and read its snapshot afterwards
+        without missing a vote committed in between.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._subscriber_queue_size)
+        with self._lock:
+            self._subscribers.setdefault(election_id, set()).add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return queue
+
+    def remove_subscriber(self, election_id: int, queue: asyncio.Queue):
+        with self._lock:
+            queues = self._subscribers.get(election_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[election_id]
+                    self._pending.pop(election_id, None)
+
+    def end(self, election_id: int, message: Optional[bytes] = None):
+        """End every open stream of an election, after ``message`` if given.
+
+        Updates still queued are dropped: the final message supersedes them.
+        Call from the event loop.
+        """
+        with self._lock:
+            queues = list(self._subscribers.get(election_id, ()))
+        for queue in queues:
+            while not queue.empty():
+                queue.get_nowait()
+            if message is not None:
+                queue.put_nowait(message)
+            queue.put_nowait(None)
+
+    def end_threadsafe(self, election_id: int, message: Optional[bytes] = None):
+        """end() from a thread other than the event loop's; does nothing without open streams."""
+        task = self._task
+        if task is not None and election_id in self._subscribers:
+            task.get_loop().call_soon_threadsafe(self.end, election_id, message)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self._tick_interval)
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for election_id, deltas in pending.items():
+                try:
+                    counts = await loop.run_in_executor(None, self._fetch_counts, election_id, list(deltas))
+                except Exception:
+                    logger.exception("Could not read counts for election %s", election_id)
+                    continue
+                message = format_event("update", {
+                    "election_id": election_id,
+                    "changes": [
+                        {"candidate_id": candidate_id, "vote_count": counts.get(candidate_id, 0), "delta": delta}
+                        for candidate_id, delta in sorted(deltas.items())
+                    ],
+                })
+                self._fan_out(election_id, message)
+
+    def _fan_out(self, election_id: int, message: bytes):
+        with self._lock:
+            queues = list(self._subscribers.get(election_id, ()))
+        for queue in queues:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A subscriber that cannot keep up is disconnected; it reconnects for a fresh snapshot
+                with self._lock:
+                    self._subscribers.get(election_id, set()).discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
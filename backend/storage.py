@@ -0,0 +1,145 @@
+# storage.py
+"""SQLite storage profiles: per-connection pragmas and the engines built from them.
+
+A profile decides how connections are configured and whether reads and writes
+share one engine. With the "wal" profile readers never block the writer (or
+each other), GET endpoints get their own ``query_only`` pool, and mutations go
+through a writer engine with a single connection, so writes queue on the pool
+instead of contending for SQLite's lock and failing with "database is locked".
+The "default" profile keeps SQLite's stock settings and one shared engine.
+"""
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    name: str
+    journal_mode: Optional[str] = None
+    synchronous: Optional[str] = None
+    # Negative cache_size is in KiB, as in SQLite's own PRAGMA cache_size
+    cache_size_kib: Optional[int] = None
+    mmap_size: Optional[int] = None
+    split_engines: bool = False
+
+    def pragmas(self, busy_timeout: float, read_only: bool = False) -> List[str]:
+        statements = [f"PRAGMA busy_timeout={int(busy_timeout * 1000)}"]
+        if self.journal_mode:
+            statements.append(f"PRAGMA journal_mode={self.journal_mode}")
+        if self.synchronous:
+            statements.append(f"PRAGMA synchronous={self.synchronous}")
+        if self.cache_size_kib:
+            statements.append(f"PRAGMA cache_size=-{self.cache_size_kib}")
+        if self.mmap_size is not None:
+            statements.append(f"PRAGMA mmap_size={self.mmap_size}")
+        if read_only:
+            statements.append("PRAGMA query_only=ON")
+        return statements
+
+
+def storage_profile(
+    name: str,
+    synchronous: str = "NORMAL",
+    cache_size_kib: int = 64 * 1024,
+    mmap_size: int = 256 * 1024 * 1024,
+) -> StorageProfile:
+    if name == "default":
+        return StorageProfile(name)
+    if name == "wal":
+        # synchronous=NORMAL is durable against crashes in WAL mode; a power loss can drop the last commits
+        return StorageProfile(
+            name,
+            journal_mode="WAL",
+            synchronous=synchronous,
+            cache_size_kib=cache_size_kib,
+            mmap_size=mmap_size,
+            split_engines=True,
+        )
+    raise ValueError(f"Unknown storage profile: {name!r} (expected 'default' or 'wal')")
+
+
+def install_pragmas(engine, statements: List[str]):
+    """Run ``statements`` on every new DBAPI connection of a sync or async engine."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def create_engines(
+    create: Callable,
+    url: str,
+    profile: StorageProfile,
+    busy_timeout: float,
+    pool_size: int,
+    max_overflow: int,
+    pool_timeout: float,
+    connect_args: Optional[dict] = None,
+) -> Tuple[object, object]:
+    """Return ``(write_engine, read_engine)`` built with ``create`` (create_engine or create_async_engine).
+
+    Without split engines both names refer to the same engine.
+    """
+    connect_args = dict(connect_args or {}, timeout=busy_timeout)
+    if not profile.split_engines:
+        engine = create(
+            url,
+            connect_args=connect_args,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+        )
+        install_pragmas(engine, profile.pragmas(busy_timeout))
+        return engine, engine
+
+    write_engine = create(url, connect_args=connect_args, pool_size=1, max_overflow=0, pool_timeout=pool_timeout)
+    install_pragmas(write_engine, profile.pragmas(busy_timeout))
+    read_engine = create(
+        url,
+        connect_args=connect_args,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+    )
+    install_pragmas(read_engine, profile.pragmas(busy_timeout, read_only=True))
+    return write_engine, read_engine
+
+
+def _pool_size(engine) -> int:
+    pool = getattr(engine, "sync_engine", engine).pool
+    return pool.size() if isinstance(pool, QueuePool) else 1
+
+
+def open_connections(engine) -> int:
+    """Fill a sync engine's pool now, so the first requests after a start do not connect; returns the count."""
+    connections = []
+    try:
+        for _ in range(_pool_size(engine)):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+async def open_async_connections(engine) -> int:
+    """Fill an async engine's pool now; returns the count."""
+    connections = []
+    try:
+        for _ in range(_pool_size(engine)):
+            connections.append(await engine.connect())
+    finally:
+        for connection in connections:
+            await connection.close()
+    return len(connections)
@@ -0,0 +1,105 @@
+# test_admission.py
+"""Admission control: class concurrency limits, wait queues and per-user token buckets.
+
+Run with:  python -m pytest test_admission.py
+"""
+import asyncio
+
+import pytest
+
+from admission import AdmissionMiddleware, ConcurrencyLimiter, Overloaded, TokenBucket, UserRateLimiter
+
+
+def test_limiter_queues_then_hands_over_the_slot():
+    async def scenario():
+        limiter = ConcurrencyLimiter("vote", limit=1, queue_size=1, max_wait=1.0)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+        with pytest.raises(Overloaded) as excinfo:
+            await limiter.acquire()
+        assert excinfo.value.reason == "queue_full"
+        limiter.release()
+        await waiter
+        assert (limiter.active, limiter.queued) == (1, 0)
+        limiter.release()
+        assert limiter.active == 0
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["admitted"] == 2 and stats["rejected"] == 1
+
+
+def test_limiter_rejects_after_max_wait():
+    async def scenario():
+        limiter = ConcurrencyLimiter("read", limit=1, queue_size=4, max_wait=0.01)
+        await limiter.acquire()
+        with pytest.raises(Overloaded) as excinfo:
+            await limiter.acquire()
+        assert excinfo.value.reason == "wait_timeout"
+        assert limiter.queued == 0
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=2, burst=2, now=0.0)
+    assert bucket.take(0.0) == 0 and bucket.take(0.0) == 0
+    assert bucket.take(0.0) == pytest.approx(0.5)
+    assert bucket.take(0.5) == 0
+
+
+def test_user_rate_limiter_is_per_user():
+    limiter = UserRateLimiter(rate=0.001, burst=1)
+    limiter.check("1")
+    limiter.check("2")
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.check("1")
+    assert excinfo.value.reason == "rate_limited"
+    assert limiter.limited == 1
+
+
+def test_middleware_answers_503_and_429_with_retry_after():
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    rejections = []
+    middleware = AdmissionMiddleware(
+        app,
+        limiters={"vote": ConcurrencyLimiter("vote", limit=1, queue_size=0, max_wait=0.5)},
+        classify=lambda scope: "vote",
+        identify=lambda scope: scope["user"],
+        user_limiter=UserRateLimiter(rate=0.001, burst=1),
+        on_reject=lambda endpoint_class, reason: rejections.append((endpoint_class, reason)),
+    )
+
+    async def call(user):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware({"type": "http", "user": user}, None, send)
+        start = messages[0]
+        return start["status"], dict(start["headers"]).get(b"retry-after")
+
+    async def scenario():
+        first = asyncio.create_task(call("1"))
+        await asyncio.sleep(0)
+        busy = await call("2")
+        limited = await call("1")
+        release.set()
+        return await first, busy, limited
+
+    first, busy, limited = asyncio.run(scenario())
+    assert first == (200, None)
+    assert busy == (503, b"1")
+    assert limited[0] == 429 and int(limited[1]) >= 1
+    assert rejections == [("vote", "queue_full"), ("vote", "rate_limited")]
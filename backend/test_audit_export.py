@@ -0,0 +1,148 @@
+# test_audit_export.py
+"""Audit exports stream an election's votes in id order, in every format, within voted_at bounds.
+
+Run with:  python -m pytest test_audit_export.py
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import app as app_module
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="module")
+def election():
+    db = app_module.SessionLocal()
+    try:
+        admin = app_module.User(username="export-admin", email="export-admin@export.local", hashed_password="x", is_admin=True)
+        election = app_module.Election(title="Export", is_active=True)
+        voters = [
+            app_module.User(username=f"export-voter{i}", email=f"export-voter{i}@export.local", hashed_password="x")
+            for i in range(5)
+        ]
+        db.add_all([admin, election, *voters])
+        db.flush()
+        candidate = app_module.Candidate(election_id=election.id, name="Exported")
+        db.add(candidate)
+        db.flush()
+        votes = [
+            app_module.Vote(user_id=voter.id, election_id=election.id, candidate_id=candidate.id,
+                            voted_at=datetime(2024, 5, 1, 12, i, 0, 250000))
+            for i, voter in enumerate(voters)
+        ]
+        db.add_all(votes)
+        db.commit()
+        return {
+            "id": election.id,
+            "vote_ids": [vote.id for vote in votes],
+            "usernames": [voter.username for voter in voters],
+            "admin_id": admin.id,
+            "admin": {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(admin.id)})}"},
+        }
+    finally:
+        db.close()
+
+
+def export(client, election, **params):
+    response = client.get(
+        "/api/admin/export/votes", params={"election_id": election["id"], **params}, headers=election["admin"]
+    )
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_csv_and_ndjson_agree(client, election):
+    response = export(client, election, with_users="true")
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["id"]) for row in rows] == election["vote_ids"]
+    assert [row["username"] for row in rows] == election["usernames"]
+    assert rows[0]["voted_at"] == "2024-05-01T12:00:00.250000"
+
+    lines = export(client, election, format="ndjson", with_users="true").text.splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [{key: str(value) for key, value in record.items()} for record in records] == rows
+
+
+def test_voted_at_range(client, election):
+    rows = list(csv.DictReader(io.StringIO(export(
+        client, election, voted_from="2024-05-01T12:01:00", voted_to="2024-05-01T14:03:00+02:00"
+    ).text)))
+    assert [int(row["id"]) for row in rows] == election["vote_ids"][1:3]
+
+
+def test_votes_are_read_in_keyset_chunks_on_the_index(election):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(app_module.read_engine, "before_cursor_execute", record)
+    try:
+        chunks = list(app_module.iter_vote_export(election["id"], chunk_size=2))
+    finally:
+        event.remove(app_module.read_engine, "before_cursor_execute", record)
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [row.id for chunk in chunks for row in chunk] == election["vote_ids"]
+    # The upper bound, then one query per chunk
+    assert len(statements) == 4
+
+    connection = app_module.read_engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for statement, parameters in statements:
+            plan = [row[-1] for row in cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()]
+            assert any(step.startswith("SEARCH votes USING COVERING INDEX ix_votes_election_id_id") or
+                       step.startswith("SEARCH votes USING INDEX ix_votes_election_id_id") for step in plan), plan
+            assert not [step for step in plan if "TEMP B-TREE" in step or step.startswith("SCAN votes")], plan
+    finally:
+        connection.close()
+
+
+def test_votes_cast_during_the_export_are_left_out(election):
+    db = app_module.SessionLocal()
+    try:
+        late_voter = app_module.User(username="export-late", email="export-late@export.local", hashed_password="x")
+        db.add(late_voter)
+        db.flush()
+        other = app_module.Election(title="Export late", is_active=True)
+        db.add(other)
+        db.flush()
+        candidate = app_module.Candidate(election_id=other.id, name="Late")
+        db.add(candidate)
+        db.flush()
+        db.add(app_module.Vote(user_id=election["admin_id"], election_id=other.id, candidate_id=candidate.id,
+                               voted_at=datetime(2024, 5, 1, 12, 0)))
+        db.commit()
+        other_id, candidate_id, late_voter_id = other.id, candidate.id, late_voter.id
+    finally:
+        db.close()
+
+    chunks = app_module.iter_vote_export(other_id, chunk_size=1)
+    first = next(chunks)
+    db = app_module.SessionLocal()
+    try:
+        db.add(app_module.Vote(user_id=late_voter_id, election_id=other_id, candidate_id=candidate_id,
+                               voted_at=datetime(2024, 5, 1, 12, 1)))
+        db.commit()
+    finally:
+        db.close()
+    assert len(first) == 1 and list(chunks) == []
+
+
+def test_unknown_format_is_rejected(client, election):
+    response = client.get(
+        "/api/admin/export/votes", params={"election_id": election["id"], "format": "xlsx"}, headers=election["admin"]
+    )
+    assert response.status_code == 400
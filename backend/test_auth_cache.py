@@ -0,0 +1,101 @@
+# test_auth_cache.py
+"""Cached tokens are never honored past exp, and cached principals follow changes to their user.
+
+Run with:  python -m pytest test_auth_cache.py
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import app as app_module
+
+ADMIN_ONLY = "/api/admin/hashing/stats"
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def user():
+    db = app_module.SessionLocal()
+    try:
+        user = app_module.User(
+            username=f"cached-{time.monotonic_ns()}", email=f"cached-{time.monotonic_ns()}@auth.local", hashed_password="x"
+        )
+        db.add(user)
+        db.commit()
+        return {"id": user.id, "headers": {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(user.id)})}"}}
+    finally:
+        db.close()
+
+
+def test_valid_token_is_decoded_once(monkeypatch):
+    token = app_module.create_access_token({"sub": str(time.monotonic_ns())})
+    first = app_module.decode_token(token)
+    assert app_module.token_cache.get(hashlib.sha256(token.encode()).digest()) == first
+
+    def no_decode(*args, **kwargs):
+        raise AssertionError("a cached token was decoded again")
+
+    monkeypatch.setattr(app_module.jwt, "decode", no_decode)
+    assert app_module.decode_token(token) == first
+
+
+def test_cached_token_past_exp_is_rejected(client, user):
+    token = app_module.create_access_token({"sub": str(user["id"])}, expires_delta=timedelta(seconds=-1))
+    # Cache it as if it had still been valid, with an entry TTL that outlives exp
+    payload = {"sub": str(user["id"]), "exp": int(time.time()) - 1}
+    cache_key = hashlib.sha256(token.encode()).digest()
+    app_module.token_cache.set(cache_key, payload, ttl=3600)
+
+    with pytest.raises(HTTPException) as rejected:
+        app_module.decode_token(token)
+    assert rejected.value.status_code == 401 and rejected.value.detail == "Token has expired"
+    assert app_module.token_cache.get(cache_key) is None
+
+    app_module.token_cache.set(cache_key, payload, ttl=3600)
+    response = client.get("/api/me/votes", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_role_change_evicts_cached_principal(client, user):
+    assert client.get(ADMIN_ONLY, headers=user["headers"]).status_code == 403
+    assert app_module.user_cache.get(user["id"]) is not None
+
+    db = app_module.SessionLocal()
+    try:
+        db.get(app_module.User, user["id"]).is_admin = True
+        db.commit()
+    finally:
+        db.close()
+    assert app_module.user_cache.get(user["id"]) is None
+    assert client.get(ADMIN_ONLY, headers=user["headers"]).status_code == 200
+
+    # Bulk updates cannot say which users changed, so they drop every principal
+    db = app_module.SessionLocal()
+    try:
+        db.query(app_module.User).filter(app_module.User.id == user["id"]).update({"is_admin": False})
+        db.commit()
+    finally:
+        db.close()
+    assert app_module.user_cache.get(user["id"]) is None
+    assert client.get(ADMIN_ONLY, headers=user["headers"]).status_code == 403
+
+
+def test_deleted_user_is_rejected(client, user):
+    assert client.get("/api/me/votes", headers=user["headers"]).status_code == 200
+    db = app_module.SessionLocal()
+    try:
+        db.delete(db.get(app_module.User, user["id"]))
+        db.commit()
+    finally:
+        db.close()
+    response = client.get("/api/me/votes", headers=user["headers"])
+    assert response.status_code == 401 and response.json()["detail"] == "User not found"
@@ -0,0 +1,221 @@
+# test_bulk_import.py
+"""Bulk uploads of voters and candidates are parsed line by line into a per-row report numbered by the upload's lines.
+
+Run with:  python -m pytest test_bulk_import.py
+"""
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from bulk_import import RowError, iter_lines, iter_rows
+
+CANDIDATES = "/api/admin/bulk/candidates"
+
+
+async def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def parse(data: bytes, fmt: str, size: int = 7, max_line_bytes: int = 64 * 1024):
+    async def collect():
+        return [row async for row in iter_rows(_chunks(data, size), fmt, max_line_bytes)]
+
+    return asyncio.run(collect())
+
+
+def test_lines_split_across_chunks_and_trailing_line():
+    async def collect(data, size):
+        return [line async for line in iter_lines(_chunks(data, size))]
+
+    data = b"first\r\nsecond line\n\nlast without newline"
+    expected = ["first", "second line", "", "last without newline"]
+    for size in (1, 3, 7, len(data)):
+        assert asyncio.run(collect(data, size)) == expected
+    assert asyncio.run(collect(b"", 4)) == []
+
+
+def test_oversize_line_is_reported_not_buffered():
+    data = b'{"name": "ok"}\n' + b'{"name": "' + b"x" * 200 + b'"}\n{"name": "after"}'
+    rows = parse(data, "ndjson", max_line_bytes=64)
+    assert [number for number, _ in rows] == [1, 2, 3]
+    assert rows[0][1] == {"name": "ok"} and rows[2][1] == {"name": "after"}
+    assert isinstance(rows[1][1], RowError) and "longer than 64 bytes" in str(rows[1][1])
+    # Without a newline at all, only the cap is held
+    rows = parse(b"y" * 1000, "ndjson", max_line_bytes=64)
+    assert len(rows) == 1 and isinstance(rows[0][1], RowError)
+
+
+def test_oversize_csv_header_stops_parsing():
+    rows = parse(b"a" * 100 + b"\nalice,alice@example.com,secret123\n", "csv", max_line_bytes=64)
+    assert len(rows) == 1 and rows[0][0] == 1 and isinstance(rows[0][1], RowError)
+
+
+def test_rows_are_numbered_by_line():
+    data = "﻿username,email,password\n\nalice,alice@example.com,secret\n\n\nbob,bob@example.com\n".encode()
+    rows = parse(data, "csv")
+    assert rows[0] == (3, {"username": "alice", "email": "alice@example.com", "password": "secret"})
+    assert rows[1][0] == 6 and isinstance(rows[1][1], RowError)
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="module")
+def admin():
+    db = app_module.SessionLocal()
+    try:
+        user = app_module.User(username="bulk-admin", email="bulk-admin@bulk.example.com", hashed_password="x", is_admin=True)
+        db.add(user)
+        db.commit()
+        return {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(user.id)})}"}
+    finally:
+        db.close()
+
+
+def upload(client, admin, body: str, content_type: str, endpoint: str = "/api/admin/bulk/voters"):
+    response = client.post(endpoint, content=body.encode(), headers=dict(admin, **{"Content-Type": content_type}))
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_mixed_csv_upload(client, admin, monkeypatch):
+    # Several transactions, so a duplicate spans chunks
+    monkeypatch.setattr(app_module, "BULK_CHUNK_SIZE", 2)
+    body = "\n".join([
+        "username,email,password",
+        "csv-alice,csv-alice@bulk.example.com,secret123",
+        "",
+        "csv-bob,not-an-email,secret123",
+        "csv-carol,csv-carol@bulk.example.com",
+        "csv-alice,csv-alice2@bulk.example.com,secret123",
+        "csv-dave,csv-dave@bulk.example.com,secret123",
+        "csv-erin,csv-erin@bulk.example.com,secret123",  # no trailing newline
+    ])
+    report = upload(client, admin, body, "text/csv")
+    assert report["format"] == "csv"
+    assert (report["rows"], report["created"], report["failed"]) == (6, 3, 3)
+    assert [error["row"] for error in report["errors"]] == [4, 5, 6]
+    assert report["errors"][1]["error"] == "Expected 3 columns, got 2"
+    assert report["errors"][2]["error"] == "Username already registered"
+    assert report["errors_truncated"] is False
+
+    db = app_module.SessionLocal()
+    try:
+        created = {username for username, in db.query(app_module.User.username).filter(app_module.User.username.like("csv-%"))}
+    finally:
+        db.close()
+    assert created == {"csv-alice", "csv-dave", "csv-erin"}
+
+
+def test_mixed_ndjson_upload(client, admin):
+    lines = [
+        json.dumps({"username": "nd-alice", "email": "nd-alice@bulk.example.com", "password": "secret123"}),
+        "{not json",
+        "[1, 2]",
+        "",
+        json.dumps({"username": "nd-bob", "email": "nd-bob@bulk.example.com", "password": "short"}),
+        json.dumps({"username": "nd-carol", "email": "nd-carol@bulk.example.com", "password": "secret123"}),
+    ]
+    report = upload(client, admin, "\n".join(lines) + "\n", "application/x-ndjson")
+    assert (report["rows"], report["created"], report["failed"]) == (5, 2, 3)
+    assert [error["row"] for error in report["errors"]] == [2, 3, 5]
+    assert report["errors"][0]["error"].startswith("Invalid JSON")
+
+
+def test_error_details_are_capped(client, admin, monkeypatch):
+    monkeypatch.setattr(app_module, "BULK_MAX_ERRORS", 2)
+    body = "username,email,password\n" + "".join(f"cap{i},invalid,secret123\n" for i in range(5))
+    report = upload(client, admin, body, "text/csv")
+    assert report["failed"] == 5 and len(report["errors"]) == 2
+    assert report["errors_truncated"] is True
+    assert [error["row"] for error in report["errors"]] == [2, 3]
+
+
+def test_oversize_row_fails_alone(client, admin, monkeypatch):
+    monkeypatch.setattr(app_module, "BULK_MAX_LINE_BYTES", 80)
+    body = "username,email,password\n" + "long," + "x" * 200 + "@bulk.example.com,secret123\nshort-ok,short-ok@bulk.example.com,secret123\n"
+    report = upload(client, admin, body, "text/csv")
+    assert (report["rows"], report["created"], report["failed"]) == (2, 1, 1)
+    assert report["errors"] == [{"row": 2, "error": "Line is longer than 80 bytes"}]
+
+
+def test_voter_import_over_many_chunks(client, admin, monkeypatch):
+    # Each chunk repeats the same lookups and insert: a batch, not an N+1 loop in strict mode
+    monkeypatch.setattr(app_module, "BULK_CHUNK_SIZE", 2)
+    body = "username,email,password\n" + "".join(f"chunked{i},chunked{i}@bulk.example.com,secret123\n" for i in range(10))
+    report = upload(client, admin, body, "text/csv")
+    assert (report["rows"], report["created"], report["failed"]) == (10, 10, 0)
+
+
+@pytest.fixture(scope="module")
+def elections():
+    db = app_module.SessionLocal()
+    try:
+        first, second = app_module.Election(title="Bulk first"), app_module.Election(title="Bulk second")
+        db.add_all([first, second])
+        db.flush()
+        db.add(app_module.Candidate(election_id=first.id, name="Existing"))
+        db.commit()
+        return first.id, second.id
+    finally:
+        db.close()
+
+
+def candidate_names(election_id):
+    db = app_module.SessionLocal()
+    try:
+        return [name for name, in db.query(app_module.Candidate.name).filter(
+            app_module.Candidate.election_id == election_id
+        ).order_by(app_module.Candidate.id)]
+    finally:
+        db.close()
+
+
+def test_candidate_csv_upload(client, admin, elections, monkeypatch):
+    monkeypatch.setattr(app_module, "BULK_CHUNK_SIZE", 2)
+    first, second = elections
+    listing = f"/api/elections/{first}/candidates"
+    assert [row["name"] for row in client.get(listing).json()] == ["Existing"]
+    body = "\n".join([
+        "election_id,name,description",
+        f"{first},Alpha,First in",
+        f"{10 ** 9},Nowhere,",
+        f"{first},Existing,Already there",
+        f"{first},Beta,",
+        f"{second},Alpha,Same name elsewhere",
+        f"{first},Alpha,Repeated in the upload",
+        f"{first},,No name",
+        f"{second},Gamma,",
+    ])
+    report = upload(client, admin, body, "text/csv", CANDIDATES)
+    assert (report["rows"], report["created"], report["failed"]) == (8, 4, 4)
+    assert report["errors"][:3] == [
+        {"row": 3, "error": "Election not found"},
+        {"row": 4, "error": "Candidate already in this election"},
+        {"row": 7, "error": "Candidate already in this election"},
+    ]
+    assert report["errors"][3]["row"] == 8
+    # Committed chunk by chunk, and the cached listing follows
+    assert candidate_names(first) == ["Existing", "Alpha", "Beta"]
+    assert candidate_names(second) == ["Alpha", "Gamma"]
+    assert [row["name"] for row in client.get(listing).json()] == ["Existing", "Alpha", "Beta"]
+
+
+def test_candidate_ndjson_upload(client, admin, elections):
+    _, second = elections
+    lines = [
+        json.dumps({"election_id": second, "name": "Delta", "description": "From NDJSON"}),
+        json.dumps({"election_id": "second", "name": "Bad id"}),
+        json.dumps({"election_id": second, "name": "Gamma"}),
+    ]
+    report = upload(client, admin, "\n".join(lines), "application/x-ndjson", CANDIDATES)
+    assert (report["rows"], report["created"], report["failed"]) == (3, 1, 2)
+    assert [error["row"] for error in report["errors"]] == [2, 3]
+    assert candidate_names(second)[-1] == "Delta"
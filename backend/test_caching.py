@@ -0,0 +1,104 @@
+# test_caching.py
+"""Cached listings expire, evict and count like an LRU cache, and admin changes invalidate them.
+
+Run with:  python -m pytest test_caching.py
+"""
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from caching import TTLCache, VersionCounters
+
+
+def test_hits_misses_and_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3 and cache.get("a") == 1
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+
+def test_entries_expire():
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.set("short", 1, ttl=0.05)
+    cache.set("long", 2)
+    time.sleep(0.1)
+    assert cache.get("short", "gone") == "gone"
+    assert cache.get("long") == 2
+    assert len(cache) == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_invalidate_and_disabled_cache():
+    cache = TTLCache(maxsize=4)
+    cache.set("a", 1)
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    disabled = TTLCache(maxsize=0)
+    disabled.set("a", 1)
+    assert len(disabled) == 0
+
+
+def test_version_counters():
+    versions = VersionCounters()
+    assert versions.get("listing") == 0
+    versions.bump("listing", ("election", 1))
+    versions.bump("listing")
+    assert versions.get("listing") == 2 and versions.get(("election", 1)) == 1
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="module")
+def admin():
+    db = app_module.SessionLocal()
+    try:
+        user = app_module.User(username="cache-admin", email="cache-admin@cache.local", hashed_password="x", is_admin=True)
+        db.add(user)
+        db.commit()
+        return {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(user.id)})}"}
+    finally:
+        db.close()
+
+
+def test_admin_changes_invalidate_listings(client, admin):
+    def active_ids():
+        response = client.get("/api/elections")
+        assert response.status_code == 200
+        return {election["id"] for election in response.json()}, response.headers["ETag"]
+
+    election = client.post("/api/admin/election", json={"title": "Cached"}, headers=admin).json()
+    candidates_url = f"/api/elections/{election['id']}/candidates"
+    ids, etag = active_ids()
+    assert election["id"] not in ids
+    assert client.get(candidates_url).json() == []
+
+    # Served from the cache until something changes
+    hits = app_module.listing_cache.stats()["hits"]
+    assert active_ids() == (ids, etag)
+    assert client.get("/api/elections", headers={"If-None-Match": etag}).status_code == 304
+    assert app_module.listing_cache.stats()["hits"] == hits + 1
+
+    candidate = client.post(
+        "/api/admin/candidate", json={"election_id": election["id"], "name": "Cached candidate"}, headers=admin
+    ).json()
+    assert [row["id"] for row in client.get(candidates_url).json()] == [candidate["id"]]
+
+    assert client.post(f"/api/admin/start/{election['id']}", headers=admin).status_code == 200
+    started_ids, started_etag = active_ids()
+    assert election["id"] in started_ids and started_etag != etag
+    assert client.get("/api/elections", headers={"If-None-Match": etag}).status_code == 200
+
+    assert client.post(f"/api/admin/close/{election['id']}", headers=admin).status_code == 200
+    closed_ids, closed_etag = active_ids()
+    assert election["id"] not in closed_ids and closed_etag != started_etag
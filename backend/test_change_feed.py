@@ -0,0 +1,246 @@
+# test_change_feed.py
+"""Workers sharing one database pick up each other's changes within a bounded delay.
+
+Starts two uvicorn workers as separate processes, changes data through one and
+checks that the other stops serving the old data within STALE_BOUND seconds:
+with tallies in the database, with in-memory counters, and with votes in
+per-election shards.
+
+Run with:  python -m pytest test_change_feed.py
+"""
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+import app as app_module
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SYNC_MS = 100
+# One poll interval plus room for a slow machine
+STALE_BOUND = 1.5
+WORKER_MODES = {
+    "database": {},
+    # Flushing after the test is over: counts only reach the other worker through its change feed
+    "memory": {"VOTING_COUNTER_MODE": "memory", "VOTING_COUNTER_FLUSH_INTERVAL": "600"},
+    "sharded": {
+        "VOTING_COUNTER_MODE": "memory", "VOTING_COUNTER_FLUSH_INTERVAL": "600", "VOTING_VOTE_SHARDING": "election",
+        "VOTING_COMMIT_MODE": "group",
+    },
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_worker(env) -> subprocess.Popen:
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    process.base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        assert process.poll() is None, "worker exited during startup"
+        try:
+            if httpx.get(f"{process.base_url}/health/ready").status_code == 200:
+                return process
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("worker did not become ready")
+
+
+@pytest.fixture(scope="module", params=list(WORKER_MODES))
+def workers(request, tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("workers")
+    database = workdir / "shared.db"
+    env = dict(
+        os.environ,
+        VOTING_DATABASE_URL=f"sqlite:///{database}",
+        VOTING_VOTE_SHARD_DIR=str(workdir / "vote_shards"),
+        VOTING_CACHE_SYNC_MS=str(SYNC_MS),
+        VOTING_RESULTS_TICK_MS="50",
+        VOTING_USER_RATE="0",
+        **WORKER_MODES[request.param]
+    )
+    processes = []
+    try:
+        # One at a time, so the first creates the schema
+        for _ in range(2):
+            processes.append(start_worker(env))
+        with sqlite3.connect(database) as connection:
+            connection.executemany(
+                "INSERT INTO users (username, email, hashed_password, is_admin) VALUES (?, ?, 'x', ?)",
+                [
+                    ("feed-admin", "feed-admin@feed.local", True),
+                    ("feed-voter", "feed-voter@feed.local", False),
+                    ("feed-voter2", "feed-voter2@feed.local", False),
+                ]
+            )
+            ids = dict(connection.execute("SELECT username, id FROM users"))
+        clients = [httpx.Client(base_url=process.base_url) for process in processes]
+        bearer = {
+            username: {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(user_id)})}"}
+            for username, user_id in ids.items()
+        }
+        yield {
+            "env": env,
+            "clients": clients,
+            "database": database,
+            "admin": bearer["feed-admin"],
+            "voter": bearer["feed-voter"],
+            "voter2": bearer["feed-voter2"],
+        }
+        for client in clients:
+            client.close()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+
+def settles(check) -> float:
+    """Poll check() until it passes; returns how long it took, failing past STALE_BOUND."""
+    started = time.monotonic()
+    while not check():
+        elapsed = time.monotonic() - started
+        assert elapsed <= STALE_BOUND, f"still stale after {elapsed:.2f}s"
+        time.sleep(0.02)
+    return time.monotonic() - started
+
+
+def test_other_worker_sees_changes(workers):
+    writer, reader = workers["clients"]
+    admin, voter = workers["admin"], workers["voter"]
+
+    def active_ids(headers=None):
+        return {election["id"]: election for election in reader.get("/api/elections", headers=headers).json()}
+
+    election = writer.post("/api/admin/election", json={"title": "Fed"}, headers=admin).json()
+    # The reader caches the empty candidate list and the listing without the election
+    assert reader.get(f"/api/elections/{election['id']}/candidates").json() == []
+    assert election["id"] not in active_ids()
+    etag = reader.get("/api/elections").headers["ETag"]
+
+    candidate = writer.post(
+        "/api/admin/candidate", json={"election_id": election["id"], "name": "Fed candidate"}, headers=admin
+    ).json()
+    settles(lambda: [row["id"] for row in reader.get(f"/api/elections/{election['id']}/candidates").json()] == [candidate["id"]])
+
+    assert writer.post(f"/api/admin/start/{election['id']}", headers=admin).status_code == 200
+    settles(lambda: election["id"] in active_ids())
+    assert reader.get("/api/elections", headers={"If-None-Match": etag}).status_code == 200
+
+    vote = {"election_id": election["id"], "candidate_id": candidate["id"]}
+    assert writer.post("/api/vote", json=vote, headers=voter).status_code == 201
+    settles(lambda: active_ids(voter)[election["id"]]["has_voted"])
+
+    assert writer.post(f"/api/admin/close/{election['id']}", headers=admin).status_code == 200
+    settles(lambda: election["id"] not in active_ids())
+    assert reader.get(f"/api/admin/results/{election['id']}", headers=admin).json()["total_votes"] == 1
+
+
+def next_event(lines):
+    """The next Server-Sent Event as (event, data), skipping keep-alive comments."""
+    event = data = None
+    for line in lines:
+        if line.startswith("event: "):
+            event = line.removeprefix("event: ")
+        elif line.startswith("data: "):
+            data = json.loads(line.removeprefix("data: "))
+        elif not line and event is not None:
+            return event, data
+    raise AssertionError("stream ended")
+
+
+def open_election(client, admin, title):
+    """Create and start an election with one candidate; returns it with the vote for that candidate."""
+    election = client.post("/api/admin/election", json={"title": title}, headers=admin).json()
+    candidate = client.post(
+        "/api/admin/candidate", json={"election_id": election["id"], "name": f"{title} candidate"}, headers=admin
+    ).json()
+    assert client.post(f"/api/admin/start/{election['id']}", headers=admin).status_code == 200
+    return election, candidate, {"election_id": election["id"], "candidate_id": candidate["id"]}
+
+
+def test_other_worker_counts_and_streams_votes(workers):
+    writer, reader = workers["clients"]
+    admin, voter, voter2 = workers["admin"], workers["voter"], workers["voter2"]
+    election, candidate, vote = open_election(writer, admin, "Counted")
+    results = f"/api/admin/results/{election['id']}"
+
+    def total(client):
+        return client.get(results, headers=admin).json()["total_votes"]
+
+    def has_voted(client, headers):
+        listing = {row["id"]: row for row in client.get("/api/elections", headers=headers).json()}
+        return election["id"] in listing and listing[election["id"]]["has_voted"]
+
+    # The first vote also creates the election's shard, which the reader has not seen yet
+    with reader.stream("GET", f"{results}/stream", headers=admin, timeout=STALE_BOUND) as stream:
+        lines = stream.iter_lines()
+        event, snapshot = next_event(lines)
+        assert event == "snapshot" and snapshot["total_votes"] == 0
+        assert writer.post("/api/vote", json=vote, headers=voter).status_code == 201
+        event, update = next_event(lines)
+        assert event == "update"
+        assert update["changes"] == [{"candidate_id": candidate["id"], "vote_count": 1, "delta": 1}]
+    assert total(reader) == 1
+    settles(lambda: has_voted(reader, voter))
+    assert reader.post("/api/vote", json=vote, headers=voter).status_code == 400
+
+    # Each worker counts its own votes once, however many times its feed reads them back
+    assert reader.post("/api/vote", json=vote, headers=voter2).status_code == 201
+    settles(lambda: total(writer) == 2)
+    time.sleep(3 * SYNC_MS / 1000)
+    assert total(reader) == total(writer) == 2
+
+
+def test_worker_started_later_counts_unflushed_votes(workers):
+    writer, reader = workers["clients"]
+    admin = workers["admin"]
+    first, _, first_vote = open_election(writer, admin, "Early")
+    second, _, second_vote = open_election(writer, admin, "Early too")
+    for vote in (first_vote, second_vote):
+        assert writer.post("/api/vote", json=vote, headers=workers["voter"]).status_code == 201
+
+    def total(client, election):
+        return client.get(f"/api/admin/results/{election['id']}", headers=admin).json()["total_votes"]
+
+    # With in-memory counters, neither vote has been flushed to the stored tallies
+    late = start_worker(workers["env"])
+    try:
+        with httpx.Client(base_url=late.base_url) as client:
+            assert [total(client, first), total(client, second)] == [1, 1]
+            assert reader.post("/api/vote", json=first_vote, headers=workers["voter2"]).status_code == 201
+            settles(lambda: total(client, first) == 2)
+    finally:
+        late.terminate()
+        late.wait(timeout=30)
+
+
+def test_applied_listing_changes_are_pruned(workers):
+    writer, reader = workers["clients"]
+    # Aged past the retention
+    with sqlite3.connect(workers["database"]) as connection:
+        connection.execute("UPDATE cache_invalidations SET created_at = '2000-01-01 00:00:00'")
+        stale = connection.execute("SELECT count(*) FROM cache_invalidations").fetchone()[0]
+    assert stale > 0
+
+    election = writer.post("/api/admin/election", json={"title": "Pruned"}, headers=workers["admin"]).json()
+    with sqlite3.connect(workers["database"]) as connection:
+        rows = connection.execute("SELECT election_id FROM cache_invalidations").fetchall()
+    assert rows == [(election["id"],)]
@@ -0,0 +1,39 @@
+# test_db_modes.py
+"""The vote and results tests pass with the endpoints on sync sessions, on AsyncSessions and with sharded votes.
+
+VOTING_DB_MODE and VOTING_VOTE_SHARDING are read when the app is imported, so
+each mode runs those test modules in its own pytest process, against its own
+throwaway database.
+
+Run with:  python -m pytest test_db_modes.py
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+VOTE_AND_RESULTS_TESTS = [
+    "test_election_close.py", "test_voter_index.py", "test_query_counts.py", "test_idempotency.py",
+    "test_results_stream.py", "test_results_etag.py", "test_pagination.py",
+]
+# Modules whose fixtures cast votes through the vote path rather than into the main database
+SHARDED_TESTS = [
+    "test_vote_shards.py", "test_election_close.py", "test_voter_index.py", "test_idempotency.py",
+    "test_results_stream.py", "test_results_etag.py", "test_pagination.py",
+]
+
+
+@pytest.mark.parametrize("settings, tests", [
+    ({"VOTING_DB_MODE": "sync"}, VOTE_AND_RESULTS_TESTS),
+    ({"VOTING_DB_MODE": "async"}, VOTE_AND_RESULTS_TESTS),
+    ({"VOTING_DB_MODE": "sync", "VOTING_VOTE_SHARDING": "election"}, SHARDED_TESTS),
+    ({"VOTING_DB_MODE": "async", "VOTING_VOTE_SHARDING": "election"}, SHARDED_TESTS),
+], ids=["sync", "async", "sync-sharded", "async-sharded"])
+def test_vote_and_results_tests_pass(settings, tests):
+    completed = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", *tests],
+        cwd=BACKEND_DIR, env=dict(os.environ, **settings), capture_output=True, text=True
+    )
+    assert completed.returncode == 0, completed.stdout[-4000:]
@@ -0,0 +1,122 @@
+# test_election_close.py
+"""Closing an election stops voting and freezes its results in an immutable snapshot.
+
+Run with:  python -m pytest test_election_close.py
+"""
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DatabaseError
+
+import app as app_module
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="module")
+def election():
+    db = app_module.SessionLocal()
+    try:
+        admin = app_module.User(username="close-admin", email="close-admin@close.local", hashed_password="x", is_admin=True)
+        election = app_module.Election(title="Closing", is_active=True)
+        voters = [
+            app_module.User(username=f"close-voter{i}", email=f"close-voter{i}@close.local", hashed_password="x")
+            for i in range(3)
+        ]
+        db.add_all([admin, election, *voters])
+        db.flush()
+        candidates = [app_module.Candidate(election_id=election.id, name=f"Closing {i}") for i in range(2)]
+        db.add_all(candidates)
+        db.commit()
+        app_module.rebuild_candidate_tallies(db, election.id)
+        return {
+            "id": election.id,
+            "candidate_ids": [candidate.id for candidate in candidates],
+            "voter_ids": [voter.id for voter in voters],
+            "admin": {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(admin.id)})}"},
+            "voters": [
+                {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(voter.id)})}"}
+                for voter in voters
+            ],
+        }
+    finally:
+        db.close()
+
+
+def vote(client, election, voter, candidate):
+    return client.post(
+        "/api/vote",
+        json={"election_id": election["id"], "candidate_id": election["candidate_ids"][candidate]},
+        headers=election["voters"][voter],
+    )
+
+
+def test_close_freezes_final_results(client, election):
+    assert vote(client, election, 0, 0).status_code == 201
+    assert vote(client, election, 1, 1).status_code == 201
+
+    response = client.post(f"/api/admin/close/{election['id']}", headers=election["admin"])
+    assert response.status_code == 200, response.text
+    results = response.json()
+    assert results["total_votes"] == 2
+    assert [result["vote_count"] for result in results["results"]] == [1, 1]
+    assert response.headers["X-Results-Checksum"] == f"sha256={hashlib.sha256(response.content).hexdigest()}"
+
+    assert vote(client, election, 2, 0).status_code == 400
+    assert election["id"] not in [listed["id"] for listed in client.get("/api/elections").json()]
+    assert client.post(f"/api/admin/close/{election['id']}", headers=election["admin"]).status_code == 409
+    assert client.post(f"/api/admin/start/{election['id']}", headers=election["admin"]).status_code == 409
+
+
+def test_closed_results_do_not_count_votes(client, election):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    app_module.results_snapshots.clear()
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        response = client.get(f"/api/admin/results/{election['id']}", headers=election["admin"])
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    assert response.json()["total_votes"] == 2
+    assert not [statement for statement in statements if "votes" in statement or "candidate_tallies" in statement]
+
+    etag = response.headers["ETag"]
+    cached = client.get(f"/api/admin/results/{election['id']}", headers={**election["admin"], "If-None-Match": etag})
+    assert cached.status_code == 304
+
+
+def test_snapshot_rows_are_immutable(client, election):
+    db = app_module.SessionLocal()
+    try:
+        with pytest.raises(DatabaseError, match="immutable"):
+            db.query(app_module.ElectionResultSnapshot).filter(
+                app_module.ElectionResultSnapshot.election_id == election["id"]
+            ).update({"total_votes": 99})
+        db.rollback()
+    finally:
+        db.close()
+
+
+def test_vote_written_after_close_is_rolled_back(client, election):
+    ballot = app_module.VoteCreate(election_id=election["id"], candidate_id=election["candidate_ids"][0])
+    voter_id = election["voter_ids"][2]
+    db = app_module.SessionLocal()
+    try:
+        # A ballot validated before the close but written after it
+        with pytest.raises(app_module.ElectionClosedError):
+            app_module._record_vote(db, voter_id, ballot)
+    finally:
+        db.close()
+    outcomes = app_module.write_vote_batch([(voter_id, election["id"], election["candidate_ids"][0])])
+    assert isinstance(outcomes[0], app_module.ElectionClosedError)
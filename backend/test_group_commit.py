@@ -0,0 +1,119 @@
+# test_group_commit.py
+"""A group-commit batch fails only its duplicate votes, even when other connections vote meanwhile.
+
+Run with:  python -m pytest test_group_commit.py
+"""
+import itertools
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+
+_fixtures = itertools.count()
+
+
+@pytest.fixture
+def elections():
+    run = next(_fixtures)
+    db = app_module.SessionLocal()
+    try:
+        voters = [
+            app_module.User(username=f"group-voter{run}-{i}", email=f"group-voter{run}-{i}@group.local", hashed_password="x")
+            for i in range(3)
+        ]
+        elections = [app_module.Election(title=f"Group {i}", is_active=True) for i in range(2)]
+        db.add_all([*voters, *elections])
+        db.flush()
+        candidates = [app_module.Candidate(election_id=election.id, name="Grouped") for election in elections]
+        db.add_all(candidates)
+        db.commit()
+        election_ids = [election.id for election in elections]
+        ballots = {
+            "voters": [voter.id for voter in voters],
+            "ballots": [(election.id, candidate.id) for election, candidate in zip(elections, candidates)],
+        }
+    finally:
+        db.close()
+    # The write engine has a single connection, so the fixture must not hold it during the test
+    yield ballots
+    db = app_module.SessionLocal()
+    try:
+        db.query(app_module.Election).filter(app_module.Election.id.in_(election_ids)).update(
+            {"is_active": False}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def commit_elsewhere(user_id, election_id, candidate_id):
+    """Commit a vote through a connection the app does not know about."""
+    with sqlite3.connect(app_module.engine.url.database) as connection:
+        connection.execute(
+            "INSERT INTO votes (user_id, election_id, candidate_id, voted_at) VALUES (?, ?, ?, ?)",
+            (user_id, election_id, candidate_id, datetime.utcnow().isoformat(" "))
+        )
+
+
+def votes_of(election_id):
+    db = app_module.SessionLocal()
+    try:
+        return {user_id for user_id, in db.query(app_module.Vote.user_id).filter(app_module.Vote.election_id == election_id)}
+    finally:
+        db.close()
+
+
+def before_insert(monkeypatch, call_number, action):
+    """Run action() just before the call_number-th _insert_votes."""
+    insert_votes = app_module._insert_votes
+    calls = []
+
+    def insert(db, votes):
+        calls.append(votes)
+        if len(calls) == call_number:
+            action()
+        return insert_votes(db, votes)
+
+    monkeypatch.setattr(app_module, "_insert_votes", insert)
+    return calls
+
+
+def test_duplicate_committed_during_the_retry(monkeypatch, elections):
+    first, second, third = elections["voters"]
+    election_id, candidate_id = elections["ballots"][0]
+    commit_elsewhere(first, election_id, candidate_id)
+    # Between the lookup that finds the first voter's duplicate and the retry, the second voter votes elsewhere
+    calls = before_insert(monkeypatch, 2, lambda: commit_elsewhere(second, election_id, candidate_id))
+
+    outcomes = app_module._commit_vote_group(
+        app_module.SessionLocal(), [(voter, election_id, candidate_id) for voter in (first, second, third)]
+    )
+    assert [type(outcome) for outcome in outcomes] == [
+        app_module.DuplicateVoteError, app_module.DuplicateVoteError, type(None)
+    ]
+    assert len(calls) == 3
+    assert votes_of(election_id) == {first, second, third}
+
+
+def test_duplicate_committed_after_an_election_closed(monkeypatch, elections):
+    first, second, _ = elections["voters"]
+    (open_id, open_candidate), (closed_id, closed_candidate) = elections["ballots"]
+    accepting = app_module._elections_accepting_votes
+    checks = []
+
+    def closes_once(db, election_ids):
+        checks.append(election_ids)
+        return accepting(db, election_ids) - ({closed_id} if len(checks) == 1 else set())
+
+    monkeypatch.setattr(app_module, "_elections_accepting_votes", closes_once)
+    # After the closed election's vote is dropped, the first voter votes elsewhere before the retry
+    before_insert(monkeypatch, 2, lambda: commit_elsewhere(first, open_id, open_candidate))
+
+    outcomes = app_module._commit_vote_group(
+        app_module.SessionLocal(), [(first, open_id, open_candidate), (second, closed_id, closed_candidate)]
+    )
+    assert [type(outcome) for outcome in outcomes] == [app_module.DuplicateVoteError, app_module.ElectionClosedError]
+    assert votes_of(open_id) == {first}
+    assert votes_of(closed_id) == set()
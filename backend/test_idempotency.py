@@ -0,0 +1,83 @@
+# test_idempotency.py
+"""Retried mutations carrying an Idempotency-Key are replayed without running the handler.
+
+Run with:  python -m pytest test_idempotency.py
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import app as app_module
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="module")
+def ballot():
+    db = app_module.SessionLocal()
+    try:
+        election = app_module.Election(title="Idempotency", is_active=True)
+        voter = app_module.User(username="idem-voter", email="idem-voter@idem.local", hashed_password="x")
+        admin = app_module.User(username="idem-admin", email="idem-admin@idem.local", hashed_password="x", is_admin=True)
+        db.add_all([election, voter, admin])
+        db.flush()
+        candidates = [app_module.Candidate(election_id=election.id, name=f"Idem {i}") for i in range(2)]
+        db.add_all(candidates)
+        db.commit()
+        app_module.rebuild_candidate_tallies(db, election.id)
+        return {
+            "election_id": election.id,
+            "candidate_ids": [candidate.id for candidate in candidates],
+            "voter": {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(voter.id)})}"},
+            "admin": {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(admin.id)})}"},
+        }
+    finally:
+        db.close()
+
+
+def test_vote_retry_replays_the_first_response(client, ballot):
+    headers = {**ballot["voter"], "Idempotency-Key": "vote-1"}
+    vote = {"election_id": ballot["election_id"], "candidate_id": ballot["candidate_ids"][0]}
+    first = client.post("/api/vote", json=vote, headers=headers)
+    assert first.status_code == 201, first.text
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        retry = client.post("/api/vote", json=vote, headers=headers)
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+    assert (retry.status_code, retry.json()) == (201, first.json())
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert statements == []
+
+    # Without the key the handler runs and sees the existing vote
+    assert client.post("/api/vote", json=vote, headers=ballot["voter"]).status_code == 400
+
+
+def test_key_reused_with_another_body_is_rejected(client, ballot):
+    headers = {**ballot["voter"], "Idempotency-Key": "vote-1"}
+    vote = {"election_id": ballot["election_id"], "candidate_id": ballot["candidate_ids"][1]}
+    assert client.post("/api/vote", json=vote, headers=headers).status_code == 422
+
+
+def test_create_election_retry_creates_one_election(client, ballot):
+    headers = {**ballot["admin"], "Idempotency-Key": "election-1"}
+    first = client.post("/api/admin/election", json={"title": "Created once"}, headers=headers)
+    retry = client.post("/api/admin/election", json={"title": "Created once"}, headers=headers)
+    assert first.status_code == 201 and retry.json() == first.json()
+
+    db = app_module.SessionLocal()
+    try:
+        assert db.query(app_module.Election).filter(app_module.Election.title == "Created once").count() == 1
+    finally:
+        db.close()
@@ -0,0 +1,77 @@
+# test_lifespan.py
+"""Startup runs in the lifespan hook: importing does no I/O, and readiness follows warm-up.
+
+Run with:  python -m pytest test_lifespan.py
+"""
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+
+
+def test_import_opens_no_database(tmp_path):
+    database = tmp_path / "untouched.db"
+    env = dict(os.environ, VOTING_DATABASE_URL=f"sqlite:///{database}", VOTING_VOTE_SHARD_DIR=str(tmp_path / "shards"))
+    subprocess.run(
+        [sys.executable, "-c", "import app"], cwd=os.path.dirname(os.path.abspath(__file__)), env=env, check=True
+    )
+    assert not database.exists()
+
+
+@pytest.fixture
+def election_id():
+    db = app_module.SessionLocal()
+    try:
+        election = app_module.Election(title="Warm", is_active=True)
+        db.add(election)
+        db.flush()
+        election_id = election.id
+        db.commit()
+    finally:
+        db.close()
+    yield election_id
+    # Keep the shared first page of active elections as the other tests expect it
+    db = app_module.SessionLocal()
+    try:
+        db.query(app_module.Election).filter(app_module.Election.id == election_id).update({"is_active": False})
+        db.commit()
+    finally:
+        db.close()
+    app_module.bump_listing_versions(election_id)
+
+
+def test_ready_after_warm_up(election_id):
+    app_module.listing_cache.clear()
+
+    application = app_module.create_app(warm_up=True)
+    with TestClient(application) as client:
+        assert client.get("/health/live").status_code == 200
+        deadline = time.monotonic() + 10
+        response = client.get("/health/ready")
+        while response.status_code == 503 and time.monotonic() < deadline:
+            assert response.headers["Retry-After"] == "1"
+            time.sleep(0.05)
+            response = client.get("/health/ready")
+        assert response.status_code == 200
+        report = response.json()["warm_up"]
+        assert report["connections"] >= 1 and report["listings"] >= 2
+
+        elections_page = app_module.parse_page(None, None, None, app_module.ElectionResponse).cache_key()
+        candidates_page = app_module.parse_page(None, None, None, app_module.CandidateResponse).cache_key()
+        assert app_module.listing_cache.get((app_module.ACTIVE_ELECTIONS_KEY, elections_page)) is not None
+        assert app_module.listing_cache.get((("election", election_id), candidates_page)) is not None
+    assert application.state.ready is False
+
+
+def test_ready_without_warm_up():
+    application = app_module.create_app(warm_up=False)
+    assert application.state.ready is False
+    with TestClient(application) as client:
+        response = client.get("/health/ready")
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready", "warm_up": None}
@@ -0,0 +1,153 @@
+# test_pagination.py
+"""Listings page by cursor over HTTP: headers, field projection, bad input and the caller's vote history.
+
+Run with:  python -m pytest test_pagination.py
+"""
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+def bearer(user_id):
+    return {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(user_id)})}"}
+
+
+@pytest.fixture(scope="module")
+def election():
+    db = app_module.SessionLocal()
+    try:
+        election = app_module.Election(title="Paged", is_active=True)
+        db.add(election)
+        db.flush()
+        candidates = [app_module.Candidate(election_id=election.id, name=f"Paged {i}", description=f"#{i}") for i in range(7)]
+        db.add_all(candidates)
+        db.commit()
+        election_id, candidate_ids = election.id, [candidate.id for candidate in candidates]
+    finally:
+        db.close()
+    app_module.bump_listing_versions(election_id)
+    return {"id": election_id, "candidate_ids": candidate_ids}
+
+
+@pytest.fixture(scope="module")
+def voter():
+    db = app_module.SessionLocal()
+    try:
+        user = app_module.User(username="page-voter", email="page-voter@example.com", hashed_password="x")
+        elections = [app_module.Election(title=f"Voted {i}", is_active=True) for i in range(5)]
+        db.add_all([user, *elections])
+        db.flush()
+        candidates = [app_module.Candidate(election_id=election.id, name=f"Choice {i}") for i, election in enumerate(elections)]
+        db.add_all(candidates)
+        db.commit()
+        votes = [
+            {"election_id": election.id, "election_title": election.title, "candidate_id": candidate.id, "candidate_name": candidate.name}
+            for election, candidate in zip(elections, candidates)
+        ]
+        user_id = user.id
+    finally:
+        db.close()
+    for vote in votes:
+        app_module.bump_listing_versions(vote["election_id"])
+    return {"headers": bearer(user_id), "votes": votes}
+
+
+def walk(client, url, **kwargs):
+    """Follow X-Next-Cursor from the first page to the last, checking the headers on every page."""
+    pages, cursor = [], None
+    while True:
+        params = dict(kwargs.pop("params", {}), **({"cursor": cursor} if cursor else {}))
+        response = client.get(url, params=params, **kwargs)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            assert "Link" not in response.headers
+            return pages
+        link = response.headers["Link"]
+        assert link.endswith('>; rel="next"')
+        next_url = urlsplit(link[1:link.index(">")])
+        assert next_url.path == url
+        assert parse_qs(next_url.query)["cursor"] == [cursor]
+        kwargs["params"] = params
+
+
+def test_candidates_walk_every_page_in_id_order(client, election):
+    pages = walk(client, f"/api/elections/{election['id']}/candidates", params={"limit": 3})
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [candidate["id"] for page in pages for candidate in page] == election["candidate_ids"]
+    first = pages[0][0]
+    assert set(first) == {"id", "election_id", "name", "description", "created_at"}
+    assert (first["election_id"], first["name"], first["description"]) == (election["id"], "Paged 0", "#0")
+
+
+def test_exact_last_page_has_no_next_link(client, election):
+    url = f"/api/elections/{election['id']}/candidates"
+    response = client.get(url, params={"limit": len(election["candidate_ids"])})
+    assert len(response.json()) == len(election["candidate_ids"])
+    assert "X-Next-Cursor" not in response.headers and "Link" not in response.headers
+
+    pages = walk(client, url, params={"limit": 1})
+    assert len(pages) == len(election["candidate_ids"])
+
+
+def test_link_keeps_the_other_query_parameters(client, election):
+    response = client.get(f"/api/elections/{election['id']}/candidates", params={"limit": 2, "fields": "name"})
+    query = parse_qs(urlsplit(response.headers["Link"][1:response.headers["Link"].index(">")]).query)
+    assert query["limit"] == ["2"] and query["fields"] == ["name"]
+    assert query["cursor"] == [response.headers["X-Next-Cursor"]]
+
+
+def test_fields_projects_columns_and_keeps_the_id(client, election):
+    pages = walk(client, f"/api/elections/{election['id']}/candidates", params={"limit": 4, "fields": "name"})
+    rows = [candidate for page in pages for candidate in page]
+    assert rows == [{"id": candidate_id, "name": f"Paged {i}"} for i, candidate_id in enumerate(election["candidate_ids"])]
+
+    response = client.get(f"/api/elections/{election['id']}/candidates", params={"fields": "description,id"})
+    assert all(set(candidate) == {"id", "description"} for candidate in response.json())
+
+
+def test_elections_listing_projects_fields(client, election):
+    pages = walk(client, "/api/elections", params={"limit": 2, "fields": "title"})
+    rows = [row for page in pages for row in page]
+    assert all(set(row) == {"id", "title"} for row in rows)
+    assert {"id": election["id"], "title": "Paged"} in rows
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+
+
+@pytest.mark.parametrize("params, detail", [
+    ({"cursor": "not-a-cursor"}, "Invalid cursor"),
+    ({"cursor": "!!"}, "Invalid cursor"),
+    ({"fields": "id,votes"}, "Unknown fields: votes"),
+])
+def test_bad_cursor_or_fields_is_rejected(client, election, params, detail):
+    for url in (f"/api/elections/{election['id']}/candidates", "/api/elections"):
+        response = client.get(url, params=params)
+        assert response.status_code == 400
+        assert detail in response.json()["detail"]
+
+
+def test_my_votes_lists_and_pages_the_callers_votes(client, voter):
+    headers = voter["headers"]
+    assert client.get("/api/me/votes", headers=headers).json() == []
+    for vote in voter["votes"]:
+        ballot = {"election_id": vote["election_id"], "candidate_id": vote["candidate_id"]}
+        assert client.post("/api/vote", json=ballot, headers=headers).status_code == 201
+
+    pages = walk(client, "/api/me/votes", params={"limit": 2}, headers=headers)
+    assert [len(page) for page in pages] == [2, 2, 1]
+    history = [entry for page in pages for entry in page]
+    assert [{key: entry[key] for key in voter["votes"][0]} for entry in history] == voter["votes"]
+    assert all(entry["voted_at"] for entry in history)
+
+    assert client.get("/api/me/votes", params={"cursor": "not-a-cursor"}, headers=headers).status_code == 400
+    assert client.get("/api/me/votes").status_code == 401
@@ -0,0 +1,68 @@
+# test_password_hashing.py
+"""Password hashing follows the serving event loop, and logins rehash passwords made at another cost.
+
+Run with:  python -m pytest test_password_hashing.py
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from password_hashing import PasswordHasher, crypt_context, hash_password
+
+
+def test_hasher_works_on_each_new_event_loop():
+    # Built outside any loop, as the app's hasher is at import
+    hasher = PasswordHasher(rounds=4, workers=0, max_concurrency=1)
+
+    async def contend():
+        # More hashes than max_concurrency, so callers wait on the semaphore
+        return await asyncio.gather(*(hasher.hash(f"password{i}") for i in range(3)))
+
+    for _ in range(2):
+        hashes = asyncio.run(contend())
+        assert all(crypt_context(4).verify(f"password{i}", hashed) for i, hashed in enumerate(hashes))
+    assert hasher.stats()["completed"] == 6
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+def stored_hash(user_id):
+    db = app_module.SessionLocal()
+    try:
+        return db.get(app_module.User, user_id).hashed_password
+    finally:
+        db.close()
+
+
+def test_login_rehashes_at_the_configured_cost(client):
+    other_rounds = app_module.BCRYPT_ROUNDS + 1
+    db = app_module.SessionLocal()
+    try:
+        user = app_module.User(
+            username="rehash-voter", email="rehash-voter@rehash.local",
+            hashed_password=hash_password("secret123", other_rounds)
+        )
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    finally:
+        db.close()
+    assert stored_hash(user_id).startswith(f"$2b${other_rounds:02d}$")
+
+    assert client.post("/api/login", json={"username": "rehash-voter", "password": "wrong-password"}).status_code == 401
+    assert stored_hash(user_id).startswith(f"$2b${other_rounds:02d}$")
+
+    assert client.post("/api/login", json={"username": "rehash-voter", "password": "secret123"}).status_code == 200
+    rehashed = stored_hash(user_id)
+    assert rehashed.startswith(f"$2b${app_module.BCRYPT_ROUNDS:02d}$")
+    assert crypt_context(app_module.BCRYPT_ROUNDS).verify("secret123", rehashed)
+
+    # Already at the configured cost: left as is
+    assert client.post("/api/login", json={"username": "rehash-voter", "password": "secret123"}).status_code == 200
+    assert stored_hash(user_id) == rehashed
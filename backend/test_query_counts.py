@@ -0,0 +1,153 @@
+# test_query_counts.py
+"""Per-request query counts must not grow with the data size.
+
+The suite runs with VOTING_QUERY_STRICT=1 (see conftest.py), so any request
+that repeats one statement more than VOTING_QUERY_REPEAT_LIMIT times raises
+RepeatedQueryError. On top of that, each test below issues the same request
+against a small and a large election and expects the same number of
+statements for both.
+
+Run with:  python -m pytest test_query_counts.py
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+import app as app_module
+from metrics import RepeatedQueryError, RequestStats, current_request, next_chunk
+
+
+def make_election(title, candidates, voters):
+    db = app_module.SessionLocal()
+    try:
+        election = app_module.Election(title=title, is_active=True)
+        db.add(election)
+        db.flush()
+        candidate_rows = [app_module.Candidate(election_id=election.id, name=f"{title} {i}") for i in range(candidates)]
+        db.add_all(candidate_rows)
+        users = [
+            app_module.User(username=f"{title}-voter{i}", email=f"{title}-voter{i}@counts.local", hashed_password="x")
+            for i in range(voters)
+        ]
+        db.add_all(users)
+        db.flush()
+        db.add_all([
+            app_module.Vote(user_id=user.id, election_id=election.id, candidate_id=candidate_rows[i % candidates].id)
+            for i, user in enumerate(users)
+        ])
+        db.commit()
+        app_module.rebuild_candidate_tallies(db, election.id)
+        return election.id, [candidate.id for candidate in candidate_rows]
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    db = app_module.SessionLocal()
+    try:
+        admin = app_module.User(username="counts-admin", email="counts-admin@counts.local", hashed_password="x", is_admin=True)
+        db.add(admin)
+        db.commit()
+        return {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(admin.id)})}"}
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="module")
+def elections():
+    return {
+        "small": make_election("small", candidates=2, voters=3),
+        "large": make_election("large", candidates=25, voters=60),
+    }
+
+
+def count_statements(send):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        response = send()
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+    assert response.status_code < 400, response.text
+    return len(statements)
+
+
+def test_results_query_count_is_constant(client, admin_headers, elections):
+    # Warm the user cache so both requests authenticate the same way
+    client.get(f"/api/admin/results/{elections['small'][0]}", headers=admin_headers)
+    counts = {
+        size: count_statements(lambda: client.get(f"/api/admin/results/{election_id}", headers=admin_headers))
+        for size, (election_id, _) in elections.items()
+    }
+    assert counts["small"] == counts["large"], counts
+
+
+def test_candidate_listing_query_count_is_constant(client, elections):
+    counts = {
+        size: count_statements(lambda: client.get(f"/api/elections/{election_id}/candidates"))
+        for size, (election_id, _) in elections.items()
+    }
+    assert counts["small"] == counts["large"], counts
+
+
+def test_metrics_endpoint_reports_routes(client, elections):
+    client.get(f"/api/elections/{elections['small'][0]}/candidates")
+    body = client.get("/metrics").text
+    assert 'voting_http_request_duration_seconds_count{method="GET",route="/api/elections/{election_id}/candidates"' in body
+    assert 'voting_db_queries_per_request_count{route="/api/elections/{election_id}/candidates"}' in body
+
+
+def test_dashboard_query_count_is_constant(client, elections):
+    election_id = elections["small"][0]
+    # The fixture's votes were written behind the app's back; load them as startup would
+    app_module.warm_voter_index()
+    db = app_module.SessionLocal()
+    try:
+        voter_id = db.query(app_module.Vote.user_id).filter(app_module.Vote.election_id == election_id).first()[0]
+    finally:
+        db.close()
+    headers = {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(voter_id)})}"}
+    # Warm the user cache, then count a dashboard rendered from the database each time
+    client.get("/api/dashboard", headers=headers)
+
+    def dashboard():
+        app_module.listing_cache.clear()
+        return client.get("/api/dashboard", headers=headers)
+
+    before = count_statements(dashboard)
+    make_election("extra", candidates=10, voters=0)
+    assert count_statements(dashboard) == before <= 2
+
+    listed = {election["id"]: election for election in dashboard().json()}
+    assert listed[election_id]["has_voted"] is True
+    assert [candidate["id"] for candidate in listed[elections["large"][0]]["candidates"]] == elections["large"][1]
+    assert not listed[elections["large"][0]]["has_voted"]
+
+
+def test_repeats_are_counted_per_chunk():
+    token = current_request.set(RequestStats())
+    try:
+        with app_module.engine.connect() as connection:
+            # One lookup per chunk, for more chunks than the limit
+            for _ in range(app_module.QUERY_REPEAT_LIMIT + 2):
+                next_chunk()
+                connection.execute(text("SELECT count(*) FROM users WHERE id IN (:a, :b)"), {"a": 1, "b": 2})
+            # One per row within a chunk is still an N+1 loop
+            next_chunk()
+            with pytest.raises(RepeatedQueryError):
+                for user_id in range(app_module.QUERY_REPEAT_LIMIT + 1):
+                    connection.execute(text("SELECT username FROM users WHERE id = :id"), {"id": user_id})
+    finally:
+        current_request.reset(token)
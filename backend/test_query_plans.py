@@ -0,0 +1,137 @@
+# test_query_plans.py
+"""Query-plan regression tests for the hot read paths.
+
+Each test runs the real helper behind an endpoint against a throwaway
+database, records the SQL it sends, and runs EXPLAIN QUERY PLAN on every
+statement that reads a table. A plan step that scans a whole table
+("SCAN votes") instead of searching an index fails the test.
+
+Run with:  python -m pytest test_query_plans.py
+"""
+import pytest
+from sqlalchemy import event
+
+import app as app_module
+
+
+@pytest.fixture(scope="module")
+def election():
+    db = app_module.SessionLocal()
+    try:
+        users = [
+            app_module.User(username=f"plan{i}", email=f"plan{i}@plans.local", hashed_password="x")
+            for i in range(3)
+        ]
+        db.add_all(users)
+        election = app_module.Election(title="Plans", is_active=True)
+        db.add(election)
+        db.flush()
+        candidates = [app_module.Candidate(election_id=election.id, name=f"Candidate {i}") for i in range(2)]
+        db.add_all(candidates)
+        db.commit()
+        return {
+            "id": election.id,
+            "candidate_ids": [candidate.id for candidate in candidates],
+            "user_ids": [user.id for user in users],
+        }
+    finally:
+        db.close()
+
+
+def captured_statements(fn, *args):
+    """Run fn(session, *args) and return the (sql, parameters) it executed."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(app_module.engine, "before_cursor_execute", record)
+    db = app_module.SessionLocal()
+    try:
+        fn(db, *args)
+    finally:
+        db.close()
+        event.remove(app_module.engine, "before_cursor_execute", record)
+    return statements
+
+
+def full_scans(statements):
+    scans = []
+    connection = app_module.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for statement, parameters in statements:
+            if statement.lstrip().upper().startswith("INSERT") and "SELECT" not in statement.upper():
+                continue
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            for row in cursor.fetchall():
+                detail = row[-1]
+                if detail.startswith("SCAN ") and detail != "SCAN CONSTANT ROW":
+                    scans.append(f"{detail}  <-  {statement}")
+    finally:
+        connection.close()
+    return scans
+
+
+def assert_no_full_scans(statements):
+    assert statements, "no SQL was captured"
+    scans = full_scans(statements)
+    assert not scans, "full table scans:\n" + "\n".join(scans)
+
+
+def page(cursor=None, fields=None, schema=app_module.ElectionResponse):
+    return app_module.parse_page(cursor, 1, fields, schema)
+
+
+def test_list_active_elections(election):
+    assert_no_full_scans(captured_statements(app_module._render_active_elections, page()))
+    assert_no_full_scans(captured_statements(
+        app_module._render_active_elections, page(app_module.encode_cursor(election["id"]), "title")
+    ))
+
+
+def test_list_candidates(election):
+    candidate_page = page(app_module.encode_cursor(election["candidate_ids"][0]), "name", app_module.CandidateResponse)
+    assert_no_full_scans(captured_statements(app_module._render_candidates, election["id"], candidate_page))
+
+
+def test_vote_history(election):
+    app_module.write_vote_batch([(election["user_ids"][2], election["id"], election["candidate_ids"][0])])
+    history_page = page(app_module.encode_cursor(0), None, app_module.VoteHistoryEntry)
+
+    def load_and_render(db):
+        votes, _ = app_module._load_vote_page(db, election["user_ids"][2], history_page)
+        assert [vote.election_id for vote in votes] == [election["id"]]
+        app_module._render_vote_history(db, votes)
+
+    assert_no_full_scans(captured_statements(load_and_render))
+
+
+def test_get_election_results(election):
+    assert_no_full_scans(captured_statements(app_module._load_election_results, election["id"]))
+
+
+def test_cast_vote(election):
+    vote = app_module.VoteCreate(election_id=election["id"], candidate_id=election["candidate_ids"][0])
+
+    def validate_and_record(db):
+        app_module._validate_ballot(db, vote)
+        app_module._record_vote(db, election["user_ids"][0], vote)
+
+    assert_no_full_scans(captured_statements(validate_and_record))
+
+
+def test_group_commit_duplicate_lookup(election):
+    vote = (election["user_ids"][1], election["id"], election["candidate_ids"][1])
+    app_module.write_vote_batch([vote])
+
+    def write_duplicate(db):
+        outcomes = app_module._commit_vote_group(db, [vote])
+        assert isinstance(outcomes[0], app_module.DuplicateVoteError)
+
+    assert_no_full_scans(captured_statements(write_duplicate))
+
+
+def test_rebuild_candidate_tallies(election):
+    assert_no_full_scans(captured_statements(app_module.rebuild_candidate_tallies, election["id"]))
@@ -0,0 +1,76 @@
+# test_results_etag.py
+"""Admin results answer If-None-Match with 304 until a vote, a new candidate or the close changes them.
+
+Run with:  python -m pytest test_results_etag.py
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+def bearer(user_id):
+    return {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(user_id)})}"}
+
+
+@pytest.fixture(scope="module")
+def election():
+    db = app_module.SessionLocal()
+    try:
+        admin = app_module.User(username="etag-admin", email="etag-admin@etag.local", hashed_password="x", is_admin=True)
+        voter = app_module.User(username="etag-voter", email="etag-voter@etag.local", hashed_password="x")
+        election = app_module.Election(title="Tagged", is_active=True)
+        db.add_all([admin, voter, election])
+        db.flush()
+        candidate = app_module.Candidate(election_id=election.id, name="Tagged")
+        db.add(candidate)
+        db.commit()
+        return {"id": election.id, "candidate_id": candidate.id, "admin": bearer(admin.id), "voter": bearer(voter.id)}
+    finally:
+        db.close()
+
+
+def test_results_etag_follows_every_change(client, election):
+    url = f"/api/admin/results/{election['id']}"
+
+    def fetch(etag=None):
+        headers = dict(election["admin"], **({"If-None-Match": etag} if etag else {}))
+        return client.get(url, headers=headers)
+
+    def current_etag():
+        response = fetch()
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        revalidated = fetch(etag)
+        assert revalidated.status_code == 304 and revalidated.headers["ETag"] == etag and not revalidated.content
+        return etag
+
+    initial = current_etag()
+    assert initial.startswith('"live-') and fetch().headers["Cache-Control"] == "no-cache"
+    assert current_etag() == initial
+
+    vote = {"election_id": election["id"], "candidate_id": election["candidate_id"]}
+    assert client.post("/api/vote", json=vote, headers=election["voter"]).status_code == 201
+    voted = current_etag()
+    assert voted != initial
+    assert fetch(initial).status_code == 200
+
+    response = client.post(
+        "/api/admin/candidate", json={"election_id": election["id"], "name": "Late entry"}, headers=election["admin"]
+    )
+    assert response.status_code in (200, 201)
+    with_candidate = current_etag()
+    assert with_candidate not in (initial, voted)
+
+    closed = client.post(f"/api/admin/close/{election['id']}", headers=election["admin"])
+    assert closed.status_code == 200
+    frozen = current_etag()
+    assert frozen == closed.headers["ETag"] == f'"{closed.headers["X-Results-Checksum"].removeprefix("sha256=")}"'
+    assert frozen not in (initial, voted, with_candidate)
+    assert fetch(with_candidate).status_code == 200
@@ -0,0 +1,124 @@
+# test_results_stream.py
+"""The live results stream sends a snapshot, then updates, then the closed results, and misses no vote.
+
+The endpoint is called directly and its body iterated, since the test client
+only returns a streamed response once it has ended.
+
+Run with:  python -m pytest test_results_stream.py
+"""
+import asyncio
+import itertools
+import json
+
+import pytest
+from fastapi.concurrency import run_in_threadpool
+
+import app as app_module
+
+ADMIN = app_module.UserPrincipal(id=0, username="stream-admin", is_admin=True)
+_fixtures = itertools.count()
+
+
+def sessions():
+    """(read, write) sessions of the kind the endpoints get in this DB mode."""
+    if app_module.DB_MODE == "async":
+        return app_module.AsyncReadSessionLocal(), app_module.AsyncSessionLocal()
+    return app_module.ReadSessionLocal(), app_module.SessionLocal()
+
+
+@pytest.fixture
+def election(monkeypatch):
+    monkeypatch.setattr(app_module.results_broadcaster, "_tick_interval", 0.02)
+    run = next(_fixtures)
+    db = app_module.SessionLocal()
+    try:
+        election = app_module.Election(title=f"Streamed {run}", is_active=True)
+        voters = [
+            app_module.User(username=f"stream-voter{run}-{i}", email=f"stream-voter{run}-{i}@stream.local", hashed_password="x")
+            for i in range(2)
+        ]
+        db.add(election)
+        db.add_all(voters)
+        db.flush()
+        candidate = app_module.Candidate(election_id=election.id, name="Streamed")
+        db.add(candidate)
+        db.commit()
+        return {"id": election.id, "candidate_id": candidate.id, "voters": [voter.id for voter in voters]}
+    finally:
+        db.close()
+
+
+def vote(election, voter):
+    """Commit a vote and publish it, as the vote endpoints do."""
+    outcomes = app_module.write_vote_batch([(voter, election["id"], election["candidate_id"])])
+    assert outcomes == [None]
+
+
+async def next_event(events, timeout=2.0):
+    message = (await asyncio.wait_for(events.__anext__(), timeout)).decode()
+    event, data = message.strip().split("\n")
+    return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+async def open_stream(election_id):
+    read_db, _ = sessions()
+    response = await app_module.stream_election_results(election_id, db=read_db, admin=ADMIN)
+    return response.body_iterator
+
+
+def test_snapshot_then_updates_then_closed(election):
+    async def scenario():
+        events = await open_stream(election["id"])
+        event, snapshot = await next_event(events)
+        assert event == "snapshot" and snapshot["total_votes"] == 0
+
+        await run_in_threadpool(vote, election, election["voters"][0])
+        event, update = await next_event(events)
+        assert event == "update"
+        assert update["changes"] == [{"candidate_id": election["candidate_id"], "vote_count": 1, "delta": 1}]
+
+        _, write_db = sessions()
+        await app_module.close_election(election["id"], db=write_db, admin=ADMIN)
+        event, closed = await next_event(events)
+        assert event == "closed" and closed["total_votes"] == 1
+        with pytest.raises(StopAsyncIteration):
+            await events.__anext__()
+        assert app_module.results_broadcaster.subscriber_count == 0
+
+        # Once closed, the stream is the frozen results alone
+        event, frozen = await next_event(await open_stream(election["id"]))
+        assert event == "snapshot" and frozen == closed
+
+    asyncio.run(scenario())
+
+
+def test_vote_between_snapshot_and_stream_start_is_sent(monkeypatch, election):
+    load_election_results = app_module._load_election_results
+
+    def load_then_vote(db, election_id):
+        results = load_election_results(db, election_id)
+        # Committed after the snapshot was read, before its first event is sent
+        vote(election, election["voters"][1])
+        return results
+
+    monkeypatch.setattr(app_module, "_load_election_results", load_then_vote)
+
+    async def scenario():
+        events = await open_stream(election["id"])
+        event, snapshot = await next_event(events)
+        assert event == "snapshot" and snapshot["total_votes"] == 0
+        event, update = await next_event(events)
+        assert event == "update" and update["changes"][0]["vote_count"] == 1
+        await events.aclose()
+        assert app_module.results_broadcaster.subscriber_count == 0
+
+    asyncio.run(scenario())
+
+
+def test_unknown_election_leaves_no_subscriber():
+    async def scenario():
+        with pytest.raises(app_module.HTTPException):
+            await open_stream(10 ** 9)
+        assert app_module.results_broadcaster.subscriber_count == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,75 @@
+# test_serialization.py
+"""Bodies encoded from column tuples are byte-for-byte what schema serialization produced.
+
+Run with:  python -m pytest test_serialization.py
+"""
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+import app as app_module
+from fast_json import json_codec
+
+
+@pytest.fixture(scope="module")
+def election_id():
+    db = app_module.SessionLocal()
+    try:
+        election = app_module.Election(title="Élection — serialization", is_active=True)
+        db.add(election)
+        db.flush()
+        db.add_all([
+            app_module.Candidate(election_id=election.id, name=f"Candidat {i} ✓", description="x" if i % 2 else None)
+            for i in range(5)
+        ])
+        db.commit()
+        return election.id
+    finally:
+        db.close()
+
+
+def schema_body(schema, objects) -> bytes:
+    """What the endpoints returned when they serialized ORM objects through their response schema."""
+    models = [schema.model_validate(obj, from_attributes=True) for obj in objects]
+    return json.dumps(jsonable_encoder(models), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def test_listings_match_schema_serialization(election_id):
+    page = app_module.parse_page(None, app_module.PAGE_SIZE_MAX, None, app_module.ElectionResponse)
+    db = app_module.SessionLocal()
+    try:
+        candidates = db.query(app_module.Candidate).filter(
+            app_module.Candidate.election_id == election_id
+        ).order_by(app_module.Candidate.id).all()
+        body, _ = app_module._render_candidates(db, election_id, page)
+        assert body == schema_body(app_module.CandidateResponse, candidates)
+
+        elections = db.query(app_module.Election).filter(
+            app_module.Election.is_active == True
+        ).order_by(app_module.Election.id).limit(page.limit).all()
+        body, _ = app_module._render_active_elections(db, page)
+        assert body == schema_body(app_module.ElectionResponse, elections)
+    finally:
+        db.close()
+
+
+def test_results_match_schema(election_id):
+    db = app_module.SessionLocal()
+    try:
+        content = app_module._load_election_results(db, election_id)
+    finally:
+        db.close()
+    model = app_module.ElectionResults.model_validate(content)
+    assert app_module._dump_json(content) == app_module._dump_json(jsonable_encoder(model))
+
+
+def test_codecs_agree():
+    pytest.importorskip("orjson")
+    content = [
+        {"id": 1, "title": "Ünïcode ✓ \"quoted\"", "description": None, "is_active": True,
+         "created_at": datetime(2024, 5, 1, 12, 30, 0, 1234)},
+        {"id": 2, "title": "", "description": "line\nbreak", "is_active": False, "created_at": datetime(2024, 5, 1)},
+    ]
+    assert json_codec("orjson").dumps(content) == json_codec("stdlib").dumps(content)
@@ -0,0 +1,105 @@
+# test_storage.py
+"""Every connection an engine opens carries its storage profile's pragmas.
+
+Run with:  python -m pytest test_storage.py
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import app as app_module
+from storage import create_engines, storage_profile
+
+PRAGMAS = ["journal_mode", "synchronous", "cache_size", "mmap_size", "busy_timeout", "query_only"]
+# PRAGMA synchronous reports a number
+SYNCHRONOUS = {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3}
+
+
+def expected_pragmas(name: str, read_only: bool) -> dict:
+    if name == "default":
+        return {"journal_mode": "delete", "busy_timeout": 2500, "query_only": 0}
+    return {
+        "journal_mode": "wal",
+        "synchronous": SYNCHRONOUS["FULL"],
+        "cache_size": -1024,
+        "mmap_size": 1024 * 1024,
+        "busy_timeout": 2500,
+        "query_only": int(read_only),
+    }
+
+
+def profile(name: str):
+    return storage_profile(name, synchronous="FULL", cache_size_kib=1024, mmap_size=1024 * 1024)
+
+
+def read_pragmas(connection) -> dict:
+    values = {pragma: connection.exec_driver_sql(f"PRAGMA {pragma}").scalar() for pragma in PRAGMAS}
+    values["journal_mode"] = values["journal_mode"].lower()
+    return values
+
+
+def assert_applied(values: dict, expected: dict):
+    assert {pragma: values[pragma] for pragma in expected} == expected
+
+
+@pytest.mark.parametrize("name", ["default", "wal"])
+def test_profile_pragmas_on_every_connection(tmp_path, name):
+    write_engine, read_engine = create_engines(
+        create_engine, f"sqlite:///{tmp_path / 'profile.db'}", profile(name),
+        busy_timeout=2.5, pool_size=3, max_overflow=0, pool_timeout=5
+    )
+    try:
+        assert (write_engine is read_engine) == (name == "default")
+        # Several connections held at once, so each is a new one
+        for engine, read_only in ((write_engine, False), (read_engine, name == "wal")):
+            connections = [engine.connect() for _ in range(engine.pool.size())]
+            try:
+                for connection in connections:
+                    assert_applied(read_pragmas(connection), expected_pragmas(name, read_only))
+            finally:
+                for connection in connections:
+                    connection.close()
+
+        if name == "wal":
+            with write_engine.begin() as connection:
+                connection.exec_driver_sql("CREATE TABLE written (id INTEGER PRIMARY KEY)")
+            with read_engine.connect() as connection, pytest.raises(OperationalError, match="readonly"):
+                connection.exec_driver_sql("INSERT INTO written DEFAULT VALUES")
+    finally:
+        write_engine.dispose()
+        read_engine.dispose()
+
+
+def test_profile_pragmas_on_async_connections(tmp_path):
+    async def scenario():
+        write_engine, read_engine = create_engines(
+            create_async_engine, f"sqlite+aiosqlite:///{tmp_path / 'async.db'}", profile("wal"),
+            busy_timeout=2.5, pool_size=2, max_overflow=0, pool_timeout=5
+        )
+        try:
+            for engine, read_only in ((write_engine, False), (read_engine, True)):
+                async with engine.connect() as connection:
+                    values = await connection.run_sync(read_pragmas)
+                assert_applied(values, expected_pragmas("wal", read_only))
+        finally:
+            await write_engine.dispose()
+            await read_engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        storage_profile("turbo")
+
+
+def test_app_engines_use_the_configured_profile():
+    with app_module.engine.connect() as connection:
+        values = read_pragmas(connection)
+    assert values["busy_timeout"] == int(app_module.DB_BUSY_TIMEOUT * 1000)
+    assert values["journal_mode"] == (app_module.STORAGE_PROFILE.journal_mode or "delete").lower()
+    with app_module.read_engine.connect() as connection:
+        assert read_pragmas(connection)["query_only"] == int(app_module.STORAGE_PROFILE.split_engines)
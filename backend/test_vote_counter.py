@@ -0,0 +1,116 @@
+# test_vote_counter.py
+"""The in-memory vote counter is rebuilt from the votes and flushes its deltas to candidate_tallies exactly once.
+
+Run with:  python -m pytest test_vote_counter.py
+"""
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+from vote_counters import ShardedVoteCounter
+
+
+@pytest.fixture
+def election():
+    db = app_module.SessionLocal()
+    try:
+        election = app_module.Election(title="Counted", is_active=True)
+        db.add(election)
+        db.flush()
+        candidates = [app_module.Candidate(election_id=election.id, name=f"Counted {i}") for i in range(2)]
+        db.add_all(candidates)
+        db.commit()
+        return {"id": election.id, "candidates": [candidate.id for candidate in candidates]}
+    finally:
+        db.close()
+
+
+def stored_tallies(election_id):
+    db = app_module.SessionLocal()
+    try:
+        return dict(db.query(app_module.CandidateTally.candidate_id, app_module.CandidateTally.vote_count).filter(
+            app_module.CandidateTally.election_id == election_id
+        ))
+    finally:
+        db.close()
+
+
+def cast_votes(election, candidate_id, count):
+    """Commit vote rows the way a worker does before its counter flushes."""
+    db = app_module.SessionLocal()
+    try:
+        voters = [
+            app_module.User(username=f"counted-{election['id']}-{candidate_id}-{i}",
+                            email=f"counted-{election['id']}-{candidate_id}-{i}@count.local", hashed_password="x")
+            for i in range(count)
+        ]
+        db.add_all(voters)
+        db.flush()
+        db.add_all([
+            app_module.Vote(user_id=voter.id, election_id=election["id"], candidate_id=candidate_id, voted_at=datetime.utcnow())
+            for voter in voters
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_flush_tally_deltas_adds_to_stored_counts(election):
+    first, second = election["candidates"]
+    app_module.flush_tally_deltas([(election["id"], first, 2), (election["id"], second, 1)])
+    app_module.flush_tally_deltas([(election["id"], first, 3)])
+    assert stored_tallies(election["id"]) == {first: 5, second: 1}
+
+
+def test_failed_flush_is_requeued(election):
+    first, second = election["candidates"]
+    calls = []
+
+    def flaky_flush(deltas):
+        calls.append(sorted(deltas))
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        app_module.flush_tally_deltas(deltas)
+
+    counter = ShardedVoteCounter(stripes=4, flush_fn=flaky_flush)
+    counter.increment(election["id"], first)
+    counter.increment(election["id"], second)
+    assert counter.flush() == 0
+    counter.increment(election["id"], first)
+
+    assert counter.flush() == 2
+    assert calls[1] == [(election["id"], first, 2), (election["id"], second, 1)]
+    assert stored_tallies(election["id"]) == {first: 2, second: 1}
+    assert counter.flush() == 0
+
+
+def test_restart_counts_votes_not_yet_flushed(election):
+    first, second = election["candidates"]
+    running = ShardedVoteCounter(flush_fn=app_module.flush_tally_deltas)
+    app_module.load_vote_counter(running)
+    # The running worker has committed these votes but not yet flushed their counts
+    cast_votes(election, first, 3)
+    for _ in range(3):
+        running.increment(election["id"], first)
+
+    restarted = ShardedVoteCounter(flush_fn=app_module.flush_tally_deltas)
+    counted = app_module.load_vote_counter(restarted)
+    assert restarted.snapshot(election["id"]) == {first: 3}
+    db = app_module.SessionLocal()
+    try:
+        assert counted == {None: db.query(app_module.func.max(app_module.Vote.id)).scalar()}
+    finally:
+        db.close()
+
+    # Each worker flushes only its own deltas
+    running.flush()
+    assert stored_tallies(election["id"]) == {first: 3}
+    cast_votes(election, second, 1)
+    restarted.increment(election["id"], second)
+    restarted.stop()
+    assert stored_tallies(election["id"]) == {first: 3, second: 1}
+
+    reloaded = ShardedVoteCounter(flush_fn=app_module.flush_tally_deltas)
+    app_module.load_vote_counter(reloaded)
+    assert reloaded.snapshot(election["id"]) == {first: 3, second: 1}
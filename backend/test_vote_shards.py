@@ -0,0 +1,212 @@
+# test_vote_shards.py
+"""Votes are routed to a lazily created shard per election, which can be detached into an archive.
+
+The router and the shard-votes command are tested here directly; the endpoint
+tests need the app imported with VOTING_VOTE_SHARDING=election and run when
+test_db_modes runs this module that way.
+
+Run with:  python -m pytest test_vote_shards.py
+"""
+import functools
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+import app as app_module
+from storage import create_engines, storage_profile
+from vote_shards import ShardArchivedError, ShardRouter
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sharded = pytest.mark.skipif(app_module.vote_shards is None, reason="needs VOTING_VOTE_SHARDING=election")
+
+
+@pytest.fixture
+def router(tmp_path):
+    def make_engines(url):
+        return create_engines(
+            create_engine, url, storage_profile("wal"), busy_timeout=5, pool_size=2, max_overflow=0, pool_timeout=5,
+            connect_args={"check_same_thread": False}
+        )
+
+    shards = ShardRouter(str(tmp_path / "shards"), str(tmp_path / "archive"), make_engines, app_module._create_shard_schema)
+    yield shards
+    shards.dispose()
+
+
+def add_votes(shards, election_id, user_ids, candidate_id=1):
+    db = shards.session(election_id)
+    try:
+        db.add_all([
+            app_module.Vote(user_id=user_id, election_id=election_id, candidate_id=candidate_id, voted_at=datetime.utcnow())
+            for user_id in user_ids
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def count_votes(path):
+    with sqlite3.connect(path) as connection:
+        return connection.execute("SELECT election_id, count(*) FROM votes GROUP BY election_id").fetchall()
+
+
+def test_shards_are_created_lazily_and_routed_by_election(router):
+    assert router.election_ids() == []
+    assert not os.path.exists(router.path_for(1))
+
+    add_votes(router, 1, [10, 11])
+    add_votes(router, 2, [10])
+    assert router.election_ids() == [1, 2]
+    assert count_votes(router.path_for(1)) == [(1, 2)]
+    assert count_votes(router.path_for(2)) == [(2, 1)]
+    # Engines are built once per shard
+    assert router.session(1).get_bind() is router.session(1).get_bind()
+    read_db = router.session(1, read=True)
+    try:
+        assert read_db.query(app_module.Vote).count() == 2
+    finally:
+        read_db.close()
+
+
+def test_detach_checkpoints_and_archives(router):
+    add_votes(router, 3, [10, 11, 12])
+    live = router.path_for(3)
+    assert os.path.exists(live + "-wal")
+
+    archive = router.detach(3)
+    assert archive == router.archive_path_for(3) and router.is_archived(3)
+    assert not any(os.path.exists(live + suffix) for suffix in ("", "-wal", "-shm"))
+    # The WAL was folded into the archive before the move
+    assert not os.path.exists(archive + "-wal") or os.path.getsize(archive + "-wal") == 0
+    assert count_votes(archive) == [(3, 3)]
+    assert router.election_ids() == []
+
+    with pytest.raises(ShardArchivedError):
+        router.session(3)
+    with pytest.raises(ShardArchivedError):
+        router.detach(3)
+
+
+def test_detach_without_votes_archives_an_empty_shard(router):
+    archive = router.detach(4)
+    assert count_votes(archive) == []
+    assert not os.path.exists(router.path_for(4))
+
+
+def test_shard_votes_moves_existing_votes(tmp_path):
+    database = tmp_path / "main.db"
+    env = dict(
+        os.environ,
+        VOTING_DATABASE_URL=f"sqlite:///{database}",
+        VOTING_VOTE_SHARD_DIR=str(tmp_path / "shards"),
+        VOTING_VOTE_SHARDING="off",
+    )
+    subprocess.run([sys.executable, "app.py", "migrate"], cwd=BACKEND_DIR, env=env, check=True, capture_output=True)
+    with sqlite3.connect(database) as connection:
+        connection.executemany(
+            "INSERT INTO users (id, username, email, hashed_password, is_admin) VALUES (?, ?, ?, 'x', 0)",
+            [(user_id, f"shard-voter{user_id}", f"shard-voter{user_id}@shard.local") for user_id in (1, 2, 3)]
+        )
+        connection.executemany("INSERT INTO elections (id, title, is_active) VALUES (?, ?, 0)", [(1, "A"), (2, "B")])
+        connection.executemany("INSERT INTO candidates (id, election_id, name) VALUES (?, ?, ?)", [(1, 1, "A1"), (2, 1, "A2"), (3, 2, "B1")])
+        connection.executemany(
+            "INSERT INTO votes (user_id, election_id, candidate_id, voted_at) VALUES (?, ?, ?, '2024-05-01 12:00:00')",
+            [(1, 1, 1), (2, 1, 1), (3, 1, 2), (1, 2, 3)]
+        )
+
+    env["VOTING_VOTE_SHARDING"] = "election"
+    completed = subprocess.run(
+        [sys.executable, "app.py", "shard-votes"], cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+    )
+    assert "Moved 4 votes into shards" in completed.stdout
+
+    with sqlite3.connect(database) as connection:
+        assert connection.execute("SELECT count(*) FROM votes").fetchone() == (0,)
+        assert connection.execute("SELECT count(*) FROM candidate_tallies").fetchone() == (0,)
+    shard_one = tmp_path / "shards" / "election_1.db"
+    assert count_votes(shard_one) == [(1, 3)]
+    with sqlite3.connect(shard_one) as connection:
+        assert connection.execute("SELECT candidate_id, vote_count FROM candidate_tallies ORDER BY candidate_id").fetchall() == [(1, 2), (2, 1)]
+    assert count_votes(tmp_path / "shards" / "election_2.db") == [(2, 1)]
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+@sharded
+def test_detached_election_is_gone(client):
+    db = app_module.SessionLocal()
+    try:
+        admin = app_module.User(username="detach-admin", email="detach-admin@shard.local", hashed_password="x", is_admin=True)
+        voter = app_module.User(username="detach-voter", email="detach-voter@shard.local", hashed_password="x")
+        election = app_module.Election(title="Detached", is_active=True)
+        db.add_all([admin, voter, election])
+        db.flush()
+        candidate = app_module.Candidate(election_id=election.id, name="Detached")
+        db.add(candidate)
+        db.commit()
+        election_id, candidate_id, voter_id = election.id, candidate.id, voter.id
+        headers = {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(admin.id)})}"}
+    finally:
+        db.close()
+    assert app_module.write_vote_batch([(voter_id, election_id, candidate_id)]) == [None]
+    assert os.path.exists(app_module.vote_shards.path_for(election_id))
+
+    assert client.post(f"/api/admin/detach/{election_id}", headers=headers).status_code == 400
+    db = app_module.SessionLocal()
+    try:
+        db.get(app_module.Election, election_id).is_active = False
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.post(f"/api/admin/detach/{election_id}", headers=headers)
+    assert response.status_code == 200
+    assert count_votes(response.json()["archive_path"]) == [(election_id, 1)]
+    assert client.post(f"/api/admin/detach/{election_id}", headers=headers).status_code == 409
+    assert client.get(f"/api/admin/results/{election_id}", headers=headers).status_code == 410
+    export = client.get("/api/admin/export/votes", params={"election_id": election_id}, headers=headers)
+    assert export.status_code == 410
+    assert client.post(f"/api/admin/start/{election_id}", headers=headers).status_code == 409
+
+
+@sharded
+def test_export_with_usernames_looks_them_up_per_chunk(client, monkeypatch):
+    # More chunks than the statement repeat limit, so strict query checking must not see an N+1
+    monkeypatch.setattr(app_module, "iter_vote_export", functools.partial(app_module.iter_vote_export, chunk_size=2))
+    db = app_module.SessionLocal()
+    try:
+        admin = app_module.User(username="shard-export-admin", email="shard-export-admin@shard.local", hashed_password="x", is_admin=True)
+        voters = [
+            app_module.User(username=f"shard-exporter{i}", email=f"shard-exporter{i}@shard.local", hashed_password="x")
+            for i in range(9)
+        ]
+        election = app_module.Election(title="Exported shard", is_active=True)
+        db.add_all([admin, election, *voters])
+        db.flush()
+        candidate = app_module.Candidate(election_id=election.id, name="Exported")
+        db.add(candidate)
+        db.commit()
+        election_id = election.id
+        expected = [voter.username for voter in voters]
+        headers = {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(admin.id)})}"}
+        outcomes = app_module.write_vote_batch([(voter.id, election_id, candidate.id) for voter in voters])
+    finally:
+        db.close()
+    assert outcomes == [None] * 9
+
+    response = client.get(
+        "/api/admin/export/votes", params={"election_id": election_id, "format": "ndjson", "with_users": True}, headers=headers
+    )
+    assert response.status_code == 200
+    assert [json.loads(line)["username"] for line in response.text.splitlines()] == expected
@@ -0,0 +1,86 @@
+# test_voter_index.py
+"""Duplicate ballots are rejected from the in-memory voter index, with the database as backstop.
+
+Run with:  python -m pytest test_voter_index.py
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from voter_index import VoterIndex
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="module")
+def ballot():
+    db = app_module.SessionLocal()
+    try:
+        election = app_module.Election(title="Voter index", is_active=True)
+        voters = [
+            app_module.User(username=f"index-voter{i}", email=f"index-voter{i}@index.local", hashed_password="x")
+            for i in range(2)
+        ]
+        db.add(election)
+        db.add_all(voters)
+        db.flush()
+        candidate = app_module.Candidate(election_id=election.id, name="Indexed")
+        db.add(candidate)
+        db.commit()
+        app_module.rebuild_candidate_tallies(db, election.id)
+        # As the admin endpoints do, so listings rendered by earlier tests are not served
+        app_module.bump_listing_versions(election.id)
+        return {
+            "vote": {"election_id": election.id, "candidate_id": candidate.id},
+            "user_ids": [voter.id for voter in voters],
+            "headers": [
+                {"Authorization": f"Bearer {app_module.create_access_token({'sub': str(voter.id)})}"}
+                for voter in voters
+            ],
+        }
+    finally:
+        db.close()
+
+
+def test_bitmap_membership():
+    index = VoterIndex()
+    index.add_many([(1, 0), (1, 9), (1, 1000), (2, 9)])
+    assert index.has_voted(1, 9) and index.has_voted(1, 1000) and index.has_voted(2, 9)
+    assert not index.has_voted(1, 8) and not index.has_voted(2, 1000) and not index.has_voted(3, 0)
+    assert index.stats()["voters"] == 4
+
+
+def test_duplicate_rejected_from_database_then_memory(client, ballot):
+    assert client.post("/api/vote", json=ballot["vote"], headers=ballot["headers"][0]).status_code == 201
+    # Forget the vote, as a process that did not record it would
+    app_module.voter_index.discard(ballot["vote"]["election_id"])
+    before = app_module.duplicate_votes_rejected.render()
+
+    assert client.post("/api/vote", json=ballot["vote"], headers=ballot["headers"][0]).status_code == 400
+    assert app_module.voter_index.has_voted(ballot["vote"]["election_id"], ballot["user_ids"][0])
+    assert client.post("/api/vote", json=ballot["vote"], headers=ballot["headers"][0]).status_code == 400
+    after = app_module.duplicate_votes_rejected.render()
+    assert after != before
+    assert any('source="database"' in line for line in after)
+    assert any('source="memory"' in line for line in after)
+
+
+def test_warm_up_loads_committed_votes(client, ballot):
+    app_module.voter_index.clear()
+    assert app_module.warm_voter_index() >= 1
+    assert app_module.voter_index.has_voted(ballot["vote"]["election_id"], ballot["user_ids"][0])
+    assert not app_module.voter_index.has_voted(ballot["vote"]["election_id"], ballot["user_ids"][1])
+
+
+def test_listing_has_voted_for_the_caller(client, ballot):
+    election_id = ballot["vote"]["election_id"]
+    flags = [
+        {election["id"]: election["has_voted"] for election in client.get("/api/elections", headers=headers).json()}
+        for headers in ballot["headers"]
+    ]
+    assert flags[0][election_id] is True and flags[1][election_id] is False
+    assert "has_voted" not in client.get("/api/elections").json()[0]
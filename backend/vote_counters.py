@@ -0,0 +1,146 @@
+# vote_counters.py
+"""In-process vote counters with a write-behind flush.
+
+Counts are kept per (election_id, candidate_id) in a fixed number of lock
+stripes so concurrent voters for different candidates rarely contend on the
+same lock. Increments are batched and handed to a flush callback either every
+``flush_interval`` seconds or as soon as enough increments are pending.
+
+The counters are a cache: the durable ``votes`` rows remain the source of truth
+and the counters are rebuilt from them with ``load()``.
+"""
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (election_id, candidate_id, delta)
+TallyDelta = Tuple[int, int, int]
+
+
+class _Stripe:
+    __slots__ = ("lock", "counts", "pending", "pending_total")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # election_id -> {candidate_id: count}
+        self.counts: Dict[int, Dict[int, int]] = {}
+        # (election_id, candidate_id) -> increments not yet flushed
+        self.pending: Dict[Tuple[int, int], int] = {}
+        self.pending_total = 0
+
+
+class ShardedVoteCounter:
+    def __init__(
+        self,
+        stripes: int = 16,
+        flush_interval: float = 1.0,
+        flush_threshold: int = 500,
+        flush_fn: Optional[Callable[[List[TallyDelta]], None]] = None,
+    ):
+        self._stripes = [_Stripe() for _ in range(max(1, stripes))]
+        self._flush_interval = flush_interval
+        # Each stripe wakes the flusher once it holds its share of the threshold
+        self._stripe_threshold = max(1, flush_threshold // len(self._stripes))
+        self._flush_fn = flush_fn
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stripe_for(self, candidate_id: int) -> _Stripe:
+        return self._stripes[candidate_id % len(self._stripes)]
+
+    def increment(self, election_id: int, candidate_id: int, delta: int = 1):
+        stripe = self._stripe_for(candidate_id)
+        with stripe.lock:
+            election_counts = stripe.counts.setdefault(election_id, {})
+            election_counts[candidate_id] = election_counts.get(candidate_id, 0) + delta
+            key = (election_id, candidate_id)
+            stripe.pending[key] = stripe.pending.get(key, 0) + delta
+            stripe.pending_total += 1
+            over_threshold = stripe.pending_total >= self._stripe_threshold
+        if over_threshold:
+            self._wakeup.set()
+
+    def observe(self, election_id: int, candidate_id: int, delta: int = 1):
+        """Count votes another process recorded: it flushes them, so nothing is queued here."""
+        stripe = self._stripe_for(candidate_id)
+        with stripe.lock:
+            election_counts = stripe.counts.setdefault(election_id, {})
+            election_counts[candidate_id] = election_counts.get(candidate_id, 0) + delta
+
+    def snapshot(self, election_id: int) -> Dict[int, int]:
+        """Return {candidate_id: count} for one election."""
+        counts: Dict[int, int] = {}
+        for stripe in self._stripes:
+            with stripe.lock:
+                election_counts = stripe.counts.get(election_id)
+                if election_counts:
+                    counts.update(election_counts)
+        return counts
+
+    def load(self, rows: Iterable[Tuple[int, int, int]]):
+        """Replace all counts with (election_id, candidate_id, count) rows and drop pending deltas."""
+        fresh = [{} for _ in self._stripes]
+        for election_id, candidate_id, count in rows:
+            stripe_counts = fresh[candidate_id % len(self._stripes)]
+            stripe_counts.setdefault(election_id, {})[candidate_id] = count
+        for stripe, counts in zip(self._stripes, fresh):
+            with stripe.lock:
+                stripe.counts = counts
+                stripe.pending = {}
+                stripe.pending_total = 0
+
+    def flush(self) -> int:
+        """Hand pending deltas to the flush callback. Returns the number of deltas flushed."""
+        with self._flush_lock:
+            deltas: List[TallyDelta] = []
+            for stripe in self._stripes:
+                with stripe.lock:
+                    if not stripe.pending:
+                        continue
+                    pending, stripe.pending = stripe.pending, {}
+                    stripe.pending_total = 0
+                deltas.extend((election_id, candidate_id, delta) for (election_id, candidate_id), delta in pending.items())
+
+            if not deltas or self._flush_fn is None:
+                return 0
+            try:
+                self._flush_fn(deltas)
+            except Exception:
+                logger.exception("Vote counter flush failed; will retry")
+                self._requeue(deltas)
+                return 0
+            return len(deltas)
+
+    def _requeue(self, deltas: List[TallyDelta]):
+        for election_id, candidate_id, delta in deltas:
+            stripe = self._stripe_for(candidate_id)
+            with stripe.lock:
+                key = (election_id, candidate_id)
+                stripe.pending[key] = stripe.pending.get(key, 0) + delta
+                stripe.pending_total += 1
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="vote-counter-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background flusher and flush whatever is still pending."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            self.flush()
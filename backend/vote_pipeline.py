@@ -0,0 +1,98 @@
+# vote_pipeline.py
+"""Group-commit ingestion: many callers, one writer, one transaction per batch.
+
+Callers ``submit()`` an item and wait on the returned future. A single writer
+thread drains the bounded queue in batches of up to ``max_batch_size`` items,
+waiting at most ``max_wait`` seconds for a batch to fill, and hands each batch
+to ``write_batch``. That callback returns one outcome per item: ``None`` for
+success or an exception instance to raise in that item's caller.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class QueueFullError(Exception):
+    """Raised by submit() when the ingestion queue is at capacity."""
+
+
+class GroupCommitWriter:
+    def __init__(
+        self,
+        write_batch: Callable[[List[Any]], List[Optional[BaseException]]],
+        max_batch_size: int = 256,
+        max_wait: float = 0.005,
+        queue_size: int = 10000,
+    ):
+        self._write_batch = write_batch
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait = max_wait
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((item, future))
+        except queue.Full:
+            raise QueueFullError("Ingestion queue is full")
+        return future
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Finish everything already queued, then stop the writer."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self._max_wait
+            while len(batch) < self._max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        items = [item for item, _ in batch]
+        try:
+            outcomes = self._write_batch(items)
+        except Exception as exc:
+            logger.exception("Group commit of %d items failed", len(items))
+            outcomes = [exc] * len(items)
+
+        for (_, future), outcome in zip(batch, outcomes):
+            if outcome is None:
+                future.set_result(None)
+            else:
+                future.set_exception(outcome)
@@ -0,0 +1,124 @@
+# vote_shards.py
+"""Per-election SQLite shards.
+
+``ShardRouter`` maps an election id to its own database file in ``directory``
+and lazily creates that file's engines and tables on first use. Elections in
+different shards never share a write lock, and a finished election can be
+detached as a unit: its file is checkpointed, closed and moved to
+``archive_directory``. An archived shard is never recreated; asking for it
+raises ``ShardArchivedError``.
+"""
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session, sessionmaker
+
+_SHARD_FILE = re.compile(r"^election_(\d+)\.db$")
+
+
+class ShardArchivedError(Exception):
+    """Raised when a detached election's shard is requested."""
+
+
+class ShardRouter:
+    def __init__(
+        self,
+        directory: str,
+        archive_directory: str,
+        make_engines: Callable[[str], Tuple[object, object]],
+        create_schema: Callable[[object], None],
+    ):
+        """``make_engines(url)`` returns ``(write_engine, read_engine)``; ``create_schema(write_engine)`` sets up a new shard."""
+        self.directory = directory
+        self.archive_directory = archive_directory
+        self._make_engines = make_engines
+        self._create_schema = create_schema
+        self._lock = threading.Lock()
+        # election_id -> (write sessionmaker, read sessionmaker, write engine, read engine)
+        self._shards: Dict[int, tuple] = {}
+
+    def path_for(self, election_id: int) -> str:
+        return os.path.join(self.directory, f"election_{election_id}.db")
+
+    def archive_path_for(self, election_id: int) -> str:
+        return os.path.join(self.archive_directory, f"election_{election_id}.db")
+
+    def is_archived(self, election_id: int) -> bool:
+        return os.path.exists(self.archive_path_for(election_id))
+
+    def election_ids(self) -> List[int]:
+        """Elections that have a live shard on disk."""
+        if not os.path.isdir(self.directory):
+            return []
+        ids = []
+        for name in os.listdir(self.directory):
+            match = _SHARD_FILE.match(name)
+            if match:
+                ids.append(int(match.group(1)))
+        return sorted(ids)
+
+    def _shard(self, election_id: int) -> tuple:
+        shard = self._shards.get(election_id)
+        if shard is not None:
+            return shard
+        with self._lock:
+            shard = self._shards.get(election_id)
+            if shard is None:
+                if self.is_archived(election_id):
+                    raise ShardArchivedError(f"Votes for election {election_id} have been archived")
+                os.makedirs(self.directory, exist_ok=True)
+                write_engine, read_engine = self._make_engines(f"sqlite:///{self.path_for(election_id)}")
+                self._create_schema(write_engine)
+                shard = (
+                    sessionmaker(autocommit=False, autoflush=False, bind=write_engine),
+                    sessionmaker(autocommit=False, autoflush=False, bind=read_engine),
+                    write_engine,
+                    read_engine,
+                )
+                self._shards[election_id] = shard
+        return shard
+
+    def session(self, election_id: int, read: bool = False) -> Session:
+        write_sessions, read_sessions, _, _ = self._shard(election_id)
+        return read_sessions() if read else write_sessions()
+
+    def detach(self, election_id: int) -> str:
+        """Checkpoint and close an election's shard, then move it to the archive. Returns the archive path."""
+        with self._lock:
+            if self.is_archived(election_id):
+                raise ShardArchivedError(f"Votes for election {election_id} have been archived")
+            shard = self._shards.pop(election_id, None)
+            if shard is not None:
+                _, _, write_engine, read_engine = shard
+                with write_engine.connect() as connection:
+                    # Fold the WAL into the main file so the archive is a single self-contained file
+                    connection.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+                read_engine.dispose()
+                write_engine.dispose()
+
+            os.makedirs(self.archive_directory, exist_ok=True)
+            source = self.path_for(election_id)
+            target = self.archive_path_for(election_id)
+            if os.path.exists(source):
+                os.replace(source, target)
+                if os.path.exists(source + "-wal"):
+                    os.replace(source + "-wal", target + "-wal")
+            else:
+                # An election that never received a vote still gets an (empty) archive
+                write_engine, read_engine = self._make_engines(f"sqlite:///{target}")
+                self._create_schema(write_engine)
+                read_engine.dispose()
+                write_engine.dispose()
+            if os.path.exists(source + "-shm"):
+                os.remove(source + "-shm")
+            return target
+
+    def dispose(self):
+        with self._lock:
+            for _, _, write_engine, read_engine in self._shards.values():
+                read_engine.dispose()
+                write_engine.dispose()
+            self._shards.clear()
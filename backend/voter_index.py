@@ -0,0 +1,59 @@
+# voter_index.py
+"""In-memory record of who has voted in which election.
+
+``VoterIndex`` keeps one bitmap per election, bit ``user_id`` set once that
+user's vote is known to be committed: 125 KB per election per million user
+ids. A set bit is final, since votes are never withdrawn, so a duplicate
+ballot can be rejected without touching the database. A clear bit proves
+nothing (the vote may have been cast by another process), so callers fall
+back to the database, where the unique constraint on (user_id, election_id)
+decides.
+
+Bits are set from any thread; reads take no lock.
+"""
+import threading
+from typing import Dict, Iterable, Tuple
+
+
+class VoterIndex:
+    def __init__(self):
+        self._bitmaps: Dict[int, bytearray] = {}
+        self._lock = threading.Lock()
+
+    def add(self, election_id: int, user_id: int):
+        self.add_many([(election_id, user_id)])
+
+    def add_many(self, votes: Iterable[Tuple[int, int]]):
+        """Mark each (election_id, user_id) as voted."""
+        with self._lock:
+            for election_id, user_id in votes:
+                bitmap = self._bitmaps.get(election_id)
+                if bitmap is None:
+                    bitmap = self._bitmaps[election_id] = bytearray()
+                index = user_id >> 3
+                if index >= len(bitmap):
+                    # Grow geometrically so a warm-up in user id order is not quadratic
+                    bitmap.extend(bytes(max(index + 1 - len(bitmap), len(bitmap))))
+                bitmap[index] |= 1 << (user_id & 7)
+
+    def has_voted(self, election_id: int, user_id: int) -> bool:
+        bitmap = self._bitmaps.get(election_id)
+        index = user_id >> 3
+        return bitmap is not None and index < len(bitmap) and bool(bitmap[index] >> (user_id & 7) & 1)
+
+    def discard(self, election_id: int):
+        with self._lock:
+            self._bitmaps.pop(election_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._bitmaps.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            bitmaps = list(self._bitmaps.values())
+        return {
+            "elections": len(bitmaps),
+            "voters": sum(bin(int.from_bytes(bitmap, "little")).count("1") for bitmap in bitmaps),
+            "bytes": sum(len(bitmap) for bitmap in bitmaps),
+        }
@@ -2,6 +2,8 @@
 const Admin = {
     elections: [],
     allCandidates: {},
+    currentResults: null,
+    resultsStream: null,
     
     // Load admin dashboard
     async loadDashboard() {
@@ -85,7 +87,11 @@ const Admin = {
                         <button class="btn btn-success btn-sm" onclick="Admin.startElection(${election.id})">
                             <i class="fas fa-play"></i> Start
                         </button>
-                    ` : ''}
+                    ` : `
+                        <button class="btn btn-danger btn-sm" onclick="Admin.closeElection(${election.id})">
+                            <i class="fas fa-stop"></i> Close
+                        </button>
+                    `}
                     <button class="btn btn-primary btn-sm" onclick="Admin.viewResults(${election.id})">
                         <i class="fas fa-chart-bar"></i> Results
                     </button>
@@ -179,6 +185,32 @@ const Admin = {
         }
     },
     
+    // Close election: voting stops and the final results are frozen
+    async closeElection(electionId) {
+        if (!confirm('Are you sure you want to close this election? Voting stops and the results become final.')) {
+            return;
+        }
+        
+        try {
+            showLoading();
+            const results = await API.admin.closeElection(electionId);
+            hideLoading();
+            
+            showToast('Election closed, results are final');
+            
+            this.currentResults = results;
+            this.displayResults(results);
+            Modal.show('resultsModal');
+            
+            // Reload dashboard
+            await this.loadDashboard();
+            
+        } catch (error) {
+            hideLoading();
+            alert(`Failed to close election: ${error.message}`);
+        }
+    },
+    
     // View election results
     async viewResults(electionId) {
         try {
@@ -187,15 +219,85 @@ const Admin = {
             hideLoading();
             
             // Display results
+            this.currentResults = results;
             this.displayResults(results);
             Modal.show('resultsModal');
             
+            // Keep the modal live while it is open
+            this.startResultsStream(electionId);
+            
         } catch (error) {
             hideLoading();
             alert(`Failed to load results: ${error.message}`);
         }
     },
     
+    // Follow live results; the first event is a fresh snapshot, then per-candidate updates
+    startResultsStream(electionId) {
+        this.stopResultsStream();
+        
+        const controller = new AbortController();
+        this.resultsStream = controller;
+        
+        const modal = document.getElementById('resultsModal');
+        modal.addEventListener('modal:hidden', () => this.stopResultsStream(), { once: true });
+        
+        API.admin.streamResults(electionId, (eventName, data) => {
+            // "closed" carries the final results; the stream ends after it
+            if (eventName === 'snapshot' || eventName === 'closed') {
+                this.currentResults = data;
+                this.updateResults();
+            } else if (eventName === 'update') {
+                this.applyResultsUpdate(data);
+            }
+        }, controller.signal).catch(error => {
+            if (error.name !== 'AbortError') {
+                console.error('Live results stream ended:', error);
+            }
+        });
+    },
+    
+    stopResultsStream() {
+        if (this.resultsStream) {
+            this.resultsStream.abort();
+            this.resultsStream = null;
+        }
+    },
+    
+    // Apply changed candidate counts to the results being shown
+    applyResultsUpdate(update) {
+        const results = this.currentResults;
+        if (!results || update.election_id !== results.election_id) {
+            return;
+        }
+        
+        update.changes.forEach(change => {
+            const result = results.results.find(r => r.candidate_id === change.candidate_id);
+            if (result) {
+                result.vote_count = change.vote_count;
+            }
+        });
+        results.total_votes = results.results.reduce((sum, r) => sum + r.vote_count, 0);
+        
+        this.updateResults();
+    },
+    
+    // Update the open chart in place instead of rebuilding it
+    updateResults() {
+        const results = this.currentResults;
+        const chart = window.resultsChartInstance;
+        
+        if (!chart || chart.data.labels.length !== results.results.length) {
+            this.displayResults(results);
+            return;
+        }
+        
+        document.getElementById('resultsTotalVotes').textContent = `Total Votes: ${results.total_votes}`;
+        chart.data.datasets[0].data = results.results.map(r => r.vote_count);
+        chart.update('none');
+        this.createResultsTable(results);
+    },
+    
     // Display results with chart
     displayResults(results) {
         document.getElementById('resultsElectionTitle').textContent = results.election_title;
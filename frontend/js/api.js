@@ -34,6 +34,10 @@ const API = {
                 throw new Error(data.detail || 'Request failed');
             }
             
+            if (options.returnHeaders) {
+                return { data, headers: response.headers };
+            }
+            
             return data;
         } catch (error) {
             console.error('API Error:', error);
@@ -41,6 +45,20 @@ const API = {
         }
     },
     
+    // Fetch every page of a cursor-paginated listing and return the combined items
+    async requestAllPages(endpoint, options = {}) {
+        const items = [];
+        let cursor = null;
+        do {
+            const separator = endpoint.includes('?') ? '&' : '?';
+            const url = cursor ? `${endpoint}${separator}cursor=${encodeURIComponent(cursor)}` : endpoint;
+            const page = await API.request(url, { ...options, returnHeaders: true });
+            items.push(...page.data);
+            cursor = page.headers.get('X-Next-Cursor');
+        } while (cursor);
+        return items;
+    },
+    
     // Authentication APIs
     auth: {
         async register(username, email, password) {
@@ -74,11 +92,16 @@ const API = {
     // Election APIs
     elections: {
         async getActive() {
-            return await API.request(API_CONFIG.ENDPOINTS.ELECTIONS);
+            return await API.requestAllPages(API_CONFIG.ENDPOINTS.ELECTIONS);
+        },
+        
+        // Active elections, each with its candidates and has_voted, in one request per page
+        async getDashboard() {
+            return await API.requestAllPages(API_CONFIG.ENDPOINTS.DASHBOARD);
         },
         
         async getCandidates(electionId) {
-            return await API.request(`${API_CONFIG.ENDPOINTS.ELECTIONS}/${electionId}/candidates`);
+            return await API.requestAllPages(`${API_CONFIG.ENDPOINTS.ELECTIONS}/${electionId}/candidates`);
         },
         
         async vote(electionId, candidateId) {
@@ -122,15 +145,70 @@ const API = {
             });
         },
         
+        // Returns the election's final results
+        async closeElection(electionId) {
+            return await API.request(`${API_CONFIG.ENDPOINTS.ADMIN.CLOSE_ELECTION}/${electionId}`, {
+                method: 'POST'
+            });
+        },
+        
         async getResults(electionId) {
             return await API.request(`${API_CONFIG.ENDPOINTS.ADMIN.RESULTS}/${electionId}`);
         },
         
+        // Stream live results (Server-Sent Events over fetch so the bearer token is sent).
+        // Calls onEvent(eventName, data) for each event until the signal is aborted.
+        async streamResults(electionId, onEvent, signal) {
+            const token = localStorage.getItem(STORAGE_KEYS.TOKEN);
+            const response = await fetch(`${API_CONFIG.BASE_URL}${API_CONFIG.ENDPOINTS.ADMIN.RESULTS}/${electionId}/stream`, {
+                headers: { 'Authorization': `Bearer ${token}` },
+                signal
+            });
+            
+            if (!response.ok) {
+                const data = await response.json();
+                throw new Error(data.detail || 'Request failed');
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) {
+                    break;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                
+                // Events are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const frame = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    
+                    let eventName = 'message';
+                    let data = '';
+                    frame.split('\n').forEach(line => {
+                        if (line.startsWith('event:')) {
+                            eventName = line.slice(6).trim();
+                        } else if (line.startsWith('data:')) {
+                            data += line.slice(5).trim();
+                        }
+                    });
+                    
+                    if (data) {
+                        onEvent(eventName, JSON.parse(data));
+                    }
+                }
+            }
+        },
+        
         // Get all elections (active and inactive)
         async getAllElections() {
             // Since backend only has endpoint for active elections,
             // we'll reuse it. In production, you might want a separate endpoint
-            return await API.request(API_CONFIG.ENDPOINTS.ELECTIONS);
+            return await API.requestAllPages(API_CONFIG.ENDPOINTS.ELECTIONS);
         }
     }
 };
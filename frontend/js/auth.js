@@ -168,6 +168,9 @@ const Modal = {
             // Reset forms
             const forms = modal.querySelectorAll('form');
             forms.forEach(form => form.reset());
+            
+            // Let features clean up (e.g. stop live result streams)
+            modal.dispatchEvent(new Event('modal:hidden'));
         }
     },
     
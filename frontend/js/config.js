@@ -8,11 +8,13 @@ const API_CONFIG = {
         REGISTER: '/api/register',
         LOGIN: '/api/login',
         ELECTIONS: '/api/elections',
+        DASHBOARD: '/api/dashboard',
         VOTE: '/api/vote',
         ADMIN: {
             CREATE_ELECTION: '/api/admin/election',
             ADD_CANDIDATE: '/api/admin/candidate',
             START_ELECTION: '/api/admin/start',
+            CLOSE_ELECTION: '/api/admin/close',
             RESULTS: '/api/admin/results'
         }
     }
@@ -7,20 +7,17 @@ const User = {
     async loadElections() {
         try {
             showLoading();
-            this.elections = await API.elections.getActive();
+            this.elections = await API.elections.getDashboard();
+            this.candidates = {};
+            for (const election of this.elections) {
+                this.candidates[election.id] = election.candidates;
+            }
             
             if (this.elections.length === 0) {
                 document.getElementById('noElectionsMessage').style.display = 'block';
                 document.getElementById('electionsContainer').innerHTML = '';
             } else {
                 document.getElementById('noElectionsMessage').style.display = 'none';
-                
-                // Load candidates for each election
-                for (const election of this.elections) {
-                    const candidates = await API.elections.getCandidates(election.id);
-                    this.candidates[election.id] = candidates;
-                }
-                
                 this.renderElections();
             }
             
@@ -75,7 +72,13 @@ const User = {
                 <h4>Candidates:</h4>
                 ${candidates.length > 0 ? candidatesHTML : '<p style="color: var(--text-secondary);">No candidates yet</p>'}
             </div>
-            ${candidates.length > 0 ? `
+            ${election.has_voted ? `
+                <div class="election-actions">
+                    <button class="btn btn-secondary btn-block" disabled>
+                        <i class="fas fa-check"></i> You Have Voted
+                    </button>
+                </div>
+            ` : candidates.length > 0 ? `
                 <div class="election-actions">
                     <button class="btn btn-success btn-block" onclick="User.handleVote(${election.id})">
                         <i class="fas fa-vote-yea"></i> Cast Your Vote